@@ -4,6 +4,12 @@
 """
 
 
+# 草稿渲染：短边不超过 360 像素，帧率不超过 12fps，使用最快的编码预设
+DRAFT_SHORT_SIDE = 360
+DRAFT_FPS = 12
+DRAFT_PRESET = "ultrafast"
+
+
 class VideoSize:
     """视频尺寸预设类"""
 
@@ -108,6 +114,24 @@ def parse_video_size(size_input):
     )
 
 
+def draft_settings(stage_size, fps):
+    """
+    计算草稿渲染的尺寸和帧率：保持宽高比缩小到短边不超过 DRAFT_SHORT_SIDE（宽高取偶数）
+
+    参数:
+        stage_size (tuple): 最终渲染的尺寸 (width, height)
+        fps (int): 最终渲染的帧率
+
+    返回:
+        tuple: ((width, height), fps)
+    """
+    width, height = stage_size
+    scale = min(1.0, DRAFT_SHORT_SIDE / min(width, height))
+    size = (max(2, int(round(width * scale / 2)) * 2),
+            max(2, int(round(height * scale / 2)) * 2))
+    return size, min(fps, DRAFT_FPS)
+
+
 def print_available_sizes():
     """打印所有可用的视频尺寸预设"""
     print("可用的视频尺寸预设:")
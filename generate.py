@@ -2,24 +2,58 @@
 视频生成主脚本
 使用 moviepy 创建图片和视频混合轮播视频，支持音频配合和过渡效果
 """
-from moviepy import ImageClip, VideoFileClip, AudioFileClip, concatenate_videoclips
-from moviepy.video.fx import FadeIn, FadeOut
+from moviepy import ImageClip, VideoClip, AudioFileClip
 import os
 import argparse
+import json
+import random
 import time
-
-from utils.audio_utils import get_audio_duration_ffmpeg, get_audio_pauses
-from utils.media_utils import get_media_paths, get_audio_path, MediaType
-from utils.slideshow_utils import SlideshowController
-from utils.video_utils import resize_and_position_image, resize_and_position_video
-from utils.animation_utils import AnimationConfig, apply_animation, get_random_animation_config
-from config import VideoSize, parse_video_size, print_available_sizes
+from dataclasses import replace
+
+from utils.audio_utils import (
+    get_audio_duration_ffmpeg,
+    probe_audio,
+    iter_audio_pauses,
+    prefetch_in_background,
+    sweep_pause_parameters,
+    print_sweep_results,
+    get_beat_change_points,
+)
+from utils.cache_utils import DEFAULT_CACHE_DIR
+from utils.media_utils import get_media_paths, get_audio_path, MediaItem, MediaType
+from utils.slideshow_utils import SlideshowController, StreamingSlideshowController, plan_segments
+from utils.timeline_utils import Timeline, assign_animations, build_timeline, iter_controller
+from utils.video_utils import VideoReader, VideoReaderPool, make_video_proxy
+from utils.render_utils import (
+    DEFAULT_PRESET,
+    WindowedVideoFrames,
+    load_animator,
+    benchmark_animation_render,
+    load_image_frame,
+    print_benchmark_results,
+    render_slideshow,
+    render_slideshow_parallel,
+)
+from utils.transition_utils import (
+    TRANSITION_CROSSFADE,
+    TRANSITION_FADE,
+    TRANSITION_STYLES,
+    compose_with_transitions,
+)
+from utils.animation_utils import is_animated
+from config import DRAFT_PRESET, VideoSize, draft_settings, parse_video_size, print_available_sizes
 
 
 def create_slideshow(media_items, audio_path, output_path,
                      transition_duration=1,
                      stage_size=(1280, 720), fps=30, audio_duration=0,
-                     animation_config=None, random_animation=False):
+                     animation_config=None, random_animation=False, cache_dir=None,
+                     stream_analysis=False, analysis_rate=None,
+                     change_mode="pause", beats_per_change=8, analysis_workers=1,
+                     target_segments=None, min_segment=5.0, max_segment=None,
+                     renderer="moviepy", render_workers=1, transition_style=TRANSITION_FADE,
+                     static_vfr=False, timeline=None, plan_only=False, timeline_path=None,
+                     draft=False, seed=None):
     """
     创建新版 MoviePy 的混合媒体轮播视频
 
@@ -36,91 +70,257 @@ def create_slideshow(media_items, audio_path, output_path,
         audio_duration (float): 目标音频时长，0表示使用原始音频时长
         animation_config (AnimationConfig): 动画配置对象，None 表示无动画
         random_animation (bool): 是否为每张图片随机选择动画效果
+        cache_dir (str): 分析结果缓存目录，None 表示不使用缓存；同时在此缓存预缩放的图片和视频元数据，
+            PyAV 后端还会缓存各片段的编码结果
+        stream_analysis (bool): 是否在后台流式检测停顿点，边分析边构建片段并编码（强制使用 pyav 后端）
+        analysis_rate (int): 停顿检测的分析采样率（如 8000），None 表示使用音频原采样率
+        change_mode (str): 切换点来源，"pause" 按语音停顿切换，"beat" 按音乐节拍切换
+        beats_per_change (int): 节拍模式下每个片段包含的节拍数
+        analysis_workers (int): 停顿检测的并行进程数，1 表示顺序分析，None 表示使用 CPU 核数
+        target_segments (int): 目标片段数量，None 表示按最小间隔贪心选取停顿点；
+            0 表示与媒体数量相同
+        min_segment (float): 规划片段的最短时长（秒）
+        max_segment (float): 规划片段的最长时长（秒），None 表示不限制
+        renderer (str): 渲染后端，"moviepy" 使用 MoviePy 合成，"pyav" 直接用 NumPy 构建帧并由 PyAV 编码
+        render_workers (int): PyAV 后端按片段并行渲染的进程数，1 表示逐帧顺序渲染，None 表示使用 CPU 核数
+        transition_style (str): 过渡样式，"fade" 从黑色淡入，"crossfade" 与上一个片段交叉溶解
+        static_vfr (bool): PyAV 后端是否以可变帧率输出静态图片片段（每段只编码首尾帧），
+            False 时静态帧只合成一次、由编码器重复编码
+        timeline (Timeline): 已有的时间线，指定时跳过音频分析和片段规划，
+            media_items 被忽略，过渡参数以时间线为准
+        plan_only (bool): 只规划时间线并打印，不读取音频、不渲染
+        timeline_path (str): 把时间线写入该 JSON 文件，None 表示不写入
+        draft (bool): 草稿模式：按同一时间线以低分辨率、低帧率和 ultrafast 预设渲染，
+            视频改用缓存目录中的低分辨率代理（需要 cache_dir）
+        seed (int): 循环选择媒体和随机选择动画使用的种子，记录在时间线中；
+            None 表示随机生成一个种子（同样会打印并记录，可用于复现）
+
+    返回:
+        Timeline: 渲染所用的时间线；流式分析且未要求导出时间线时返回 None
 
     内部实现适配 v2.x API
     """
     stage_size = parse_video_size(stage_size)
     print(f"视频尺寸: {stage_size[0]} x {stage_size[1]}")
 
-    if not audio_duration or audio_duration <= 0:
-        audio_duration = get_audio_duration_ffmpeg(audio_path)
-    print(f"音频时长: {audio_duration} 秒 (使用音频文件: {audio_path})")
-    audio = AudioFileClip(audio_path)
-    actual_duration = audio.duration
-    if audio_duration and audio_duration > 0:
-        audio_duration = min(audio_duration, actual_duration)
-        audio = audio.subclipped(0, audio_duration)
-
-    pause_points = get_audio_pauses(audio_path, min_pause=0.70, noise_threshold=-35, min_interval=5.0)
-    print(f"检测到停顿点（间隔 >= 5秒）: {pause_points}")
-    print(f"检测到停顿点数量: {len(pause_points)}")
-    change_points = [0.0] + pause_points + [audio_duration]
-
-    n_media = len(media_items)
-    controller = SlideshowController(media_items, change_points)
-    print("轮播切换顺序:")
-    for i in range(len(change_points) - 1):
-        media_item = media_items[i % n_media]
-        start = change_points[i]
-        end = change_points[i + 1]
-        print(f"媒体: {media_item.name} ({media_item.media_type.value}) | 时间区间: {start:.2f} - {end:.2f}")
-    if n_media == 0:
-        raise FileNotFoundError("未提供任何媒体文件，无法生成轮播视频。请在 `media` 目录添加图片或视频。")
-    if n_media < len(change_points) - 1:
-        print(f"媒体数量 ({n_media}) 少于切换点数量 ({len(change_points)-1})，将循环使用媒体以覆盖所有切换点。")
+    if renderer not in ("moviepy", "pyav"):
+        raise ValueError(f"不支持的渲染后端: {renderer}")
+    probe = None
+    audio = None
+    if timeline is not None:
+        # 直接使用已有的时间线，跳过音频分析和片段规划
+        timeline.validate()
+        audio_path = audio_path or timeline.audio_path
+        audio_duration = timeline.duration
+        transition_duration = timeline.transition_duration
+        transition_style = timeline.transition_style
+        print(f"使用时间线: {len(timeline.segments)} 个片段，时长 {audio_duration} 秒 (音频文件: {audio_path})")
+        timeline.print_plan()
+        segments = timeline.segments
+    else:
+        n_media = len(media_items)
+        if n_media == 0:
+            raise FileNotFoundError("未提供任何媒体文件，无法生成轮播视频。请在 `media` 目录添加图片或视频。")
+        if change_mode not in ("pause", "beat"):
+            raise ValueError(f"不支持的切换模式: {change_mode}")
+        if transition_style not in TRANSITION_STYLES:
+            raise ValueError(f"不支持的过渡样式: {transition_style}")
+        if stream_analysis and change_mode == "beat":
+            print("节拍模式需要完整分析整段音乐，忽略流式停顿检测")
+            stream_analysis = False
+        if stream_analysis and target_segments is not None:
+            print("按目标片段数量规划需要全部停顿候选，忽略流式停顿检测")
+            stream_analysis = False
+        if stream_analysis and renderer != "pyav" and not plan_only:
+            # MoviePy 在写入前要构建出全部片段，无法与停顿检测重叠，流式检测改用逐帧编码的 PyAV 后端
+            print("流式停顿检测需要边构建片段边编码，改用 PyAV 渲染后端")
+            renderer = "pyav"
+        if seed is None:
+            seed = random.randrange(2 ** 32)
+        print(f"随机种子: {seed}（使用 --seed {seed} 可得到相同的片段和动画）")
+
+        if stream_analysis:
+            # 停顿点在后台线程中流式检测，片段构建不必等待整段音频分析完成
+            if not audio_duration or audio_duration <= 0:
+                audio_duration = get_audio_duration_ffmpeg(audio_path)
+            print(f"音频时长: {audio_duration} 秒 (使用音频文件: {audio_path})")
+            if not plan_only:
+                audio_duration, audio = _load_audio(audio_path, renderer, audio_duration)
+
+            pause_stream = prefetch_in_background(iter_audio_pauses(
+                audio_path, min_pause=0.70, noise_threshold=-35, min_interval=5.0,
+                cache_dir=cache_dir, analysis_rate=analysis_rate
+            ))
+            controller = StreamingSlideshowController(media_items, pause_stream, audio_duration, seed=seed)
+            print("停顿点在后台流式检测，轮播片段随检测进度依次构建")
+
+            def _announce(stream):
+                for segment in stream:
+                    print(f"媒体: {segment.media_item.name} ({segment.media_item.media_type.value}) | "
+                          f"时间区间: {segment.start_time:.2f} - {segment.end_time:.2f}")
+                    yield segment
+
+            segments = _announce(assign_animations(iter_controller(controller), animation_config,
+                                                   random_animation, seed))
+            if plan_only or timeline_path is not None:
+                timeline = Timeline(audio_path, audio_duration, list(segments), transition_duration,
+                                    transition_style, seed=seed, change_mode=change_mode)
+                segments = timeline.segments
+        else:
+            if change_mode == "beat":
+                # 背景音乐通常没有停顿，改为按节拍切换；节拍检测自己解码音频，
+                # 不再做停顿分析，时长直接读取容器信息
+                total_duration = get_audio_duration_ffmpeg(audio_path)
+                if not audio_duration or audio_duration <= 0:
+                    audio_duration = total_duration
+                audio_duration = min(audio_duration, total_duration)
+                print(f"音频时长: {audio_duration} 秒 (使用音频文件: {audio_path})")
+                pause_points = [p for p in get_beat_change_points(
+                    audio_path, beats_per_change=beats_per_change, min_interval=5.0, cache_dir=cache_dir
+                ) if p < audio_duration]
+            else:
+                # 单次解码得到时长和停顿点；缓存命中时不解码。
+                # 分析不保留 PCM，渲染时两种后端再按需读取音频文件，不把整段 PCM 留在内存中
+                probe = probe_audio(
+                    audio_path, min_pause=0.70, noise_threshold=-35, min_interval=5.0,
+                    cache_dir=cache_dir, analysis_rate=analysis_rate,
+                    workers=analysis_workers
+                )
+                if not audio_duration or audio_duration <= 0:
+                    audio_duration = probe.duration
+                audio_duration = min(audio_duration, probe.duration)
+                print(f"音频时长: {audio_duration} 秒 (使用音频文件: {audio_path})")
+                pause_points = probe.pause_points
+
+            if change_mode == "pause" and target_segments is not None:
+                # 从全部停顿候选中规划出数量最接近目标、评分最高的切换点
+                target = target_segments or n_media
+                candidates = [c for c in probe.candidates(min_pause=0.3, noise_threshold=-35)
+                              if c.time < audio_duration]
+                pause_points = plan_segments(
+                    [c.time for c in candidates], [c.score for c in candidates], audio_duration,
+                    target_segments=target, min_segment=min_segment, max_segment=max_segment
+                )
+                print(f"停顿候选数量: {len(candidates)}，目标片段数量: {target}，规划片段数量: {len(pause_points) + 1}")
+
+            label = "节拍切换点" if change_mode == "beat" else "停顿点"
+            min_gap = min_segment if change_mode == "pause" and target_segments is not None else 5.0
+            print(f"检测到{label}（间隔 >= {min_gap:g}秒）: {pause_points}")
+            print(f"检测到{label}数量: {len(pause_points)}")
+            change_points = [0.0] + pause_points + [audio_duration]
+
+            # 计划直接取自控制器，与实际渲染的片段一致（包括循环时随机选择的媒体）
+            controller = SlideshowController(media_items, change_points, seed=seed)
+            timeline = build_timeline(
+                iter_controller(controller), audio_path, audio_duration,
+                transition_duration=transition_duration, transition_style=transition_style,
+                animation_config=animation_config, random_animation=random_animation,
+                seed=seed, change_mode=change_mode
+            )
+            timeline.print_plan()
+            if n_media < len(change_points) - 1:
+                print(f"媒体数量 ({n_media}) 少于切换点数量 ({len(change_points)-1})，将循环使用媒体以覆盖所有切换点。")
+            segments = timeline.segments
+
+    if timeline is not None and timeline_path is not None:
+        timeline.save(timeline_path)
+        print(f"时间线已写入: {timeline_path}")
+    if plan_only:
+        return timeline
+
+    preset = DEFAULT_PRESET
+    if draft:
+        # 同一时间线按低分辨率、低帧率渲染，视频从缓存的代理解码，图片按草稿尺寸缓存
+        stage_size, fps = draft_settings(stage_size, fps)
+        preset = DRAFT_PRESET
+        print(f"草稿渲染: {stage_size[0]} x {stage_size[1]}, {fps} fps, preset {preset}")
+        if cache_dir is not None:
+            segments = _proxy_segments(segments, stage_size, cache_dir)
+        else:
+            print("未启用缓存，草稿渲染直接解码原始视频")
+
+    if audio is None:
+        audio_duration, audio = _load_audio(audio_path, renderer, audio_duration, probe)
+
+    if renderer == "pyav":
+
+        def _segments():
+            for segment in segments:
+                if not os.path.exists(segment.media_item.path):
+                    raise FileNotFoundError(f"媒体文件不存在: {segment.media_item.path}")
+                yield segment
+
+        # 流式停顿检测时片段随检测进度逐个产生（没有完整的时间线），按片段渲染要先读完全部片段，
+        # 因此改为逐帧渲染，让编码与停顿检测重叠进行
+        streaming = timeline is None
+        if streaming and (render_workers != 1 or cache_dir is not None):
+            print("片段随停顿检测逐个产生，使用逐帧渲染（不按片段并行，不使用片段缓存）")
+        if streaming or (render_workers == 1 and cache_dir is None):
+            n_frames = render_slideshow(
+                _segments(), output_path, stage_size, fps, audio_duration,
+                transition_duration=transition_duration,
+                audio_path=audio, preset=preset,
+                transition_style=transition_style, static_vfr=static_vfr
+            )
+            print(f"已渲染 {n_frames} 帧（PyAV 原生渲染）")
+        else:
+            # 各片段分别编码（可并行、可缓存），再以流复制拼接并封装音频
+            n_frames = render_slideshow_parallel(
+                _segments(), output_path, stage_size, fps, audio_duration,
+                transition_duration=transition_duration,
+                audio_path=audio, workers=render_workers,
+                cache_dir=cache_dir, preset=preset, transition_style=transition_style,
+                static_vfr=static_vfr
+            )
+            print(f"已渲染 {n_frames} 帧（PyAV 按片段渲染）")
+        print(f"视频生成成功: {output_path}")
+        return timeline
 
     clips = []
-    for i in range(len(change_points) - 1):
-        segment = controller.next()
-        if segment is None:
-            break
-
+    start_times = []
+    # 视频通过 PyAV 解码器读取，解码器按片段在成片中的显示窗口从池中获取和归还，
+    # 时间不重叠的片段在写入时复用同一个解码器，不为每次播放启动新的 ffmpeg 进程
+    readers = VideoReaderPool(VideoReader)
+    for segment, is_last in _with_last(segments):
         media_item = segment.media_item
-        start = change_points[i]
-        end = change_points[i + 1]
-        duration = end - start
+        duration = segment.duration
 
-        if i < len(change_points) - 2 and transition_duration > 0:
+        if not is_last and transition_duration > 0:
             duration += transition_duration
 
         if not os.path.exists(media_item.path):
             raise FileNotFoundError(f"媒体文件不存在: {media_item.path}")
 
-        if media_item.media_type == MediaType.IMAGE:
-            clip = ImageClip(media_item.path, duration=duration)
-            clip = resize_and_position_image(clip, stage_size, position="center")
+        if media_item.media_type == MediaType.IMAGE and is_animated(segment.animation):
+            # 动画帧由按动画余量预缩放的图片直接生成（缩放为裁剪后缩放，平移为切片视图），
+            # 每帧的变换参数按帧率预先计算，不经过 CompositeVideoClip 合成
+            animator = load_animator(media_item.path, stage_size, segment.animation,
+                                     segment.duration, fps, cache_dir=cache_dir)
+            clip = VideoClip(animator.frame, duration=duration)
+
+        elif media_item.media_type == MediaType.IMAGE:
+            # 静态图片预先缩放裁剪为舞台尺寸的一帧，逐帧输出时不再经过 CompositeVideoClip 合成；
+            # 指定缓存目录时使用预缩放的缓存图片，避免每次运行都解码和缩放原图
+            clip = ImageClip(load_image_frame(media_item.path, stage_size, cache_dir=cache_dir),
+                             duration=duration)
 
         else:
             print(f"  [视频] 直接播放，不应用动画")
-            video_duration = VideoFileClip(media_item.path).duration
-            
-            if video_duration >= duration:
-                clip = VideoFileClip(media_item.path).subclipped(0, duration)
-            else:
-                original_clip = VideoFileClip(media_item.path)
-                video_part = original_clip.with_duration(video_duration)
-                remaining = duration - video_duration
-                
-                last_frame = original_clip.get_frame(original_clip.duration - 0.01)
-                still_frame = ImageClip(last_frame, duration=remaining)
-                
-                clip = concatenate_videoclips([video_part, still_frame], method="compose")
-            
-            clip = resize_and_position_video(clip, stage_size, position="center")
-
-        effects = []
-        if i > 0:
-            effects.append(FadeIn(duration=transition_duration))
-        if i < len(change_points) - 2:
-            effects.append(FadeOut(duration=transition_duration))
-        if effects:
-            clip = clip.with_effects(effects)
+            # 按显示方向覆盖缩放并居中裁剪，视频不足片段时长时停留在最后一帧；
+            # 淡入过渡只显示到下一个片段开始，交叉溶解时还要显示过渡窗口内的尾部画面
+            window = duration if transition_style == TRANSITION_CROSSFADE else segment.duration
+            frames = WindowedVideoFrames(media_item.path, stage_size, window, fps, readers,
+                                         cache_dir=cache_dir)
+            clip = VideoClip(frames, duration=duration)
+            # 构建片段时 MoviePy 会预取第 0 秒，先归还解码器，写入时再按窗口获取
+            frames.close()
+
         clips.append(clip)
+        start_times.append(segment.start_time)
 
-    final_video = concatenate_videoclips(
-        clips,
-        method="compose",
-        padding=-transition_duration
+    # 只在相邻片段重叠的过渡窗口内混合画面，其余帧直接取自当前片段
+    final_video = compose_with_transitions(
+        clips, start_times, transition_duration, stage_size, style=transition_style
     )
     final_video = final_video.with_audio(audio)
     print(f"最终视频时长: {final_video.duration}, 目标音频时长: {audio_duration}")
@@ -134,9 +334,58 @@ def create_slideshow(media_items, audio_path, output_path,
         audio_bitrate="192k",
         bitrate="5000k",
         threads=4,
-        preset="medium"
+        preset=preset
     )
+    readers.close()
     print(f"视频生成成功: {output_path}")
+    return timeline
+
+
+def _load_audio(audio_path, renderer, audio_duration, probe=None):
+    """
+    读取渲染使用的音频，并把时长限制在实际音频长度以内
+
+    参数:
+        audio_path (str): 音频文件路径
+        renderer (str): 渲染后端，"moviepy" 或 "pyav"
+        audio_duration (float): 目标时长（秒）
+        probe (AudioProbe): 音频分析结果，已知实际时长时不再探测
+
+    返回:
+        tuple: (audio_duration, audio)；pyav 后端的 audio 为音频文件路径（渲染时边解码边编码），
+            moviepy 后端为音频片段
+    """
+    if renderer == "pyav":
+        total = probe.duration if probe is not None else get_audio_duration_ffmpeg(audio_path)
+        return min(audio_duration, total), audio_path
+
+    # 按需读取音频文件，不使用整段解码的 PCM
+    audio = AudioFileClip(audio_path)
+    audio_duration = min(audio_duration, audio.duration)
+    return audio_duration, audio.subclipped(0, audio_duration)
+
+
+def _proxy_segments(segments, stage_size, cache_dir):
+    """把视频片段的媒体替换为缓存的低分辨率代理视频，同一视频只生成一次代理"""
+    proxies = {}
+    for segment in segments:
+        media_item = segment.media_item
+        if media_item.is_video and os.path.exists(media_item.path):
+            if media_item.path not in proxies:
+                proxy_path = make_video_proxy(media_item.path, stage_size, cache_dir)
+                proxies[media_item.path] = MediaItem(proxy_path, MediaType.VIDEO, media_item.name)
+            segment = replace(segment, media_item=proxies[media_item.path])
+        yield segment
+
+
+def _with_last(items):
+    """依次产出 (元素, 是否为最后一个)，只向前多读一个元素"""
+    iterator = iter(items)
+    current = next(iterator, None)
+    while current is not None:
+        following = next(iterator, None)
+        yield current, following is None
+        current = following
 
 
 if __name__ == "__main__":
@@ -162,9 +411,22 @@ if __name__ == "__main__":
   # 禁用动画
   python generate.py --no-animation
 
+  # 固定随机种子，重复运行得到相同的视频（可复用片段缓存）
+  python generate.py --seed 42
+
   # 查看所有可用尺寸预设
   python generate.py --list-sizes
 
+  # 只规划时间线，检查后再按时间线渲染
+  python generate.py --plan-only -o out.mp4
+  python generate.py --timeline out.timeline.json -o out.mp4
+
+  # 扫描停顿检测参数（只解码一次音频）
+  python generate.py sweep --audio audio.wav --min-pause 0.5 0.7 --noise-threshold -40 -35
+
+  # 比较各尺寸预设下动画与静态图片片段的渲染耗时
+  python generate.py bench --sizes HD_720P FULL_HD_1080P
+
 支持的媒体格式:
   图片: jpg, jpeg, png, gif, webp, tiff, bmp
   视频: mp4, mov, avi, mkv, webm, m4v, flv
@@ -187,10 +449,74 @@ if __name__ == "__main__":
                         help='视频帧率 (默认: 24)')
     parser.add_argument('--transition', '-t', type=float, default=1.0,
                         help='过渡效果时长（秒） (默认: 1.0)')
+    parser.add_argument('--transition-style', choices=list(TRANSITION_STYLES), default=TRANSITION_FADE,
+                        help='过渡样式：fade 从黑色淡入，crossfade 与上一个片段交叉溶解 (默认: fade)')
     parser.add_argument('--no-animation', action='store_true',
                         help='禁用动画效果')
     parser.add_argument('--list-sizes', action='store_true',
                         help='列出所有可用的视频尺寸预设')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR,
+                        help=f'分析结果缓存目录 (默认: {DEFAULT_CACHE_DIR})')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='禁用缓存，每次重新分析音频')
+    parser.add_argument('--stream-analysis', action='store_true',
+                        help='在后台流式检测停顿点，无需等待整段音频分析完成即开始构建和编码片段（使用 pyav 后端）')
+    parser.add_argument('--change-mode', choices=['pause', 'beat'], default='pause',
+                        help='切换点来源：pause 按语音停顿，beat 按音乐节拍 (默认: pause)')
+    parser.add_argument('--beats-per-change', type=int, default=8,
+                        help='节拍模式下每个片段包含的节拍数 (默认: 8)')
+    parser.add_argument('--target-segments', type=int, default=None,
+                        help='按目标片段数量规划切换点，0 表示与媒体数量相同 (默认: 按最小间隔选取停顿点)')
+    parser.add_argument('--min-segment', type=float, default=5.0,
+                        help='规划片段的最短时长（秒） (默认: 5.0)')
+    parser.add_argument('--max-segment', type=float, default=None,
+                        help='规划片段的最长时长（秒） (默认: 不限制)')
+    parser.add_argument('--renderer', choices=['moviepy', 'pyav'], default='moviepy',
+                        help='渲染后端：moviepy 使用 MoviePy 合成，pyav 直接构建帧并在进程内编码 (默认: moviepy)')
+    parser.add_argument('--render-workers', type=int, default=1,
+                        help='pyav 后端按片段并行渲染的进程数，0 表示使用全部 CPU 核 (默认: 1，逐帧顺序渲染)')
+    parser.add_argument('--static-vfr', action='store_true',
+                        help='pyav 后端以可变帧率输出静态图片片段，每段只编码首尾帧')
+    parser.add_argument('--plan-only', action='store_true',
+                        help='只规划时间线并写入 JSON，不渲染视频')
+    parser.add_argument('--save-timeline', default=None,
+                        help='把时间线写入该 JSON 文件 (默认: --plan-only 时写入 <输出文件名>.timeline.json)')
+    parser.add_argument('--timeline', default=None,
+                        help='从时间线 JSON 文件渲染，跳过音频分析和片段规划')
+    parser.add_argument('--draft', action='store_true',
+                        help='草稿模式：低分辨率代理、ultrafast 预设和较低帧率，输出 <输出文件名>.draft.mp4 并保存时间线')
+    parser.add_argument('--seed', type=int, default=None,
+                        help='循环选择媒体和随机选择动画的随机种子，相同输入和种子得到相同的视频 (默认: 每次随机生成并打印)')
+    parser.add_argument('--analysis-workers', type=int, default=1,
+                        help='停顿检测的并行进程数，0 表示使用全部 CPU 核 (默认: 1)')
+    parser.add_argument('--analysis-rate', type=int, default=None,
+                        help='停顿检测的分析采样率，如 8000 (默认: 音频原采样率)')
+
+    subparsers = parser.add_subparsers(dest='command', metavar='{sweep,bench}')
+    sweep_parser = subparsers.add_parser(
+        'sweep', help='扫描停顿检测参数组合（只解码一次音频），用于渲染前挑选参数'
+    )
+    sweep_parser.add_argument('--audio', dest='sweep_audio', default=None,
+                              help='音频文件路径 (默认: 使用主参数 --audio 或自动查找)')
+    sweep_parser.add_argument('--min-pause', type=float, nargs='+', default=[0.5, 0.7, 1.0],
+                              help='最小停顿时长候选值（秒） (默认: 0.5 0.7 1.0)')
+    sweep_parser.add_argument('--noise-threshold', type=float, nargs='+', default=[-40.0, -35.0, -30.0],
+                              help='噪音阈值候选值（dB） (默认: -40 -35 -30)')
+    sweep_parser.add_argument('--min-interval', type=float, nargs='+', default=[3.0, 5.0, 8.0],
+                              help='停顿点最小间隔候选值（秒） (默认: 3 5 8)')
+    sweep_parser.add_argument('--json', dest='sweep_json', default=None,
+                              help='将扫描结果写入 JSON 文件')
+    bench_parser = subparsers.add_parser(
+        'bench', help='在各尺寸预设下比较缩放、平移动画与静态图片片段的渲染耗时（含编码）'
+    )
+    bench_parser.add_argument('--sizes', nargs='+', default=None,
+                              help='要测试的尺寸预设或 WIDTHxHEIGHT (默认: 全部预设)')
+    bench_parser.add_argument('--duration', type=float, default=2.0,
+                              help='每个测试片段的时长（秒） (默认: 2.0)')
+    bench_parser.add_argument('--image', dest='bench_image', default=None,
+                              help='测试图片路径 (默认: 合成的 4000x3000 图片)')
+    bench_parser.add_argument('--json', dest='bench_json', default=None,
+                              help='将基准结果写入 JSON 文件')
 
     args = parser.parse_args()
 
@@ -198,8 +524,57 @@ if __name__ == "__main__":
         print_available_sizes()
         raise SystemExit(0)
 
-    if args.images and args.videos:
-        from utils.media_utils import get_image_paths, get_video_paths, MediaItem
+    if args.command == 'sweep':
+        sweep_audio = args.sweep_audio or args.audio or get_audio_path()
+        if not sweep_audio or not os.path.exists(sweep_audio):
+            print("错误: 未找到音频文件，请使用 --audio 参数指定。")
+            raise SystemExit(1)
+        sweep_start = time.time()
+        results = sweep_pause_parameters(
+            sweep_audio,
+            min_pauses=args.min_pause,
+            noise_thresholds=args.noise_threshold,
+            min_intervals=args.min_interval,
+            analysis_rate=args.analysis_rate,
+            cache_dir=None if args.no_cache else args.cache_dir
+        )
+        print_sweep_results(results)
+        print(f"共 {len(results)} 组参数，耗时 {(time.time() - sweep_start) * 1000:.0f} 毫秒")
+        if args.sweep_json:
+            with open(args.sweep_json, 'w', encoding='utf-8') as f:
+                json.dump(results, f, ensure_ascii=False, indent=2)
+            print(f"扫描结果已写入: {args.sweep_json}")
+        raise SystemExit(0)
+
+    if args.command == 'bench':
+        try:
+            bench_sizes = ({name: parse_video_size(name) for name in args.sizes} if args.sizes
+                           else VideoSize.list_presets())
+        except ValueError as e:
+            print(f"错误: {e}")
+            raise SystemExit(1)
+        results = benchmark_animation_render(bench_sizes, fps=args.fps, duration=args.duration,
+                                             image_path=args.bench_image)
+        print_benchmark_results(results)
+        if args.bench_json:
+            with open(args.bench_json, 'w', encoding='utf-8') as f:
+                json.dump(results, f, ensure_ascii=False, indent=2)
+            print(f"基准结果已写入: {args.bench_json}")
+        raise SystemExit(0)
+
+    timeline = None
+    if args.timeline:
+        # 时间线中已经包含媒体、音频和过渡参数
+        try:
+            timeline = Timeline.load(args.timeline)
+        except (OSError, ValueError) as e:
+            print(f"错误: 无法读取时间线: {e}")
+            raise SystemExit(1)
+        media_items = timeline.media_items
+        print(f"从 {args.timeline} 加载了 {len(timeline.segments)} 个片段")
+
+    elif args.images and args.videos:
+        from utils.media_utils import get_image_paths, get_video_paths
 
         image_paths = get_image_paths(args.images)
         video_paths = get_video_paths(args.videos)
@@ -225,7 +600,9 @@ if __name__ == "__main__":
             print(f"错误: 未在目录 `images` 中找到媒体文件，请检查路径。")
             raise SystemExit(1)
 
-    if args.audio:
+    if timeline is not None:
+        AUDIO_PATH = args.audio or timeline.audio_path
+    elif args.audio:
         AUDIO_PATH = args.audio
         if not os.path.exists(AUDIO_PATH):
             print(f"错误: 音频文件不存在: {AUDIO_PATH}")
@@ -250,13 +627,38 @@ if __name__ == "__main__":
 
     print("=" * 60)
     print("视频生成配置:")
-    print(f"  媒体目录: {args.media or 'images'} ({n_images} 张图片, {n_videos} 个视频)")
+    if timeline is not None:
+        print(f"  时间线: {args.timeline} ({len(timeline.segments)} 个片段, {n_images} 张图片, {n_videos} 个视频)")
+    else:
+        print(f"  媒体目录: {args.media or 'images'} ({n_images} 张图片, {n_videos} 个视频)")
     print(f"  音频文件: {AUDIO_PATH}")
     print(f"  输出文件: {args.output}")
     print(f"  视频尺寸: {STAGE_SIZE[0]} x {STAGE_SIZE[1]}")
     print(f"  帧率: {args.fps} fps")
-    print(f"  过渡时长: {args.transition} 秒")
+    transition_duration = args.transition if timeline is None else timeline.transition_duration
+    transition_style = args.transition_style if timeline is None else timeline.transition_style
+    print(f"  过渡时长: {transition_duration} 秒（{'交叉溶解' if transition_style == 'crossfade' else '淡入'}）")
     print(f"  动画效果: {'启用（随机）' if random_animation else '禁用'}")
+    if timeline is not None:
+        print(f"  随机种子: {timeline.seed}（来自时间线）")
+    elif args.seed is not None:
+        print(f"  随机种子: {args.seed}")
+    print(f"  渲染后端: {args.renderer}")
+    if args.renderer == 'pyav' and args.render_workers != 1:
+        print(f"  渲染进程: {args.render_workers or 'CPU 核数'}（按片段并行）")
+    if args.renderer == 'pyav' and args.static_vfr:
+        print("  静态片段: 可变帧率输出")
+    print(f"  切换模式: {'音乐节拍' if args.change_mode == 'beat' else '语音停顿'}")
+    print(f"  缓存目录: {'禁用' if args.no_cache else args.cache_dir}")
+    output_path = args.output
+    if args.draft:
+        output_path = '{0}.draft{1}'.format(*os.path.splitext(args.output))
+        print(f"  草稿模式: 输出 {output_path}")
+    timeline_path = args.save_timeline
+    if (args.plan_only or args.draft) and timeline_path is None and timeline is None:
+        timeline_path = os.path.splitext(args.output)[0] + '.timeline.json'
+    if timeline_path:
+        print(f"  时间线输出: {timeline_path}")
     print("=" * 60)
 
     start_time = time.time()
@@ -264,13 +666,31 @@ if __name__ == "__main__":
     create_slideshow(
         media_items=media_items,
         audio_path=AUDIO_PATH,
-        output_path=args.output,
+        output_path=output_path,
         audio_duration=0,
         transition_duration=args.transition,
         stage_size=STAGE_SIZE,
         fps=args.fps,
         animation_config=animation,
-        random_animation=random_animation
+        random_animation=random_animation,
+        cache_dir=None if args.no_cache else args.cache_dir,
+        stream_analysis=args.stream_analysis,
+        analysis_rate=args.analysis_rate,
+        change_mode=args.change_mode,
+        beats_per_change=args.beats_per_change,
+        analysis_workers=args.analysis_workers or None,
+        target_segments=args.target_segments,
+        min_segment=args.min_segment,
+        max_segment=args.max_segment,
+        renderer=args.renderer,
+        render_workers=args.render_workers or None,
+        transition_style=args.transition_style,
+        static_vfr=args.static_vfr,
+        timeline=timeline,
+        plan_only=args.plan_only,
+        timeline_path=timeline_path,
+        draft=args.draft,
+        seed=args.seed
     )
 
     end_time = time.time()
@@ -279,7 +699,14 @@ if __name__ == "__main__":
     seconds = elapsed_time % 60
 
     print("=" * 60)
-    print(f"✓ 视频生成完成！")
-    print(f"  总耗时: {minutes} 分 {seconds:.2f} 秒")
-    print(f"  输出文件: {args.output}")
+    if args.plan_only:
+        print("✓ 时间线规划完成！")
+        print(f"  总耗时: {elapsed_time * 1000:.0f} 毫秒")
+        print(f"  时间线文件: {timeline_path}")
+    else:
+        print(f"✓ 视频生成完成！")
+        print(f"  总耗时: {minutes} 分 {seconds:.2f} 秒")
+        print(f"  输出文件: {output_path}")
+        if args.draft:
+            print(f"  最终渲染: python generate.py --timeline {args.timeline or timeline_path} -o {args.output}")
     print("=" * 60)
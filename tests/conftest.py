@@ -9,6 +9,7 @@ import numpy as np
 from PIL import Image
 import av
 import sys
+import wave
 
 # 添加项目根目录到 Python 路径
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -63,6 +64,64 @@ def temp_audio_file():
     yield _create_temp_audio
 
 
+@pytest.fixture
+def temp_wav_file(temp_dir):
+    """按 (时长, 振幅) 片段列表创建 16 位 PCM WAV 文件，振幅为 0 表示静音"""
+    counter = {"n": 0}
+
+    def _create_wav(segments, sample_rate=16000, channels=1, frequency=440):
+        chunks = []
+        for duration, amplitude in segments:
+            n = int(round(duration * sample_rate))
+            t = np.arange(n) / sample_rate
+            chunks.append(amplitude * np.sin(2 * np.pi * frequency * t))
+        data = np.concatenate(chunks) if chunks else np.zeros(0)
+        pcm = (np.clip(data, -1, 1) * 32767).astype(np.int16)
+        if channels > 1:
+            pcm = np.repeat(pcm[:, None], channels, axis=1)
+
+        counter["n"] += 1
+        path = os.path.join(temp_dir, f"test_wav_{counter['n']}.wav")
+        with wave.open(path, "wb") as wav:
+            wav.setnchannels(channels)
+            wav.setsampwidth(2)
+            wav.setframerate(sample_rate)
+            wav.writeframes(pcm.tobytes())
+        return path
+
+    yield _create_wav
+
+
+@pytest.fixture
+def temp_video_file(temp_dir):
+    """用 PyAV 创建 H.264 测试视频，第 i 帧的红色通道为 i * 8"""
+    counter = {"n": 0}
+
+    def _create_video(n_frames=20, fps=10, width=64, height=48, rotation=0):
+        counter["n"] += 1
+        path = os.path.join(temp_dir, f"test_video_{counter['n']}.mp4")
+        with av.open(path, mode="w") as container:
+            stream = container.add_stream("libx264", rate=fps)
+            stream.width = width
+            stream.height = height
+            stream.pix_fmt = "yuv420p"
+            stream.options = {"crf": "1"}
+            if rotation:
+                stream.set_display_rotation(rotation)
+            for i in range(n_frames):
+                data = np.zeros((height, width, 3), dtype=np.uint8)
+                data[:, :, 0] = min(i * 8, 255)
+                frame = av.VideoFrame.from_ndarray(data, format="rgb24")
+                frame.pts = i
+                for packet in stream.encode(frame):
+                    container.mux(packet)
+            for packet in stream.encode(None):
+                container.mux(packet)
+        return path
+
+    yield _create_video
+
+
 @pytest.fixture
 def temp_image_file():
     """创建临时图片文件"""
@@ -350,3 +350,120 @@ class TestGenerateSlideshowWorkflow:
         # 验证至少有一些输出文件被创建
         successful_outputs = [p for p in outputs if os.path.exists(p)]
         assert len(successful_outputs) > 0
+
+
+class TestMoviePyImageFrames:
+    """MoviePy 渲染路径中静态图片帧尺寸的测试"""
+
+    @pytest.mark.requires_audio
+    @pytest.mark.slow
+    def test_rounded_cover_fills_stage(self, temp_dir, temp_wav_file):
+        """测试缩放比例有浮点误差的图片仍输出舞台尺寸的帧（49x37 缩放到 64x48 时高度会少一个像素）"""
+        import av
+        from PIL import Image
+        from utils.media_utils import MediaItem, MediaType
+        from utils.slideshow_utils import MediaSegment
+        from utils.timeline_utils import Timeline
+
+        segments = []
+        for i, color in enumerate([(200, 0, 0), (0, 200, 0)]):
+            path = os.path.join(temp_dir, f"short{i}.png")
+            Image.new("RGB", (49, 37), color).save(path)
+            item = MediaItem(path=path, media_type=MediaType.IMAGE, name=os.path.basename(path))
+            segments.append(MediaSegment(item, float(i), float(i + 1), i))
+        timeline = Timeline(temp_wav_file([(2.0, 0.5)]), 2.0, segments, transition_duration=0.5)
+        output_path = os.path.join(temp_dir, "short.mp4")
+
+        create_slideshow(None, None, output_path, stage_size=(64, 48), fps=10,
+                         cache_dir=os.path.join(temp_dir, "cache"), timeline=timeline)
+
+        with av.open(output_path) as container:
+            frames = [frame.to_ndarray(format="rgb24") for frame in container.decode(video=0)]
+        assert frames and all(frame.shape == (48, 64, 3) for frame in frames)
+        assert frames[5][..., 0].mean() > 150
+
+
+class TestStreamAnalysisRendering:
+    """流式停顿检测时渲染路径选择的测试"""
+
+    @staticmethod
+    def _items(paths):
+        from utils.media_utils import MediaItem, MediaType
+        return [MediaItem(path, MediaType.IMAGE, os.path.basename(path)) for path in paths]
+
+    @patch('generate.render_slideshow_parallel')
+    @patch('generate.render_slideshow', return_value=0)
+    @patch('generate.iter_audio_pauses', return_value=iter([3.0, 7.0]))
+    @patch('generate.get_audio_duration_ffmpeg', return_value=10.0)
+    def test_cached_render_keeps_streaming(self, _duration, _pauses, mock_render, mock_parallel,
+                                           sample_image_paths, temp_dir):
+        """测试启用缓存和多进程时，流式片段仍逐帧渲染，不在编码前读完全部片段"""
+        create_slideshow(self._items(sample_image_paths), "audio.wav", os.path.join(temp_dir, "out.mp4"),
+                         stage_size=(64, 48), fps=10, cache_dir=os.path.join(temp_dir, "cache"),
+                         stream_analysis=True, renderer="pyav", render_workers=2)
+
+        mock_parallel.assert_not_called()
+        assert not isinstance(mock_render.call_args[0][0], list)
+
+    @patch('generate.render_slideshow', return_value=0)
+    @patch('generate.iter_audio_pauses', return_value=iter([3.0, 7.0]))
+    @patch('generate.get_audio_duration_ffmpeg', return_value=10.0)
+    def test_moviepy_switches_to_pyav(self, _duration, _pauses, mock_render, sample_image_paths, temp_dir):
+        """测试流式停顿检测改用 PyAV 逐帧编码，MoviePy 不会在写入前构建全部片段"""
+        with patch('generate.ImageClip') as mock_image_clip:
+            create_slideshow(self._items(sample_image_paths), "audio.wav", os.path.join(temp_dir, "out.mp4"),
+                             stage_size=(64, 48), fps=10, stream_analysis=True, renderer="moviepy")
+
+        mock_image_clip.assert_not_called()
+        mock_render.assert_called_once()
+
+
+class TestMoviePyVideoReaders:
+    """MoviePy 渲染路径中视频读取器复用的测试"""
+
+    @pytest.mark.requires_audio
+    @pytest.mark.slow
+    def test_looped_video_not_reopened_during_write(self, temp_dir, temp_wav_file, temp_video_file):
+        """测试写入视频时循环使用的视频不重新打开解码器（计数覆盖 write_videofile 期间）"""
+        import av
+        from moviepy import VideoClip
+        from PIL import Image
+        from utils.media_utils import MediaItem, MediaType
+        from utils.slideshow_utils import MediaSegment
+        from utils.timeline_utils import Timeline
+        from utils.video_utils import VideoReader
+
+        opened = []
+
+        class _CountingReader(VideoReader):
+            def __init__(self, path):
+                super().__init__(path)
+                opened.append(path)
+
+        write_videofile = VideoClip.write_videofile
+        opened_during_write = []
+
+        def _write(clip, *args, **kwargs):
+            before = len(opened)
+            write_videofile(clip, *args, **kwargs)
+            opened_during_write.append(len(opened) - before)
+
+        video = temp_video_file(n_frames=10, fps=10)
+        image = os.path.join(temp_dir, "still.png")
+        Image.new("RGB", (64, 48), (0, 0, 200)).save(image)
+        items = [MediaItem(video, MediaType.VIDEO, "video.mp4"), MediaItem(image, MediaType.IMAGE, "still.png")]
+        segments = [MediaSegment(items[i % 2], float(i), float(i + 1), i) for i in range(5)]
+        timeline = Timeline(temp_wav_file([(5.0, 0.5)]), 5.0, segments, transition_duration=0.5)
+        output_path = os.path.join(temp_dir, "looped.mp4")
+
+        with patch('generate.VideoReader', _CountingReader), \
+                patch.object(VideoClip, 'write_videofile', _write):
+            create_slideshow(None, None, output_path, stage_size=(64, 48), fps=10, timeline=timeline)
+
+        assert opened == [video]
+        assert opened_during_write == [0]
+        with av.open(output_path) as container:
+            frames = [frame.to_ndarray(format="rgb24") for frame in container.decode(video=0)]
+        # 每次播放都从视频开头开始（第 i 帧的红色通道为 i * 8）
+        for start in (0, 20, 40):
+            assert frames[start + 9][..., 0].mean() == pytest.approx(72, abs=6)
@@ -5,11 +5,21 @@ import pytest
 import numpy as np
 from unittest.mock import MagicMock, patch, Mock
 
+from moviepy import ImageClip
+from PIL import Image
+
 from utils.animation_utils import (
     EasingCurve,
     AnimationConfig,
+    PanAnimator,
+    ZoomAnimator,
+    animation_headroom,
     apply_animation,
-    get_random_animation_config
+    create_animator,
+    get_random_animation_config,
+    is_animated,
+    pan_headroom,
+    zoom_headroom
 )
 
 
@@ -98,6 +108,21 @@ class TestEasingCurve:
             for i in range(len(values) - 1):
                 assert values[i] <= values[i + 1], f"Function {func.__name__} is not monotonic"
 
+    def test_array_input_matches_scalar(self):
+        """测试传入数组时逐元素计算，结果与逐个标量计算一致"""
+        t = np.linspace(0.0, 1.0, 21)
+        for name in ("linear", "ease_in_quad", "ease_out_quad", "ease_in_out_quad",
+                     "ease_in_cubic", "ease_out_cubic", "ease_in_out_cubic"):
+            func = getattr(EasingCurve, name)
+            result = func(t)
+            assert isinstance(result, np.ndarray) and result.shape == t.shape
+            np.testing.assert_allclose(result, [func(float(v)) for v in t])
+
+    def test_scalar_input_returns_float(self):
+        """测试分段缓动函数传入标量时返回 float"""
+        assert type(EasingCurve.ease_in_out_quad(0.25)) is float
+        assert EasingCurve.ease_in_out_cubic(0.75) == pytest.approx(0.9375)
+
 
 class TestAnimationConfig:
     """AnimationConfig 类的测试"""
@@ -166,6 +191,15 @@ class TestAnimationConfig:
         config4 = AnimationConfig(intensity=1.5)
         assert config4.intensity == 1.5
 
+    def test_dict_round_trip(self):
+        """测试转换为字典后还原"""
+        config = AnimationConfig(AnimationConfig.PAN_UP, 0.2, "ease_out_cubic", duration=3.0)
+        data = config.to_dict()
+        assert data == {"animation_type": "pan_up", "intensity": 0.2,
+                        "easing": "ease_out_cubic", "duration": 3.0}
+        restored = AnimationConfig.from_dict(data)
+        assert restored.to_dict() == data
+
 
 class TestApplyAnimation:
     """apply_animation 函数的测试"""
@@ -197,133 +231,81 @@ class TestApplyAnimation:
             # CompositeVideoClip 应该被调用
             mock_composite.assert_called_once()
 
-    @patch('utils.animation_utils.CompositeVideoClip')
-    def test_zoom_in_animation(self, mock_composite):
-        """测试放大动画"""
-        mock_clip = MagicMock()
-        mock_clip.size = (800, 600)
-        mock_clip.duration = 5.0
-
-        # Mock resize 函数
-        def mock_resized_func(new_size=None, resize_func=None):
-            if resize_func:
-                # 模拟调用 resize 函数
-                return MagicMock()
-            return MagicMock()
-
-        mock_clip.resized.side_effect = mock_resized_func
-
-        mock_positioned = MagicMock()
-        mock_clip.resized.return_value.with_position.return_value = mock_positioned
-
-        video_size = (1280, 720)
-        config = AnimationConfig(animation_type=AnimationConfig.ZOOM_IN, intensity=0.1)
-
-        result = apply_animation(mock_clip, config, video_size)
-
-        # 应该调用 CompositeVideoClip
-        mock_composite.assert_called_once()
+    def test_zoom_in_animation(self):
+        """测试放大动画：直接生成视频尺寸的画面，不再合成"""
+        clip = ImageClip(_gradient_image(800, 600), duration=5.0)
+        video_size = (320, 180)
+        config = AnimationConfig(animation_type=AnimationConfig.ZOOM_IN, intensity=0.5)
 
-    @patch('utils.animation_utils.CompositeVideoClip')
-    def test_zoom_out_animation(self, mock_composite):
-        """测试缩小动画"""
-        mock_clip = MagicMock()
-        mock_clip.size = (800, 600)
-        mock_clip.duration = 5.0
-
-        mock_resized = MagicMock()
-        mock_clip.resized.return_value = mock_resized
-
-        mock_positioned = MagicMock()
-        mock_resized.with_position.return_value = mock_positioned
-
-        video_size = (1280, 720)
-        config = AnimationConfig(animation_type=AnimationConfig.ZOOM_OUT, intensity=0.1)
-
-        result = apply_animation(mock_clip, config, video_size)
-
-        mock_composite.assert_called_once()
-
-    @patch('utils.animation_utils.CompositeVideoClip')
-    def test_pan_left_animation(self, mock_composite):
-        """测试向左平移动画"""
-        mock_clip = MagicMock()
-        mock_clip.size = (800, 600)
-        mock_clip.duration = 5.0
-
-        mock_resized = MagicMock()
-        mock_clip.resized.return_value = mock_resized
-
-        mock_positioned = MagicMock()
-        mock_resized.with_position.return_value = mock_positioned
-
-        video_size = (1280, 720)
-        config = AnimationConfig(animation_type=AnimationConfig.PAN_LEFT, intensity=0.1)
+        with patch('utils.animation_utils.CompositeVideoClip') as mock_composite:
+            result = apply_animation(clip, config, video_size)
+            mock_composite.assert_not_called()
+
+        assert result.duration == 5.0
+        first = result.get_frame(0).copy()
+        last = result.get_frame(5.0).copy()
+        assert first.shape == (180, 320, 3)
+        # 放大后可见区域变小，水平渐变的跨度变窄
+        assert np.ptp(last[90, :, 0].astype(int)) < np.ptp(first[90, :, 0].astype(int))
+
+    def test_zoom_out_animation(self):
+        """测试缩小动画：可见区域逐渐变大"""
+        clip = ImageClip(_gradient_image(800, 600), duration=5.0)
+        video_size = (320, 180)
+        config = AnimationConfig(animation_type=AnimationConfig.ZOOM_OUT, intensity=0.5)
+
+        result = apply_animation(clip, config, video_size)
+
+        first = result.get_frame(0).copy()
+        last = result.get_frame(5.0).copy()
+        assert np.ptp(last[90, :, 0].astype(int)) > np.ptp(first[90, :, 0].astype(int))
+
+    def test_pan_left_animation(self):
+        """测试向左平移动画：画面内容向左移动，不再合成"""
+        clip = ImageClip(_gradient_image(800, 600), duration=5.0)
+        video_size = (320, 180)
+        config = AnimationConfig(animation_type=AnimationConfig.PAN_LEFT, intensity=0.5)
 
-        result = apply_animation(mock_clip, config, video_size)
+        with patch('utils.animation_utils.CompositeVideoClip') as mock_composite:
+            result = apply_animation(clip, config, video_size)
+            mock_composite.assert_not_called()
 
-        # 应该设置动态位置
-        mock_resized.with_position.assert_called_once()
-        position_func = mock_resized.with_position.call_args[0][0]
-        assert callable(position_func)
-        mock_composite.assert_called_once()
+        first = result.get_frame(0)
+        last = result.get_frame(5.0)
+        assert first.shape == (180, 320, 3)
+        # 图片向左移动，窗口向右滑动，左边缘的红色值变大
+        assert last[90, 0, 0] > first[90, 0, 0]
+        np.testing.assert_array_equal(last[:, :, 1], first[:, :, 1])
 
-    @patch('utils.animation_utils.CompositeVideoClip')
-    def test_pan_right_animation(self, mock_composite):
+    def test_pan_right_animation(self):
         """测试向右平移动画"""
-        mock_clip = MagicMock()
-        mock_clip.size = (800, 600)
-        mock_clip.duration = 5.0
-
-        mock_resized = MagicMock()
-        mock_clip.resized.return_value = mock_resized
-
-        mock_positioned = MagicMock()
-        mock_resized.with_position.return_value = mock_positioned
+        clip = ImageClip(_gradient_image(800, 600), duration=5.0)
+        config = AnimationConfig(animation_type=AnimationConfig.PAN_RIGHT, intensity=0.5)
 
-        video_size = (1280, 720)
-        config = AnimationConfig(animation_type=AnimationConfig.PAN_RIGHT, intensity=0.1)
+        result = apply_animation(clip, config, (320, 180))
 
-        result = apply_animation(mock_clip, config, video_size)
-        mock_composite.assert_called_once()
+        assert result.get_frame(5.0)[90, 0, 0] < result.get_frame(0)[90, 0, 0]
 
-    @patch('utils.animation_utils.CompositeVideoClip')
-    def test_pan_up_animation(self, mock_composite):
+    def test_pan_up_animation(self):
         """测试向上平移动画"""
-        mock_clip = MagicMock()
-        mock_clip.size = (800, 600)
-        mock_clip.duration = 5.0
-
-        mock_resized = MagicMock()
-        mock_clip.resized.return_value = mock_resized
+        clip = ImageClip(_gradient_image(800, 600), duration=5.0)
+        config = AnimationConfig(animation_type=AnimationConfig.PAN_UP, intensity=0.5)
 
-        mock_positioned = MagicMock()
-        mock_resized.with_position.return_value = mock_positioned
-
-        video_size = (1280, 720)
-        config = AnimationConfig(animation_type=AnimationConfig.PAN_UP, intensity=0.1)
+        result = apply_animation(clip, config, (320, 180))
 
-        result = apply_animation(mock_clip, config, video_size)
-        mock_composite.assert_called_once()
+        first = result.get_frame(0)
+        last = result.get_frame(5.0)
+        assert last[0, 160, 1] > first[0, 160, 1]
+        np.testing.assert_array_equal(last[:, :, 0], first[:, :, 0])
 
-    @patch('utils.animation_utils.CompositeVideoClip')
-    def test_pan_down_animation(self, mock_composite):
+    def test_pan_down_animation(self):
         """测试向下平移动画"""
-        mock_clip = MagicMock()
-        mock_clip.size = (800, 600)
-        mock_clip.duration = 5.0
+        clip = ImageClip(_gradient_image(800, 600), duration=5.0)
+        config = AnimationConfig(animation_type=AnimationConfig.PAN_DOWN, intensity=0.5)
 
-        mock_resized = MagicMock()
-        mock_clip.resized.return_value = mock_resized
-
-        mock_positioned = MagicMock()
-        mock_resized.with_position.return_value = mock_positioned
+        result = apply_animation(clip, config, (320, 180))
 
-        video_size = (1280, 720)
-        config = AnimationConfig(animation_type=AnimationConfig.PAN_DOWN, intensity=0.1)
-
-        result = apply_animation(mock_clip, config, video_size)
-        mock_composite.assert_called_once()
+        assert result.get_frame(5.0)[0, 160, 1] < result.get_frame(0)[0, 160, 1]
 
     def test_unknown_animation_type(self):
         """测试未知的动画类型"""
@@ -349,28 +331,189 @@ class TestApplyAnimation:
 
     def test_custom_easing(self):
         """测试自定义缓动函数"""
-        mock_clip = MagicMock()
-        mock_clip.size = (800, 600)
-        mock_clip.duration = 5.0
+        clip = ImageClip(_gradient_image(800, 600), duration=4.0)
+        video_size = (320, 180)
+        config = AnimationConfig(
+            animation_type=AnimationConfig.ZOOM_IN,
+            easing="ease_in_cubic"
+        )
 
-        mock_resized = MagicMock()
-        mock_clip.resized.return_value = mock_resized
+        with patch.object(EasingCurve, 'ease_in_cubic', wraps=EasingCurve.ease_in_cubic) as mock_easing:
+            result = apply_animation(clip, config, video_size)
+            result.get_frame(1.0)
 
-        mock_positioned = MagicMock()
-        mock_resized.with_position.return_value = mock_positioned
+        # 应该使用自定义缓动函数
+        np.testing.assert_allclose(mock_easing.call_args[0][0], [0.25])
 
-        with patch('utils.animation_utils.CompositeVideoClip') as mock_composite:
-            video_size = (1280, 720)
-            config = AnimationConfig(
-                animation_type=AnimationConfig.ZOOM_IN,
-                easing="ease_in_cubic"
-            )
+    def test_fps_builds_frame_table(self):
+        """测试指定帧率时预先计算每帧的变换参数"""
+        clip = ImageClip(_gradient_image(800, 600), duration=2.0)
+        config = AnimationConfig(animation_type=AnimationConfig.PAN_RIGHT, intensity=0.5)
 
-            result = apply_animation(mock_clip, config, video_size)
+        with patch.object(EasingCurve, 'ease_in_out_quad', wraps=EasingCurve.ease_in_out_quad) as mock_easing:
+            result = apply_animation(clip, config, (320, 180), fps=10)
+            for n in range(21):
+                result.get_frame(n / 10)
 
-            # 应该使用自定义缓动函数
-            assert config.get_easing_function() == EasingCurve.ease_in_cubic
-            mock_composite.assert_called_once()
+        # 缓动函数只在建表时调用一次
+        mock_easing.assert_called_once()
+        assert len(mock_easing.call_args[0][0]) == 21
+
+
+class TestZoomAnimator:
+    """测试裁剪后缩放的缩放动画"""
+
+    def test_matches_full_resize(self):
+        """测试结果与整图缩放后居中裁剪一致"""
+        image = _gradient_image(800, 600)
+        animator = ZoomAnimator(image, (320, 180), 0.5, 2.0, zoom_in=True)
+        scale = animator.end_scale
+        width, height = animator.source.size
+        full = animator.source.resize((round(width * scale), round(height * scale)), Image.Resampling.BILINEAR)
+        left = (full.width - 320) // 2
+        top = (full.height - 180) // 2
+        expected = np.asarray(full)[top:top + 180, left:left + 320].astype(int)
+
+        frame = animator.frame(2.0).astype(int)
+
+        assert np.abs(frame - expected).mean() < 3
+
+    def test_source_scaled_once_to_headroom(self):
+        """测试大图在初始化时缩小到覆盖舞台所需的尺寸"""
+        animator = ZoomAnimator(_gradient_image(1600, 1200), (320, 180), 0.5, 2.0)
+
+        width, height = animator.source.size
+        assert width == int(320 * zoom_headroom(0.5))
+        assert height >= 180 * zoom_headroom(0.5)
+        # 最大缩放时源图与舞台像素一一对应
+        assert animator.end_scale == pytest.approx(1.0, abs=0.01)
+
+    def test_reuses_output_buffer(self):
+        """测试每帧写入同一个缓冲区"""
+        animator = ZoomAnimator(_gradient_image(400, 300), (160, 90), 0.3, 1.0)
+
+        first = animator.frame(0.0)
+        second = animator.frame(0.5)
+
+        assert first is second is animator.output
+        assert first.dtype == np.uint8
+
+    def test_rgba_source(self):
+        """测试带透明通道的源图只使用 RGB 通道"""
+        image = np.dstack([_gradient_image(400, 300), np.full((300, 400), 255, dtype=np.uint8)])
+        animator = ZoomAnimator(image, (160, 90), 0.3, 1.0)
+
+        assert animator.frame(0.3).shape == (90, 160, 3)
+
+
+class TestTransformTable:
+    """测试动画的逐帧变换参数表"""
+
+    def test_zoom_table_matches_direct(self):
+        """测试缩放动画查表结果与逐帧计算一致"""
+        image = _gradient_image(800, 600)
+        easing = EasingCurve.ease_in_out_quad
+        tabled = ZoomAnimator(image, (320, 180), 0.5, 3.0, easing, zoom_in=False, fps=25)
+        direct = ZoomAnimator(image, (320, 180), 0.5, 3.0, easing, zoom_in=False)
+
+        assert tabled.table.shape == (76, 4)
+        assert direct.table is None
+        for n in (0, 13, 40, 75):
+            np.testing.assert_allclose(tabled.transform_at(n / 25), direct.transform_at(n / 25))
+            np.testing.assert_array_equal(tabled.frame(n / 25), direct.frame(n / 25))
+
+    def test_pan_table_matches_direct(self):
+        """测试平移动画查表结果与逐帧计算一致"""
+        image = _gradient_image(800, 600)
+        tabled = PanAnimator(image, (320, 180), 0.5, 2.0, EasingCurve.ease_out_cubic,
+                             AnimationConfig.PAN_DOWN, fps=30)
+        direct = PanAnimator(image, (320, 180), 0.5, 2.0, EasingCurve.ease_out_cubic,
+                             AnimationConfig.PAN_DOWN)
+
+        assert tabled.table.dtype.kind == "i"
+        for n in range(61):
+            np.testing.assert_array_equal(tabled.transform_at(n / 30), direct.transform_at(n / 30))
+
+    def test_lookup_clamps_to_table(self):
+        """测试超出片段时长的时间使用最后一帧"""
+        animator = PanAnimator(_gradient_image(800, 600), (320, 180), 0.5, 1.0, fps=10)
+
+        np.testing.assert_array_equal(animator.transform_at(5.0), animator.table[-1])
+        np.testing.assert_array_equal(animator.transform_at(-1.0), animator.table[0])
+
+
+class TestPanAnimator:
+    """测试基于切片视图的平移动画"""
+
+    def test_frames_are_views(self):
+        """测试每帧都是缩放后图片的切片视图，不复制像素"""
+        animator = PanAnimator(_gradient_image(800, 600), (320, 180), 0.5, 2.0,
+                               direction=AnimationConfig.PAN_RIGHT)
+
+        for t in (0.0, 0.7, 2.0):
+            frame = animator.frame(t)
+            assert frame.shape == (180, 320, 3)
+            assert np.shares_memory(frame, animator.source)
+
+    def test_source_scaled_to_headroom(self):
+        """测试源图按覆盖舞台的余量缩放（小图放大、大图缩小）"""
+        for size in ((200, 150), (1600, 1200)):
+            animator = PanAnimator(_gradient_image(*size), (320, 180), 0.5, 2.0)
+            assert animator.source.shape[1] == int(320 * pan_headroom(0.5))
+
+    def test_pre_scaled_source_not_resampled(self):
+        """测试已按相同余量缩放的图片直接使用"""
+        width, height = int(320 * pan_headroom(0.2)), int(240 * pan_headroom(0.2))
+        image = _gradient_image(width, height)
+        animator = PanAnimator(image, (320, 180), 0.2, 2.0)
+
+        np.testing.assert_array_equal(animator.source, image)
+
+    def test_offsets_symmetric_and_in_bounds(self):
+        """测试平移在居中位置两侧对称，窗口不超出图片"""
+        animator = PanAnimator(_gradient_image(800, 600), (320, 180), 1.0, 2.0,
+                               direction=AnimationConfig.PAN_UP)
+        start = animator.window_origin(0.0)
+        middle = animator.window_origin(0.5)
+        end = animator.window_origin(1.0)
+
+        assert start[0] == middle[0] == end[0]
+        assert start[1] - middle[1] == pytest.approx(middle[1] - end[1], abs=1)
+        # 图片向上移动，窗口向下滑动
+        assert 0 <= start[1] < end[1] <= animator.limit[1]
+
+
+class TestCreateAnimator:
+    """按动画配置创建帧生成器的测试"""
+
+    def test_is_animated(self):
+        """测试只有缩放和平移动画产生运动画面"""
+        assert is_animated(AnimationConfig(animation_type=AnimationConfig.ZOOM_OUT))
+        assert is_animated(AnimationConfig(animation_type=AnimationConfig.PAN_UP))
+        assert not is_animated(AnimationConfig(animation_type=AnimationConfig.NONE))
+        assert not is_animated(AnimationConfig(animation_type="unknown_type"))
+        assert not is_animated(None)
+
+    def test_headroom_by_type(self):
+        """测试源图余量与动画类型对应"""
+        assert animation_headroom(AnimationConfig(AnimationConfig.ZOOM_IN, 0.3)) == zoom_headroom(0.3)
+        assert animation_headroom(AnimationConfig(AnimationConfig.PAN_LEFT, 0.3)) == pan_headroom(0.3)
+        assert animation_headroom(AnimationConfig(AnimationConfig.NONE)) == 1.0
+        assert animation_headroom(None) == 1.0
+
+    def test_creates_matching_animator(self):
+        """测试按动画类型创建生成器，动画时长默认取片段时长"""
+        image = _gradient_image(400, 300)
+        zoom = create_animator(image, (160, 90), AnimationConfig(AnimationConfig.ZOOM_OUT, 0.3), 2.0, fps=10)
+        pan = create_animator(image, (160, 90), AnimationConfig(AnimationConfig.PAN_DOWN, 0.3, duration=1.0),
+                              2.0, fps=10)
+
+        assert isinstance(zoom, ZoomAnimator)
+        assert zoom.start_scale > zoom.end_scale
+        assert zoom.duration == 2.0
+        assert isinstance(pan, PanAnimator)
+        assert pan.duration == 1.0
+        assert create_animator(image, (160, 90), AnimationConfig(AnimationConfig.NONE), 2.0) is None
 
 
 class TestGetRandomAnimationConfig:
@@ -388,6 +531,14 @@ class TestGetRandomAnimationConfig:
         assert config.intensity == 0.1
         assert config.easing == "ease_in_out_quad"
 
+    def test_seeded_rng(self):
+        """测试传入相同种子的随机数生成器得到相同的动画序列"""
+        import random
+        rng_a, rng_b = random.Random(5), random.Random(5)
+        first = [get_random_animation_config(rng=rng_a).animation_type for _ in range(10)]
+        second = [get_random_animation_config(rng=rng_b).animation_type for _ in range(10)]
+        assert first == second
+
     def test_custom_intensity(self):
         """测试自定义强度"""
         config = get_random_animation_config(intensity=0.3)
@@ -439,3 +590,10 @@ class TestGetRandomAnimationConfig:
         assert hasattr(config, 'animation_type')
         assert hasattr(config, 'intensity')
         assert hasattr(config, 'easing')
+
+
+def _gradient_image(width, height):
+    """生成水平方向红色渐变、垂直方向绿色渐变的测试图片"""
+    y, x = np.mgrid[0:height, 0:width]
+    return np.stack([x * 255 // (width - 1), y * 255 // (height - 1), np.zeros_like(x)],
+                    axis=-1).astype(np.uint8)
@@ -1,14 +1,49 @@
 """
 audio_utils.py 模块的单元测试
 """
+import contextlib
 import pytest
 import tempfile
 import numpy as np
 import av
 import os
+import wave
 from unittest.mock import patch, MagicMock
 
-from utils.audio_utils import get_audio_duration_ffmpeg, get_audio_pauses
+from utils.audio_utils import (
+    get_audio_duration_ffmpeg,
+    get_audio_pauses,
+    compute_rms_envelope,
+    compute_audio_envelope,
+    decode_audio_mono,
+    find_silence_runs,
+    filter_min_interval,
+    pauses_from_envelope,
+    probe_audio,
+    AudioProbe,
+    iter_audio_pauses,
+    prefetch_in_background,
+    _PauseTracker,
+    _AudioBlockDecoder,
+    compare_analysis_rates,
+    sweep_pauses_from_envelope,
+    sweep_pause_parameters,
+    LOW_ANALYSIS_RATE,
+    SILENCE_FLOOR_DB,
+    compute_onset_envelope,
+    pick_onsets,
+    estimate_tempo,
+    track_beats,
+    detect_beats,
+    beats_to_change_points,
+    get_beat_change_points,
+    compute_audio_envelope_parallel,
+    read_wav_header,
+    map_wav,
+    find_pause_candidates,
+    PauseCandidate,
+    PCMReader,
+)
 
 
 class TestGetAudioDuration:
@@ -206,3 +241,649 @@ class TestGetAudioPauses:
 
             assert isinstance(pauses1, list)
             assert isinstance(pauses2, list)
+
+
+class TestComputeRmsEnvelope:
+    """compute_rms_envelope 函数的测试"""
+
+    def test_matches_naive_rms(self):
+        """测试累积和结果与逐窗口计算一致"""
+        rng = np.random.default_rng(0)
+        pcm = rng.uniform(-0.5, 0.5, 1000).astype(np.float32)
+        envelope = compute_rms_envelope(pcm, sample_rate=1000, window=0.1)
+
+        assert len(envelope) == 10
+        for i, value in enumerate(envelope):
+            chunk = pcm[i * 100:(i + 1) * 100].astype(np.float64)
+            expected = 20 * np.log10(np.sqrt(np.mean(chunk ** 2)))
+            assert abs(value - expected) < 1e-6
+
+    def test_partial_last_window(self):
+        """测试末尾不足一个窗口的采样"""
+        pcm = np.full(250, 0.5, dtype=np.float32)
+        envelope = compute_rms_envelope(pcm, sample_rate=1000, window=0.1)
+        assert len(envelope) == 3
+        assert np.allclose(envelope, 20 * np.log10(0.5))
+
+    def test_zero_signal(self):
+        """测试全零信号使用 dB 下限"""
+        envelope = compute_rms_envelope(np.zeros(300), sample_rate=1000, window=0.1)
+        assert np.all(envelope == SILENCE_FLOOR_DB)
+
+    def test_empty_signal(self):
+        """测试空信号"""
+        envelope = compute_rms_envelope(np.zeros(0), sample_rate=1000, window=0.1)
+        assert envelope.size == 0
+
+
+class TestFindSilenceRuns:
+    """find_silence_runs 函数的测试"""
+
+    def test_runs(self):
+        """测试游程编码结果"""
+        envelope = np.array([-10, -50, -50, -10, -60, -10, -50, -50, -50])
+        starts, lengths = find_silence_runs(envelope, noise_threshold=-35)
+        assert starts.tolist() == [1, 4, 6]
+        assert lengths.tolist() == [2, 1, 3]
+
+    def test_no_silence(self):
+        """测试没有静音"""
+        starts, lengths = find_silence_runs(np.array([-10.0, -20.0]), -35)
+        assert starts.size == 0 and lengths.size == 0
+
+    def test_empty(self):
+        """测试空包络"""
+        starts, lengths = find_silence_runs(np.array([]), -35)
+        assert starts.size == 0
+
+
+class TestPausesFromEnvelope:
+    """pauses_from_envelope 和 filter_min_interval 的测试"""
+
+    def test_min_pause(self):
+        """测试最小停顿时长过滤"""
+        # 窗口 0.1 秒：静音区间 [0.2, 0.5) 和 [0.7, 0.8)
+        envelope = np.array([-10, -10, -50, -50, -50, -10, -10, -50, -10], dtype=float)
+        pauses = pauses_from_envelope(envelope, 0.1, min_pause=0.3,
+                                      noise_threshold=-35, min_interval=0)
+        assert pauses == pytest.approx([0.2])
+
+    def test_trailing_silence_uses_duration(self):
+        """测试结尾静音按音频总时长计算"""
+        envelope = np.array([-10, -10, -50, -50], dtype=float)
+        pauses = pauses_from_envelope(envelope, 0.1, min_pause=0.2, noise_threshold=-35,
+                                      min_interval=0, duration=0.35)
+        assert pauses == []
+        pauses = pauses_from_envelope(envelope, 0.1, min_pause=0.15, noise_threshold=-35,
+                                      min_interval=0, duration=0.35)
+        assert pauses == pytest.approx([0.2])
+
+    def test_start_time_offset(self):
+        """测试起始时间偏移"""
+        envelope = np.array([-10, -50, -50], dtype=float)
+        pauses = pauses_from_envelope(envelope, 0.5, min_pause=1.0, noise_threshold=-35,
+                                      min_interval=0, start_time=2.0)
+        assert pauses == pytest.approx([2.5])
+
+    def test_filter_min_interval(self):
+        """测试最小间隔过滤"""
+        assert filter_min_interval([1.0, 5.5, 7.0, 12.0], 5.0) == [5.5, 12.0]
+        assert filter_min_interval([1.0, 2.0], 0) == [1.0, 2.0]
+        assert filter_min_interval([], 5.0) == []
+
+
+class TestAudioEnvelopeFromFile:
+    """基于真实 WAV 文件的包络和停顿检测测试"""
+
+    def test_decode_audio_mono(self, temp_wav_file):
+        """测试解码为连续单声道 PCM"""
+        path = temp_wav_file([(1.0, 0.5)], sample_rate=8000)
+        pcm, sample_rate = decode_audio_mono(path)
+        assert sample_rate == 8000
+        assert pcm.dtype == np.float32
+        assert pcm.shape == (8000,)
+        assert abs(np.max(np.abs(pcm)) - 0.5) < 0.01
+
+        # 多声道在解码器内下混为单声道
+        stereo_path = temp_wav_file([(1.0, 0.5)], sample_rate=8000, channels=2)
+        stereo_pcm, _ = decode_audio_mono(stereo_path)
+        assert stereo_pcm.shape == (8000,)
+
+    def test_envelope_matches_in_memory(self, temp_wav_file):
+        """测试分块解码的包络与一次性计算一致"""
+        path = temp_wav_file([(1.0, 0.3), (0.5, 0.0), (0.7, 0.3)], sample_rate=8000)
+        envelope, window, start_time, duration = compute_audio_envelope(path, window=0.03)
+        pcm, sample_rate = decode_audio_mono(path)
+        expected = compute_rms_envelope(pcm, sample_rate, window=0.03)
+
+        assert start_time == 0.0
+        assert abs(duration - 2.2) < 1e-6
+        assert abs(window - 0.03) < 1e-9
+        assert np.allclose(envelope, expected)
+
+    def test_pauses_detected(self, temp_wav_file):
+        """测试检测到真实停顿"""
+        path = temp_wav_file([(2.0, 0.3), (1.0, 0.0), (3.0, 0.3), (0.2, 0.0), (2.0, 0.3)])
+        pauses = get_audio_pauses(path, min_pause=0.5, noise_threshold=-35, min_interval=0)
+        assert len(pauses) == 1
+        assert abs(pauses[0] - 2.0) < 0.05
+
+    def test_window_independent_of_frames(self, temp_wav_file):
+        """测试不同窗口长度得到一致的停顿点"""
+        path = temp_wav_file([(2.0, 0.3), (1.0, 0.0), (2.0, 0.3), (1.0, 0.0), (1.0, 0.3)])
+        coarse = get_audio_pauses(path, min_pause=0.5, min_interval=0, window=0.05)
+        fine = get_audio_pauses(path, min_pause=0.5, min_interval=0, window=0.01)
+        assert len(coarse) == len(fine) == 2
+        assert np.allclose(coarse, fine, atol=0.05)
+        assert np.allclose(fine, [2.0, 5.0], atol=0.02)
+
+
+class TestProbeAudio:
+    """probe_audio 函数的测试"""
+
+    def test_probe_fields(self, temp_wav_file):
+        """测试一次探测得到全部信息"""
+        path = temp_wav_file([(2.0, 0.3), (1.0, 0.0), (2.0, 0.3)], sample_rate=8000)
+        probe = probe_audio(path, min_pause=0.5, min_interval=0)
+
+        assert isinstance(probe, AudioProbe)
+        assert abs(probe.duration - 5.0) < 1e-6
+        assert probe.sample_rate == 8000
+        assert probe.channels == 1
+        assert len(probe.envelope) == int(np.ceil(5.0 / probe.window))
+        assert len(probe.pause_points) == 1
+        assert probe.pcm is None
+
+    def test_keep_pcm(self, temp_wav_file):
+        """测试保留原声道布局的 PCM"""
+        path = temp_wav_file([(1.0, 0.5)], sample_rate=8000, channels=2)
+        probe = probe_audio(path, keep_pcm=True)
+
+        assert probe.pcm.shape == (8000, 2)
+        assert probe.pcm.dtype == np.float32
+        assert abs(np.max(np.abs(probe.pcm)) - 0.5) < 0.01
+
+    def test_pauses_from_probe(self, temp_wav_file):
+        """测试使用其他参数从包络重新计算停顿点"""
+        path = temp_wav_file([(2.0, 0.3), (1.0, 0.0), (2.0, 0.3), (0.6, 0.0), (1.0, 0.3)])
+        probe = probe_audio(path, min_pause=0.5, min_interval=0)
+        assert len(probe.pause_points) == 2
+        assert len(probe.pauses(min_pause=0.8, min_interval=0)) == 1
+
+    def test_cached_probe(self, temp_wav_file, temp_dir):
+        """测试缓存命中时不解码且结果一致"""
+        path = temp_wav_file([(2.0, 0.3), (1.0, 0.0), (2.0, 0.3)])
+        cache_dir = os.path.join(temp_dir, "cache")
+        first = probe_audio(path, min_pause=0.5, min_interval=0, cache_dir=cache_dir)
+
+        with patch('utils.audio_utils.av.open', side_effect=AssertionError("不应重新解码")):
+            second = probe_audio(path, min_pause=0.5, min_interval=0, keep_pcm=True,
+                                 cache_dir=cache_dir)
+
+        assert second.duration == first.duration
+        assert second.pause_points == pytest.approx(first.pause_points)
+        assert np.allclose(second.envelope, first.envelope, atol=1e-4)
+        assert second.pcm is None
+
+    def test_cached_probe_other_params(self, temp_wav_file, temp_dir):
+        """测试缓存命中时按新的停顿参数从包络重新计算"""
+        path = temp_wav_file([(2.0, 0.3), (1.0, 0.0), (2.0, 0.3)])
+        cache_dir = os.path.join(temp_dir, "cache")
+        probe_audio(path, min_pause=0.5, min_interval=0, cache_dir=cache_dir)
+        assert len(probe_audio(path, min_pause=0.5, min_interval=0, cache_dir=cache_dir).pause_points) == 1
+        assert probe_audio(path, min_pause=1.5, min_interval=0, cache_dir=cache_dir).pause_points == []
+
+    def test_failed_probe_not_cached(self, temp_wav_file, temp_dir):
+        """测试分析失败时不写入缓存"""
+        path = temp_wav_file([(1.0, 0.3)])
+        cache_dir = os.path.join(temp_dir, "cache")
+        with patch('utils.audio_utils._AudioBlockDecoder.blocks', side_effect=Exception("boom")):
+            with pytest.raises(RuntimeError):
+                probe_audio(path, cache_dir=cache_dir)
+        assert os.listdir(os.path.join(cache_dir, "audio")) == []
+
+    def test_decode_error(self):
+        """测试无法解码时抛出 RuntimeError"""
+        with pytest.raises(RuntimeError):
+            probe_audio("nonexistent.wav")
+
+
+class TestStreamingPauses:
+    """流式停顿检测的测试"""
+
+    @pytest.mark.parametrize("min_interval", [0, 0.5])
+    def test_tracker_matches_batch(self, min_interval):
+        """测试任意分块方式下增量结果与整体计算一致"""
+        rng = np.random.default_rng(1)
+        envelope = np.where(rng.random(2000) < 0.6, -60.0, -10.0)
+        # 制造一些较长的静音区间
+        for start in rng.integers(0, 1900, 30):
+            envelope[start:start + rng.integers(5, 60)] = -60.0
+        expected = pauses_from_envelope(envelope, 0.01, min_pause=0.1, noise_threshold=-35,
+                                        min_interval=min_interval, duration=20.0)
+
+        for _ in range(5):
+            cuts = np.sort(rng.integers(0, len(envelope), 10))
+            tracker = _PauseTracker(0.01, min_pause=0.1, noise_threshold=-35,
+                                    min_interval=min_interval)
+            points = []
+            for chunk in np.split(envelope, cuts):
+                points += tracker.feed(chunk)
+            points += tracker.finish(20.0)
+            assert points == pytest.approx(expected)
+
+    def test_trailing_silence(self):
+        """测试结尾静音在结束时确认"""
+        tracker = _PauseTracker(0.1, min_pause=0.3, noise_threshold=-35, min_interval=0)
+        assert tracker.feed(np.array([-10.0, -50.0, -50.0])) == []
+        assert tracker.finish(0.35) == []
+
+        tracker = _PauseTracker(0.1, min_pause=0.2, noise_threshold=-35, min_interval=0)
+        assert tracker.feed(np.array([-10.0, -50.0, -50.0])) == pytest.approx([0.1])
+        assert tracker.finish(0.3) == []
+
+    def test_iter_matches_get_audio_pauses(self, temp_wav_file):
+        """测试生成器结果与 get_audio_pauses 一致"""
+        path = temp_wav_file([(2.0, 0.3), (1.0, 0.0), (3.0, 0.3), (0.8, 0.0), (1.0, 0.3), (0.9, 0.0)])
+        expected = get_audio_pauses(path, min_pause=0.5, min_interval=0)
+        assert list(iter_audio_pauses(path, min_pause=0.5, min_interval=0)) == pytest.approx(expected)
+        assert len(expected) == 3
+
+    def test_iter_fills_cache(self, temp_wav_file, temp_dir):
+        """测试流式分析完成后写入缓存"""
+        path = temp_wav_file([(2.0, 0.3), (1.0, 0.0), (2.0, 0.3)])
+        cache_dir = os.path.join(temp_dir, "cache")
+        streamed = list(iter_audio_pauses(path, min_pause=0.5, min_interval=0, cache_dir=cache_dir))
+
+        with patch('utils.audio_utils.av.open', side_effect=AssertionError("不应重新解码")):
+            cached = list(iter_audio_pauses(path, min_pause=0.5, min_interval=0, cache_dir=cache_dir))
+            probe = probe_audio(path, min_pause=0.5, min_interval=0, cache_dir=cache_dir)
+
+        assert cached == pytest.approx(streamed)
+        assert abs(probe.duration - 5.0) < 1e-6
+
+    def test_prefetch_in_background(self):
+        """测试后台预取保持顺序并传递异常"""
+        assert list(prefetch_in_background(iter(range(100)), max_buffered=4)) == list(range(100))
+
+        def failing():
+            yield 1
+            raise ValueError("boom")
+
+        results = prefetch_in_background(failing())
+        assert next(results) == 1
+        with pytest.raises(ValueError):
+            next(results)
+
+
+class TestLowRateAnalysis:
+    """低采样率分析模式的测试"""
+
+    def test_decode_at_low_rate(self, temp_wav_file):
+        """测试在解码器内重采样到低采样率"""
+        path = temp_wav_file([(1.0, 0.3)], sample_rate=44100)
+        pcm, sample_rate = decode_audio_mono(path, analysis_rate=LOW_ANALYSIS_RATE)
+        assert sample_rate == LOW_ANALYSIS_RATE
+        assert abs(len(pcm) - LOW_ANALYSIS_RATE) <= 32
+
+    def test_pauses_close_to_full_rate(self, temp_wav_file):
+        """测试低采样率结果与原采样率接近"""
+        path = temp_wav_file([(2.0, 0.3), (1.0, 0.0), (3.0, 0.3), (0.8, 0.0), (1.0, 0.3)],
+                             sample_rate=44100)
+        full = get_audio_pauses(path, min_pause=0.5, min_interval=0)
+        low = get_audio_pauses(path, min_pause=0.5, min_interval=0, analysis_rate=LOW_ANALYSIS_RATE)
+        assert len(full) == len(low) == 2
+        assert np.allclose(full, low, atol=0.03)
+
+    def test_probe_keeps_full_rate_pcm(self, temp_wav_file):
+        """测试低采样率分析时 PCM 仍保持原采样率"""
+        path = temp_wav_file([(1.0, 0.3), (1.0, 0.0)], sample_rate=22050)
+        probe = probe_audio(path, min_pause=0.5, min_interval=0, keep_pcm=True,
+                            analysis_rate=LOW_ANALYSIS_RATE)
+        assert probe.sample_rate == 22050
+        assert probe.pcm.shape[0] == 44100
+        assert abs(probe.duration - 2.0) < 0.01
+        assert probe.pause_points == pytest.approx([1.0], abs=0.03)
+
+    def test_compare_report(self, temp_wav_file):
+        """测试对比报告"""
+        path = temp_wav_file([(2.0, 0.3), (1.0, 0.0), (3.0, 0.3), (0.8, 0.0), (1.0, 0.3)],
+                             sample_rate=44100)
+        report = compare_analysis_rates(path, min_pause=0.5, min_interval=0)
+        assert report["matched"] == 2
+        assert report["missing"] == [] and report["extra"] == []
+        assert report["max_shift"] < 0.05
+        assert report["envelope_mean_abs_db"] < 3.0
+        assert report["full_seconds"] > 0 and report["low_seconds"] > 0
+
+
+class TestPauseSweep:
+    """停顿参数扫描的测试"""
+
+    def test_grid_matches_individual_runs(self):
+        """测试每个组合的结果与单独计算一致"""
+        rng = np.random.default_rng(2)
+        envelope = rng.uniform(-70, -10, 3000)
+        for start in rng.integers(0, 2900, 40):
+            envelope[start:start + rng.integers(10, 80)] = -55.0
+        grid = dict(min_pauses=[0.2, 0.5], noise_thresholds=[-50, -35], min_intervals=[0, 2.0])
+
+        results = sweep_pauses_from_envelope(envelope, 0.01, duration=30.0, **grid)
+
+        assert len(results) == 8
+        for row in results:
+            expected = pauses_from_envelope(envelope, 0.01, min_pause=row["min_pause"],
+                                            noise_threshold=row["noise_threshold"],
+                                            min_interval=row["min_interval"], duration=30.0)
+            assert row["pauses_ms"] == [int(round(p * 1000)) for p in expected]
+            assert row["segments"] == len(expected) + 1
+
+    def test_segment_stats(self):
+        """测试片段统计（毫秒）"""
+        envelope = np.array([-10, -10, -50, -50, -10, -10, -10, -10], dtype=float)
+        results = sweep_pauses_from_envelope(envelope, 0.5, [0.5], [-35], [0], duration=4.0)
+        assert results[0]["pauses_ms"] == [1000]
+        assert results[0]["shortest_segment_ms"] == 1000
+        assert results[0]["longest_segment_ms"] == 3000
+
+    def test_sweep_decodes_once(self, temp_wav_file):
+        """测试整组参数只解码一次音频"""
+        path = temp_wav_file([(2.0, 0.3), (1.0, 0.0), (3.0, 0.3), (0.6, 0.0), (1.0, 0.3)])
+        with patch('utils.audio_utils._AudioBlockDecoder', wraps=_AudioBlockDecoder) as mock_decoder:
+            results = sweep_pause_parameters(path, [0.5, 0.8], [-40, -35], [0, 5.0])
+        assert mock_decoder.call_count == 1
+        by_params = {(r["min_pause"], r["noise_threshold"], r["min_interval"]): r for r in results}
+        assert by_params[(0.5, -35, 0)]["segments"] == 3
+        assert by_params[(0.8, -35, 0)]["segments"] == 2
+
+
+def _click_track(bpm, duration, sample_rate=11025, first=0.3):
+    """生成固定速度的点击音轨"""
+    pcm = np.zeros(int(duration * sample_rate), dtype=np.float32)
+    burst = int(0.03 * sample_rate)
+    t = np.arange(burst) / sample_rate
+    click = (np.sin(2 * np.pi * 1000 * t) * np.exp(-t / 0.005)).astype(np.float32)
+    for beat in np.arange(first, duration, 60.0 / bpm):
+        i = int(beat * sample_rate)
+        pcm[i:i + burst] += click[:len(pcm) - i]
+    return pcm
+
+
+class TestBeatDetection:
+    """起音和节拍检测的测试"""
+
+    def test_onset_envelope_peaks_at_clicks(self):
+        """测试谱通量在点击处出现峰值"""
+        pcm = _click_track(120, 5.0)
+        onset_env, frame_rate = compute_onset_envelope(pcm, 11025)
+        assert frame_rate == pytest.approx(11025 / 256)
+        onsets = pick_onsets(onset_env, frame_rate)
+        assert len(onsets) == 10
+        # 帧起点时间早于点击不超过一帧长度
+        for onset, click in zip(onsets, np.arange(0.3, 5.0, 0.5)):
+            assert click - 1024 / 11025 <= onset <= click + 0.03
+
+    def test_onset_envelope_batching(self):
+        """测试分批 FFT 与一次性计算结果一致"""
+        pcm = np.random.default_rng(0).standard_normal(50000).astype(np.float32)
+        whole, _ = compute_onset_envelope(pcm, 11025, batch_frames=10000)
+        batched, _ = compute_onset_envelope(pcm, 11025, batch_frames=7)
+        np.testing.assert_allclose(whole, batched, rtol=1e-5)
+
+    def test_short_signal(self):
+        """测试短于一帧的信号"""
+        onset_env, _ = compute_onset_envelope(np.zeros(100), 11025)
+        assert len(onset_env) == 0
+        assert pick_onsets(onset_env, 43.0) == []
+        assert estimate_tempo(onset_env, 43.0) == (0.0, 0)
+
+    @pytest.mark.parametrize("bpm", [90, 128, 150])
+    def test_estimate_tempo(self, bpm):
+        """测试速度估计"""
+        onset_env, frame_rate = compute_onset_envelope(_click_track(bpm, 30.0), 11025)
+        tempo, period = estimate_tempo(onset_env, frame_rate)
+        assert tempo == pytest.approx(bpm, rel=0.03)
+        assert period > 0
+
+    def test_track_beats_aligned(self):
+        """测试节拍与点击位置对齐"""
+        onset_env, frame_rate = compute_onset_envelope(_click_track(120, 20.0), 11025)
+        _, period = estimate_tempo(onset_env, frame_rate)
+        beats = track_beats(onset_env, period) / frame_rate
+        clicks = np.arange(0.3, 20.0, 0.5)
+        assert abs(len(beats) - len(clicks)) <= 1
+        offsets = [np.min(np.abs(clicks - (b + 512 / 11025))) for b in beats]
+        assert max(offsets) < 0.05
+
+    def test_detect_beats_from_file(self, temp_wav_file):
+        """测试从音频文件检测节拍"""
+        segments = [(0.3, 0.0)] + [(0.05, 0.8), (0.45, 0.0)] * 40
+        path = temp_wav_file(segments, sample_rate=22050)
+        analysis = detect_beats(path)
+        assert analysis.tempo == pytest.approx(120, rel=0.03)
+        assert analysis.duration == pytest.approx(20.3, abs=0.01)
+        assert len(analysis.beat_times) >= 38
+        assert len(analysis.onset_times) >= 38
+
+    def test_beats_to_change_points(self):
+        """测试每隔若干节拍选取切换点并保持最小间隔"""
+        beats = list(np.arange(0.0, 60.0, 0.5))
+        points = beats_to_change_points(beats, beats_per_change=8, min_interval=5.0, duration=60.0)
+        assert points[0] == 8.0
+        assert all(b - a >= 5.0 for a, b in zip([0.0] + points, points + [60.0]))
+        with pytest.raises(ValueError):
+            beats_to_change_points(beats, beats_per_change=0)
+
+    def test_change_points_cached(self, temp_wav_file, temp_dir):
+        """测试节拍结果写入缓存，再次调用不解码"""
+        segments = [(0.3, 0.0)] + [(0.05, 0.8), (0.45, 0.0)] * 40
+        path = temp_wav_file(segments, sample_rate=22050)
+        first = get_beat_change_points(path, cache_dir=temp_dir)
+        with patch('utils.audio_utils.av.open') as mock_av_open:
+            second = get_beat_change_points(path, cache_dir=temp_dir)
+            mock_av_open.assert_not_called()
+        assert first == second
+        assert len(first) >= 1
+
+
+class TestParallelAnalysis:
+    """分块并行分析的测试"""
+
+    SEGMENTS = [(2.0, 0.3), (1.2, 0.0), (3.1, 0.3), (0.8, 0.0), (2.5, 0.3), (1.0, 0.0), (1.4, 0.3)]
+
+    def test_envelope_matches_sequential(self, temp_wav_file):
+        """测试并行包络与顺序包络一致"""
+        path = temp_wav_file(self.SEGMENTS)
+        sequential = compute_audio_envelope(path)
+        parallel = compute_audio_envelope_parallel(path, workers=2, chunk_duration=1.7)
+        np.testing.assert_allclose(parallel[0], sequential[0], atol=1e-6)
+        assert parallel[1:] == pytest.approx(sequential[1:])
+
+    def test_silence_across_chunk_boundary(self, temp_wav_file):
+        """测试跨越分块边界的静音区间被完整检测"""
+        path = temp_wav_file(self.SEGMENTS)
+        # 分块边界 2.5 秒落在 2.0-3.2 秒的静音区间内
+        envelope_db, window, start_time, duration = compute_audio_envelope_parallel(
+            path, workers=2, chunk_duration=2.5
+        )
+        pauses = pauses_from_envelope(envelope_db, window, min_pause=1.0, noise_threshold=-35,
+                                      min_interval=0, start_time=start_time, duration=duration)
+        assert pauses == pytest.approx([2.0, 9.6], abs=0.03)
+
+    def test_low_rate_pauses_match(self, temp_wav_file):
+        """测试低采样率下并行与顺序的停顿点一致"""
+        path = temp_wav_file(self.SEGMENTS)
+        sequential = compute_audio_envelope(path, analysis_rate=LOW_ANALYSIS_RATE)
+        parallel = compute_audio_envelope_parallel(path, analysis_rate=LOW_ANALYSIS_RATE,
+                                                   workers=3, chunk_duration=1.3)
+        params = dict(min_pause=0.5, noise_threshold=-35, min_interval=0)
+        assert pauses_from_envelope(parallel[0], parallel[1], start_time=parallel[2],
+                                    duration=parallel[3], **params) == \
+            pauses_from_envelope(sequential[0], sequential[1], start_time=sequential[2],
+                                 duration=sequential[3], **params)
+
+    def test_short_file_falls_back(self, temp_wav_file):
+        """测试时长不足一个分块时退回顺序分析"""
+        path = temp_wav_file(self.SEGMENTS)
+        with patch('utils.audio_utils.ProcessPoolExecutor') as mock_executor:
+            pauses = get_audio_pauses(path, min_pause=0.5, min_interval=0, workers=4)
+            mock_executor.assert_not_called()
+        assert pauses == get_audio_pauses(path, min_pause=0.5, min_interval=0)
+
+    def test_probe_with_workers(self, temp_wav_file):
+        """测试并行探测不保留 PCM，其余字段与顺序探测一致"""
+        path = temp_wav_file(self.SEGMENTS, channels=2)
+        sequential = probe_audio(path, min_pause=0.5, min_interval=0)
+        parallel = probe_audio(path, min_pause=0.5, min_interval=0, keep_pcm=True, workers=2)
+        assert parallel.pcm is None
+        assert parallel.channels == 2
+        assert parallel.pause_points == sequential.pause_points
+        assert parallel.duration == pytest.approx(sequential.duration)
+
+
+class TestWavFastPath:
+    """未压缩 WAV 内存映射快速路径的测试"""
+
+    @staticmethod
+    def _without_fast_path():
+        """让 _AudioBlockDecoder 退回 PyAV 解码"""
+        return patch('utils.audio_utils.read_wav_header', return_value=None)
+
+    def test_read_wav_header(self, temp_wav_file):
+        """测试解析 RIFF 头"""
+        path = temp_wav_file([(1.0, 0.3)], sample_rate=22050, channels=2)
+        info = read_wav_header(path)
+        assert info.sample_rate == 22050
+        assert info.channels == 2
+        assert info.dtype == np.dtype("<i2")
+        assert info.n_frames == 22050
+        assert info.data_offset == 44
+
+    def test_non_wav_returns_none(self, temp_dir):
+        """测试非 WAV 文件和不存在的文件返回 None"""
+        path = os.path.join(temp_dir, "fake.wav")
+        with open(path, "wb") as f:
+            f.write(b"ID3" + b"\x00" * 100)
+        assert read_wav_header(path) is None
+        assert read_wav_header(os.path.join(temp_dir, "missing.wav")) is None
+
+    def test_unsupported_bit_depth(self, temp_dir):
+        """测试 24 位 WAV 不走快速路径"""
+        path = os.path.join(temp_dir, "s24.wav")
+        with wave.open(path, "wb") as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(3)
+            wav.setframerate(8000)
+            wav.writeframes(b"\x00" * 300)
+        assert read_wav_header(path) is None
+
+    def test_map_wav(self, temp_wav_file):
+        """测试内存映射得到原始采样"""
+        path = temp_wav_file([(0.5, 0.5)], channels=2)
+        mapped = map_wav(path)
+        assert isinstance(mapped, np.memmap)
+        assert mapped.shape == (8000, 2)
+        assert np.abs(mapped).max() == pytest.approx(0.5 * 32767, abs=2)
+
+    @pytest.mark.parametrize("channels", [1, 2])
+    def test_matches_pyav(self, temp_wav_file, channels):
+        """测试快速路径与 PyAV 解码的包络和 PCM 一致"""
+        path = temp_wav_file([(1.0, 0.3), (0.7, 0.0), (1.3, 0.6)], channels=channels)
+        fast = probe_audio(path, keep_pcm=True, min_interval=0)
+        with self._without_fast_path():
+            slow = probe_audio(path, keep_pcm=True, min_interval=0)
+        np.testing.assert_allclose(fast.envelope, slow.envelope, atol=1e-4)
+        np.testing.assert_allclose(fast.pcm, slow.pcm, atol=1e-6)
+        assert fast.duration == pytest.approx(slow.duration)
+        assert fast.pause_points == slow.pause_points
+
+    def test_no_pyav_decode(self, temp_wav_file):
+        """测试 WAV 分析不经过 PyAV"""
+        path = temp_wav_file([(1.0, 0.3), (0.7, 0.0), (1.3, 0.3)])
+        with patch('utils.audio_utils.av.open', side_effect=AssertionError("不应使用 PyAV")):
+            pauses = get_audio_pauses(path, min_interval=0)
+        assert pauses == pytest.approx([1.0], abs=0.03)
+
+    def test_resampling_falls_back(self, temp_wav_file):
+        """测试需要重采样时仍使用 PyAV"""
+        path = temp_wav_file([(1.0, 0.3)])
+        with patch('utils.audio_utils.av.open', wraps=av.open) as mock_av_open:
+            pcm, rate = decode_audio_mono(path, analysis_rate=LOW_ANALYSIS_RATE)
+        assert mock_av_open.call_count == 1
+        assert rate == LOW_ANALYSIS_RATE
+
+    def test_low_rate_decimates_mapped_wav(self, temp_wav_file):
+        """测试低采样率包络分析仍走内存映射路径，按整数步长抽取且停顿点与原采样率一致"""
+        path = temp_wav_file([(1.0, 0.3), (0.7, 0.0), (1.3, 0.6)], sample_rate=44100, channels=2)
+        full = probe_audio(path, min_interval=0)
+        with patch('utils.audio_utils.av.open', side_effect=AssertionError("不应使用 PyAV")):
+            low = probe_audio(path, keep_pcm=True, min_interval=0, analysis_rate=LOW_ANALYSIS_RATE)
+        # 44100 / 5 = 8820 是不低于 8000 的整数采样率，0.025 秒窗口取整为 220 个采样
+        assert low.window == pytest.approx(220 / 8820)
+        assert low.pcm.shape == (int(3.0 * 44100), 2)
+        assert low.duration == pytest.approx(full.duration)
+        assert low.pause_points == pytest.approx(full.pause_points, abs=0.03)
+        np.testing.assert_allclose(low.envelope[:10], full.envelope[:10], atol=0.5)
+
+
+class TestPauseCandidates:
+    """停顿候选的测试"""
+
+    def test_candidates_not_filtered_by_interval(self):
+        """测试候选不做最小间隔过滤，并给出时长和深度"""
+        envelope = np.array([-10, -50, -50, -10, -70, -70, -70, -10], dtype=float)
+        candidates = find_pause_candidates(envelope, 0.5, min_pause=0.5, noise_threshold=-35)
+        assert [c.time for c in candidates] == [0.5, 2.0]
+        assert [c.length for c in candidates] == [1.0, 1.5]
+        assert [c.depth for c in candidates] == [15.0, 35.0]
+
+    def test_min_pause(self):
+        """测试过短的静音不作为候选"""
+        envelope = np.array([-10, -50, -10, -50, -50, -10], dtype=float)
+        candidates = find_pause_candidates(envelope, 0.5, min_pause=1.0, noise_threshold=-35)
+        assert [c.time for c in candidates] == [1.5]
+
+    def test_score_prefers_longer_and_deeper(self):
+        """测试更长、更安静的停顿评分更高"""
+        base = PauseCandidate(time=1.0, length=0.5, depth=5.0)
+        assert PauseCandidate(time=1.0, length=1.0, depth=5.0).score > base.score
+        assert PauseCandidate(time=1.0, length=0.5, depth=30.0).score > base.score
+
+    def test_probe_candidates(self, temp_wav_file):
+        """测试从探测结果列出候选"""
+        path = temp_wav_file([(2.0, 0.3), (1.0, 0.0), (1.0, 0.3), (0.6, 0.0), (1.0, 0.3)])
+        probe = probe_audio(path, min_pause=0.5, min_interval=1.0)
+        assert len(probe.pause_points) == 2
+        assert probe.pauses(min_pause=0.5, min_interval=3.0) == [4.0]
+        candidates = probe.candidates(min_pause=0.5)
+        assert [round(c.time, 2) for c in candidates] == [2.0, 4.0]
+        assert candidates[0].depth > 30
+
+
+class TestPCMReader:
+    """按采样数顺序读取 PCM 的测试"""
+
+    @pytest.mark.parametrize("fast_path", [True, False])
+    def test_matches_full_decode(self, temp_wav_file, fast_path):
+        """测试按任意长度分段读取的结果与整段解码一致（内存映射和 PyAV 解码两种路径）"""
+        path = temp_wav_file([(1.0, 0.3), (0.5, 0.0), (0.7, 0.6)], channels=2)
+        header = None if fast_path else patch('utils.audio_utils.read_wav_header', return_value=None)
+        with header or contextlib.nullcontext():
+            probe = probe_audio(path, keep_pcm=True)
+            expected, sample_rate = probe.pcm, probe.sample_rate
+            chunks = []
+            with PCMReader(path, block_size=3000) as reader:
+                assert (reader.sample_rate, reader.channels) == (sample_rate, 2)
+                for count in [1, 1600, 4999, 7000] * 10:
+                    chunks.append(reader.read(count))
+                    if len(chunks[-1]) < count:
+                        break
+                assert len(reader.read(100)) == 0
+        np.testing.assert_allclose(np.concatenate(chunks), expected, atol=1e-6)
+
+    def test_read_past_end(self, temp_wav_file):
+        """测试读到结尾后返回空数组"""
+        path = temp_wav_file([(0.1, 0.5)])
+        with PCMReader(path) as reader:
+            assert reader.read(10000).shape == (1600, 1)
+            assert reader.read(10).shape == (0, 1)
@@ -0,0 +1,106 @@
+"""
+cache_utils.py 模块的单元测试
+"""
+import os
+import pytest
+
+from utils.cache_utils import DiskCache, file_fingerprint, make_cache_key
+
+
+class TestFileFingerprint:
+    """file_fingerprint 函数的测试"""
+
+    def test_fingerprint_fields(self, temp_dir):
+        """测试指纹包含大小、修改时间和哈希"""
+        path = os.path.join(temp_dir, "a.bin")
+        with open(path, "wb") as f:
+            f.write(b"hello")
+
+        fingerprint = file_fingerprint(path)
+        assert fingerprint["size"] == 5
+        assert isinstance(fingerprint["mtime_ns"], int)
+        assert len(fingerprint["hash"]) == 32
+
+    def test_content_change_changes_hash(self, temp_dir):
+        """测试内容变化导致指纹变化"""
+        path = os.path.join(temp_dir, "a.bin")
+        with open(path, "wb") as f:
+            f.write(b"hello")
+        first = file_fingerprint(path)
+
+        with open(path, "wb") as f:
+            f.write(b"world")
+        os.utime(path, ns=(first["mtime_ns"] + 10**9, first["mtime_ns"] + 10**9))
+        second = file_fingerprint(path)
+
+        assert first["hash"] != second["hash"]
+
+    def test_missing_file(self):
+        """测试不存在的文件"""
+        with pytest.raises(FileNotFoundError):
+            file_fingerprint("nonexistent.bin")
+
+
+class TestMakeCacheKey:
+    """make_cache_key 函数的测试"""
+
+    def test_stable_and_order_independent(self):
+        """测试键稳定且与 dict 顺序无关"""
+        assert make_cache_key({"a": 1, "b": 2}) == make_cache_key({"b": 2, "a": 1})
+
+    def test_different_params(self):
+        """测试不同参数生成不同的键"""
+        assert make_cache_key("x", 1) != make_cache_key("x", 2)
+
+
+class TestDiskCache:
+    """DiskCache 类的测试"""
+
+    def test_json_roundtrip(self, temp_dir):
+        """测试 JSON 读写"""
+        cache = DiskCache(temp_dir, "test")
+        assert cache.get_json("k") is None
+        cache.set_json("k", {"duration": 1.5, "pauses": [0.5]})
+        assert cache.get_json("k") == {"duration": 1.5, "pauses": [0.5]}
+
+    def test_corrupted_json(self, temp_dir):
+        """测试损坏的缓存文件视为未命中"""
+        cache = DiskCache(temp_dir, "test")
+        with open(cache.path_for("k", ".json"), "w") as f:
+            f.write("{broken")
+        assert cache.get_json("k") is None
+
+    def test_put_file(self, temp_dir):
+        """测试放入文件"""
+        cache = DiskCache(temp_dir, "test")
+        src = os.path.join(temp_dir, "chunk.bin")
+        with open(src, "wb") as f:
+            f.write(b"data")
+        dst = cache.put_file("k", src, ".bin")
+        assert not os.path.exists(src)
+        assert cache.get_path("k", ".bin") == dst
+        assert cache.get_path("missing", ".bin") is None
+
+    def test_lru_eviction(self, temp_dir):
+        """测试超过容量上限时淘汰最久未使用的项"""
+        cache = DiskCache(temp_dir, "test", max_bytes=250)
+        for i, key in enumerate(["a", "b"]):
+            cache._write_atomic(cache.path_for(key, ".bin"), b"x" * 100)
+            os.utime(cache.path_for(key, ".bin"), ns=(i * 10**9, i * 10**9))
+
+        # 访问 a 使其成为最近使用
+        assert cache.get_path("a", ".bin") is not None
+        cache._write_atomic(cache.path_for("c", ".bin"), b"x" * 100)
+        cache.evict(keep=cache.path_for("c", ".bin"))
+
+        assert cache.get_path("b", ".bin") is None
+        assert cache.get_path("a", ".bin") is not None
+        assert cache.get_path("c", ".bin") is not None
+        assert cache.total_bytes() <= 250
+
+    def test_clear(self, temp_dir):
+        """测试清空缓存"""
+        cache = DiskCache(temp_dir, "test")
+        cache.set_json("k", 1)
+        cache.clear()
+        assert cache.total_bytes() == 0
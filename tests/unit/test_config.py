@@ -2,7 +2,7 @@
 config.py 模块的单元测试 - 修复版本
 """
 import pytest
-from config import VideoSize, parse_video_size, print_available_sizes
+from config import VideoSize, draft_settings, parse_video_size, print_available_sizes
 
 
 class TestVideoSize:
@@ -142,6 +142,21 @@ class TestParseVideoSize:
         assert "WIDTHxHEIGHT" in error_msg
 
 
+class TestDraftSettings:
+    """draft_settings 函数的测试"""
+
+    def test_scales_short_side(self):
+        """测试按短边缩小并保持宽高比"""
+        assert draft_settings((1920, 1080), 30) == ((640, 360), 12)
+        assert draft_settings((1080, 1920), 24) == ((360, 640), 12)
+        assert draft_settings((1080, 1080), 30) == ((360, 360), 12)
+
+    def test_small_sizes_unchanged(self):
+        """测试小尺寸和低帧率不再缩小，宽高取偶数"""
+        assert draft_settings((320, 240), 10) == ((320, 240), 10)
+        assert draft_settings((1001, 563), 30)[0] == (640, 360)
+
+
 class TestPrintAvailableSizes:
     """print_available_sizes 函数的测试"""
 
@@ -0,0 +1,590 @@
+"""
+render_utils.py 模块的单元测试
+"""
+import os
+from unittest.mock import patch
+
+import av
+import numpy as np
+import pytest
+from moviepy import ImageClip
+from PIL import Image
+
+from utils.animation_utils import AnimationConfig
+from utils.media_utils import MediaItem, MediaType
+from utils.render_utils import (
+    benchmark_animation_render,
+    cover_size,
+    fit_frame,
+    load_scaled_image,
+    load_image_frame,
+    PyAVEncoder,
+    render_slideshow,
+    render_slideshow_parallel,
+    render_segment_jobs,
+    segment_cache_key,
+    segment_frame_ranges,
+    SegmentJob,
+    WindowedVideoFrames,
+    _animation_key,
+    _segment_frame,
+    _VideoSource,
+)
+from utils.slideshow_utils import MediaSegment
+from utils.video_utils import VideoReader, VideoReaderPool, resize_and_position_image
+
+
+def _decode_frames(path):
+    """解码输出视频的全部帧（RGB）"""
+    with av.open(path) as container:
+        return [frame.to_ndarray(format="rgb24") for frame in container.decode(video=0)]
+
+
+def _image_item(path):
+    return MediaItem(path=path, media_type=MediaType.IMAGE, name=os.path.basename(path))
+
+
+class TestFitFrame:
+    """fit_frame 函数的测试"""
+
+    @pytest.mark.parametrize("image_size,stage_size", [
+        ((640, 480), (320, 180)),
+        ((300, 600), (160, 90)),
+        ((100, 100), (90, 160)),
+    ])
+    def test_matches_moviepy(self, image_size, stage_size):
+        """测试与 MoviePy 的缩放定位结果一致"""
+        rng = np.random.default_rng(0)
+        data = rng.integers(0, 256, (image_size[1], image_size[0], 3), dtype=np.uint8)
+        expected = resize_and_position_image(ImageClip(data), stage_size).get_frame(0)
+        result = fit_frame(data, stage_size)
+        assert result.shape == (stage_size[1], stage_size[0], 3)
+        assert result.dtype == np.uint8
+        np.testing.assert_array_equal(result, expected.astype(np.uint8))
+
+    def test_load_image_frame(self, temp_image_file):
+        """测试从文件读取并缩放图片"""
+        path = temp_image_file(width=200, height=100, color=(0, 0, 255))
+        frame = load_image_frame(path, (80, 60))
+        assert frame.shape == (60, 80, 3)
+        assert frame[30, 40, 2] > 200
+
+    def test_rounding_does_not_shrink_below_stage(self, temp_dir):
+        """测试缩放比例的浮点误差不会让覆盖边少一个像素"""
+        assert cover_size((960, 535), (1920, 1080)) == (1937, 1080)
+        data = np.full((535, 960, 3), 128, dtype=np.uint8)
+        assert fit_frame(data, (1920, 1080)).shape == (1080, 1920, 3)
+
+        path = os.path.join(temp_dir, "short.png")
+        Image.fromarray(data).save(path)
+        assert load_image_frame(path, (1920, 1080)).shape == (1080, 1920, 3)
+
+
+class TestImageCache:
+    """预缩放图片缓存的测试"""
+
+    def test_cover_size(self):
+        """测试覆盖尺寸和动画余量"""
+        assert cover_size((4000, 3000), (1280, 720)) == (1280, 960)
+        assert cover_size((4000, 3000), (1280, 720), headroom=1.5) == (1920, 1440)
+        assert cover_size((1000, 3000), (1280, 720)) == (1280, 3840)
+
+    def test_cached_frame_matches_uncached(self, temp_dir):
+        """测试缓存的帧与直接缩放一致，再次读取时不解码原图"""
+        rng = np.random.default_rng(1)
+        path = os.path.join(temp_dir, "photo.png")
+        Image.fromarray(rng.integers(0, 256, (300, 400, 3), dtype=np.uint8)).save(path)
+        cache_dir = os.path.join(temp_dir, "cache")
+
+        first = load_image_frame(path, (160, 90), cache_dir=cache_dir)
+        with Image.open(path) as image:
+            np.testing.assert_array_equal(first, fit_frame(image, (160, 90)))
+        with patch("utils.render_utils.scale_image") as mock_scale:
+            second = load_image_frame(path, (160, 90), cache_dir=cache_dir)
+            mock_scale.assert_not_called()
+        np.testing.assert_array_equal(first, second)
+        assert os.listdir(os.path.join(cache_dir, "images"))
+
+    def test_keyed_by_target_size(self, temp_dir):
+        """测试不同目标尺寸和余量分别缓存"""
+        path = os.path.join(temp_dir, "photo.png")
+        Image.new("RGB", (400, 300), (10, 20, 30)).save(path)
+        cache_dir = os.path.join(temp_dir, "cache")
+        assert load_scaled_image(path, (160, 90), cache_dir=cache_dir).shape == (120, 160, 3)
+        assert load_scaled_image(path, (160, 90), headroom=1.5, cache_dir=cache_dir).shape == (180, 240, 3)
+        assert load_scaled_image(path, (80, 80), cache_dir=cache_dir).shape == (80, 106, 3)
+        assert len(os.listdir(os.path.join(cache_dir, "images"))) == 3
+
+    def test_cached_frame_covers_stage(self, temp_dir):
+        """测试缩放比例有浮点误差时缓存的帧仍为舞台尺寸"""
+        path = os.path.join(temp_dir, "short.png")
+        Image.new("RGB", (960, 535), (10, 20, 30)).save(path)
+        cache_dir = os.path.join(temp_dir, "cache")
+        for _ in range(2):
+            assert load_image_frame(path, (1920, 1080), cache_dir=cache_dir).shape == (1080, 1920, 3)
+
+    def test_source_change_invalidates(self, temp_dir):
+        """测试原图内容变化后重新缩放"""
+        path = os.path.join(temp_dir, "photo.png")
+        cache_dir = os.path.join(temp_dir, "cache")
+        Image.new("RGB", (400, 300), (255, 0, 0)).save(path)
+        assert load_image_frame(path, (64, 48), cache_dir=cache_dir)[..., 0].mean() > 250
+        Image.new("RGB", (400, 300), (0, 0, 255)).save(path)
+        os.utime(path, ns=(1, 1))
+        assert load_image_frame(path, (64, 48), cache_dir=cache_dir)[..., 2].mean() > 250
+
+
+class TestVideoSource:
+    """视频帧源的测试"""
+
+    def test_frame_by_time(self, temp_video_file):
+        """测试按时间取帧，超出结尾后停留在最后一帧"""
+        path = temp_video_file(n_frames=10, fps=10)
+        source = _VideoSource(path, (32, 24))
+        try:
+            assert source.frame(0.0)[0, 0, 0] == pytest.approx(0, abs=3)
+            assert source.frame(0.5)[0, 0, 0] == pytest.approx(40, abs=3)
+            assert source.frame(3.0)[0, 0, 0] == pytest.approx(72, abs=3)
+            assert source.frame(3.0).shape == (24, 32, 3)
+        finally:
+            source.close()
+
+    def test_rotated_video(self, temp_video_file):
+        """测试带旋转信息的视频按显示方向输出"""
+        video = temp_video_file(n_frames=3, width=64, height=32, rotation=90)
+        source = _VideoSource(video, (32, 64))
+        try:
+            frame = source.frame(0.0)
+        finally:
+            source.close()
+        assert frame.shape == (64, 32, 3)
+
+
+class TestWindowedVideoFrames:
+    """MoviePy 路径视频帧函数的测试"""
+
+    def test_reader_returned_after_window(self, temp_video_file):
+        """测试取到窗口内最后一帧后归还读取器，再次播放复用同一个解码器并从头解码"""
+        path = temp_video_file(n_frames=10, fps=10)
+        pool = VideoReaderPool(VideoReader)
+        try:
+            first = WindowedVideoFrames(path, (32, 24), 0.5, 10, pool)
+            for n in range(4):
+                first(n / 10)
+                assert first.source is not None
+            assert first(0.4)[0, 0, 0] == pytest.approx(32, abs=3)
+            assert first.source is None
+
+            second = WindowedVideoFrames(path, (32, 24), 1.5, 10, pool)
+            assert second(0.0)[0, 0, 0] == pytest.approx(0, abs=3)
+            # 视频不足窗口时长时停留在最后一帧
+            assert second(1.4)[0, 0, 0] == pytest.approx(72, abs=3)
+            assert pool.opened == 1
+        finally:
+            pool.close()
+
+    def test_rewind(self, temp_video_file):
+        """测试取帧时间回退时从头重新解码"""
+        path = temp_video_file(n_frames=10, fps=10)
+        with VideoReaderPool(VideoReader) as pool:
+            frames = WindowedVideoFrames(path, (32, 24), 1.0, 10, pool)
+            assert frames(0.5)[0, 0, 0] == pytest.approx(40, abs=3)
+            assert frames(0.2)[0, 0, 0] == pytest.approx(16, abs=3)
+            frames.close()
+            assert pool.opened == 1
+
+
+class TestPyAVEncoder:
+    """PyAVEncoder 的测试"""
+
+    def test_video_and_audio_streams(self, temp_dir):
+        """测试音视频写入同一个容器"""
+        path = os.path.join(temp_dir, "out.mp4")
+        with PyAVEncoder(path, (64, 48), 10, audio_rate=16000, audio_channels=2) as encoder:
+            for i in range(10):
+                encoder.write_frame(np.full((48, 64, 3), i * 20, dtype=np.uint8))
+                encoder.write_audio(np.zeros((1600, 2), dtype=np.float32))
+
+        with av.open(path) as container:
+            assert container.streams.video[0].codec_context.name == "h264"
+            assert container.streams.video[0].codec_context.pix_fmt == "yuv420p"
+            assert container.streams.audio[0].codec_context.name == "aac"
+            assert container.streams.audio[0].codec_context.channels == 2
+        frames = _decode_frames(path)
+        assert len(frames) == 10
+        assert frames[5].mean() == pytest.approx(100, abs=3)
+
+    def test_odd_width_rows(self, temp_dir):
+        """测试行宽带对齐填充时帧内容正确"""
+        path = os.path.join(temp_dir, "odd.mp4")
+        data = np.zeros((36, 50, 3), dtype=np.uint8)
+        data[:, 25:] = 200
+        with PyAVEncoder(path, (50, 36), 5) as encoder:
+            encoder.write_frame(data)
+        frame = _decode_frames(path)[0]
+        assert frame[:, :20].mean() < 10
+        assert frame[:, 30:].mean() > 190
+
+
+class TestRenderSlideshow:
+    """render_slideshow 函数的测试"""
+
+    def test_segments_and_fade(self, temp_dir):
+        """测试片段切换和淡入"""
+        paths = []
+        for i, color in enumerate([(200, 0, 0), (0, 200, 0)]):
+            path = os.path.join(temp_dir, f"img{i}.png")
+            Image.new("RGB", (80, 60), color).save(path)
+            paths.append(path)
+        segments = [
+            MediaSegment(_image_item(paths[0]), 0.0, 1.0, 0),
+            MediaSegment(_image_item(paths[1]), 1.0, 2.0, 1),
+        ]
+        output = os.path.join(temp_dir, "slideshow.mp4")
+        n = render_slideshow(segments, output, (64, 48), 10, duration=2.0, transition_duration=0.5)
+
+        frames = _decode_frames(output)
+        assert n == len(frames) == 20
+        assert frames[5][..., 0].mean() == pytest.approx(200, abs=5)
+        # 第二个片段从黑色淡入
+        assert frames[10].mean() < 5
+        assert frames[12][..., 1].mean() == pytest.approx(80, abs=6)
+        assert frames[18][..., 1].mean() == pytest.approx(200, abs=5)
+
+    def test_video_segment_with_audio(self, temp_dir, temp_video_file):
+        """测试视频片段和音频"""
+        video = temp_video_file(n_frames=5, fps=10)
+        segments = [MediaSegment(MediaItem(path=video, media_type=MediaType.VIDEO, name="video.mp4"), 0.0, 1.0, 0)]
+        output = os.path.join(temp_dir, "video.mp4")
+        pcm = np.zeros((8000, 1), dtype=np.float32)
+        render_slideshow(segments, output, (64, 48), 10, duration=1.0, audio_pcm=pcm, audio_rate=8000)
+
+        frames = _decode_frames(output)
+        assert len(frames) == 10
+        assert frames[2][..., 0].mean() == pytest.approx(16, abs=4)
+        # 视频只有 0.5 秒，之后停留在最后一帧
+        assert frames[9][..., 0].mean() == pytest.approx(32, abs=4)
+        with av.open(output) as container:
+            assert len(container.streams.audio) == 1
+
+    def test_audio_streamed_from_file(self, temp_dir, temp_wav_file):
+        """测试指定音频文件时边解码边编码，顺序渲染和按片段渲染的音频时长一致"""
+        audio = temp_wav_file([(0.6, 0.5), (0.6, 0.0)], sample_rate=8000, channels=2)
+        segments = _color_segments(temp_dir, [0.0, 1.0, 2.0])
+        outputs = [os.path.join(temp_dir, name) for name in ("sequential.mp4", "parallel.mp4")]
+        render_slideshow(segments, outputs[0], (64, 48), 10, duration=2.0, audio_path=audio)
+        render_slideshow_parallel(segments, outputs[1], (64, 48), 10, duration=2.0, audio_path=audio,
+                                  workers=1)
+        for output in outputs:
+            with av.open(output) as container:
+                stream = container.streams.audio[0]
+                assert stream.codec_context.channels == 2
+                samples = sum(frame.samples for frame in container.decode(stream))
+            # 音频只有 1.2 秒，比视频短
+            assert samples == pytest.approx(9600, abs=1100)
+
+    def test_looped_video_shares_reader(self, temp_dir, temp_video_file):
+        """测试循环使用的视频只打开一次"""
+        video = temp_video_file(n_frames=5, fps=10)
+        item = MediaItem(path=video, media_type=MediaType.VIDEO, name="video.mp4")
+        segments = [MediaSegment(item, i * 0.5, (i + 1) * 0.5, i) for i in range(3)]
+        output = os.path.join(temp_dir, "loop.mp4")
+        with patch("utils.render_utils.VideoReader", wraps=VideoReader) as opener:
+            render_slideshow(segments, output, (64, 48), 10, duration=1.5, transition_duration=0)
+        assert opener.call_count == 1
+        frames = _decode_frames(output)
+        # 每个片段都从视频开头播放
+        for start in (0, 5, 10):
+            assert frames[start][..., 0].mean() == pytest.approx(0, abs=4)
+            assert frames[start + 4][..., 0].mean() == pytest.approx(32, abs=4)
+
+    def test_empty_segments(self, temp_dir):
+        """测试没有片段时抛出异常"""
+        with pytest.raises(ValueError):
+            render_slideshow([], os.path.join(temp_dir, "empty.mp4"), (64, 48), 10, duration=1.0)
+
+
+def _color_segments(temp_dir, boundaries):
+    """生成纯色图片片段，boundaries 为切换时间点（含首尾）"""
+    colors = [(200, 0, 0), (0, 200, 0), (0, 0, 200), (200, 200, 0)]
+    segments = []
+    for i in range(len(boundaries) - 1):
+        path = os.path.join(temp_dir, f"color{i}.png")
+        Image.new("RGB", (80, 60), colors[i % len(colors)]).save(path)
+        segments.append(MediaSegment(_image_item(path), boundaries[i], boundaries[i + 1], i))
+    return segments
+
+
+class TestSegmentParallelRender:
+    """按片段并行渲染和流复制拼接的测试"""
+
+    def test_frame_ranges_match_sequential(self):
+        """测试帧区间与逐帧渲染的分配规则一致"""
+        boundaries = [0.0, 1.0 / 3, 0.7, 0.7, 1.55, 2.0]
+        segments = [MediaSegment(None, boundaries[i], boundaries[i + 1], i) for i in range(len(boundaries) - 1)]
+        for fps in (10, 24, 30):
+            expected = [[] for _ in segments]
+            k = 0
+            for n in range(int(2.0 * fps)):
+                while n / fps >= segments[k].end_time and k < len(segments) - 1:
+                    k += 1
+                expected[k].append(n)
+            ranges = segment_frame_ranges(segments, fps, 2.0)
+            assert [list(range(a, b)) for a, b in ranges] == expected
+
+    def test_matches_sequential_render(self, temp_dir):
+        """测试并行渲染的画面、关键帧位置和音频"""
+        segments = _color_segments(temp_dir, [0.0, 0.75, 1.3, 2.0])
+        pcm = np.zeros((16000, 1), dtype=np.float32)
+        sequential = os.path.join(temp_dir, "sequential.mp4")
+        parallel = os.path.join(temp_dir, "parallel.mp4")
+        render_slideshow(segments, sequential, (64, 48), 10, duration=2.0, transition_duration=0.5)
+        n = render_slideshow_parallel(segments, parallel, (64, 48), 10, duration=2.0,
+                                      transition_duration=0.5, audio_pcm=pcm, audio_rate=8000,
+                                      workers=2, work_dir=temp_dir)
+
+        expected = _decode_frames(sequential)
+        with av.open(parallel) as container:
+            assert len(container.streams.audio) == 1
+            decoded = list(container.decode(video=0))
+        assert n == len(decoded) == len(expected) == 20
+        for frame, reference in zip(decoded, expected):
+            diff = np.abs(frame.to_ndarray(format="rgb24").astype(int) - reference.astype(int))
+            assert diff.mean() < 3
+        # 每个片段都从关键帧开始
+        keyframes = [i for i, frame in enumerate(decoded) if frame.key_frame]
+        assert {0, 8, 13} <= set(keyframes)
+        # 中间文件已清理
+        assert not [name for name in os.listdir(temp_dir) if name.startswith("genvideo-segments-")]
+
+    def test_crossfade_matches_sequential(self, temp_dir):
+        """测试交叉溶解时片段使用上一个片段的尾部画面"""
+        segments = _color_segments(temp_dir, [0.0, 1.0, 2.0])
+        sequential = os.path.join(temp_dir, "sequential.mp4")
+        parallel = os.path.join(temp_dir, "parallel.mp4")
+        render_slideshow(segments, sequential, (64, 48), 10, duration=2.0, transition_duration=0.5,
+                         transition_style="crossfade")
+        render_slideshow_parallel(segments, parallel, (64, 48), 10, duration=2.0, transition_duration=0.5,
+                                  workers=1, transition_style="crossfade")
+        expected = _decode_frames(sequential)
+        frames = _decode_frames(parallel)
+        # 过渡窗口中点红绿各占一半
+        for result in (expected[12], frames[12]):
+            assert result[..., 0].mean() == pytest.approx(120, abs=8)
+            assert result[..., 1].mean() == pytest.approx(80, abs=8)
+        for frame, reference in zip(frames, expected):
+            assert np.abs(frame.astype(int) - reference.astype(int)).mean() < 3
+
+    def test_failed_segment_retried(self, temp_dir):
+        """测试失败的片段单独重试"""
+        segments = _color_segments(temp_dir, [0.0, 1.0, 2.0])
+        jobs = [SegmentJob(segment, i * 10, (i + 1) * 10, os.path.join(temp_dir, f"s{i}.mp4"))
+                for i, segment in enumerate(segments)]
+        from utils import render_utils
+        original = render_utils.render_segment_chunk
+        calls = []
+
+        def flaky(job, **kwargs):
+            calls.append(job.segment.segment_index)
+            if job.segment.segment_index == 1 and calls.count(1) == 1:
+                raise OSError("磁盘暂时不可写")
+            return original(job, **kwargs)
+
+        with patch("utils.render_utils.render_segment_chunk", side_effect=flaky):
+            render_segment_jobs(jobs, (64, 48), 10, workers=1, retries=1)
+        assert calls == [0, 1, 1]
+        assert all(os.path.exists(job.path) for job in jobs)
+
+    def test_failed_segment_exhausts_retries(self, temp_dir):
+        """测试重试后仍失败时抛出异常"""
+        segments = _color_segments(temp_dir, [0.0, 1.0])
+        jobs = [SegmentJob(segments[0], 0, 10, os.path.join(temp_dir, "s0.mp4"))]
+        with patch("utils.render_utils.render_segment_chunk", side_effect=OSError("失败")) as mock_render:
+            with pytest.raises(RuntimeError):
+                render_segment_jobs(jobs, (64, 48), 10, workers=1, retries=2)
+        assert mock_render.call_count == 3
+
+
+class TestSegmentCache:
+    """片段编码结果缓存的测试"""
+
+    def _render(self, segments, output, cache_dir, workers=1):
+        from utils import render_utils
+        with patch("utils.render_utils.render_segment_chunk",
+                   wraps=render_utils.render_segment_chunk) as spy:
+            render_slideshow_parallel(segments, output, (64, 48), 10, duration=3.0,
+                                      transition_duration=0.5, workers=workers, cache_dir=cache_dir)
+        return [call.args[0].segment.segment_index for call in spy.call_args_list]
+
+    def test_rerender_only_changed_segment(self, temp_dir):
+        """测试再次渲染时只重新编码内容变化的片段"""
+        cache_dir = os.path.join(temp_dir, "cache")
+        segments = _color_segments(temp_dir, [0.0, 1.0, 2.0, 3.0])
+        first = os.path.join(temp_dir, "first.mp4")
+        assert self._render(segments, first, cache_dir) == [0, 1, 2]
+
+        second = os.path.join(temp_dir, "second.mp4")
+        assert self._render(segments, second, cache_dir) == []
+        for a, b in zip(_decode_frames(first), _decode_frames(second)):
+            np.testing.assert_array_equal(a, b)
+
+        # 替换第二个片段的图片内容
+        Image.new("RGB", (80, 60), (255, 255, 255)).save(segments[1].media_item.path)
+        third = os.path.join(temp_dir, "third.mp4")
+        assert self._render(segments, third, cache_dir) == [1]
+        frames = _decode_frames(third)
+        assert len(frames) == 30
+        assert frames[18].mean() == pytest.approx(255, abs=5)
+        assert frames[5][..., 0].mean() == pytest.approx(200, abs=5)
+
+    def test_identical_segments_rendered_once(self, temp_dir):
+        """测试循环使用的同一媒体只渲染一次"""
+        path = os.path.join(temp_dir, "same.png")
+        Image.new("RGB", (80, 60), (0, 0, 200)).save(path)
+        segments = [MediaSegment(_image_item(path), float(i), float(i + 1), i) for i in range(3)]
+        output = os.path.join(temp_dir, "loop.mp4")
+        # 第一个片段没有淡入，后两个片段的键相同
+        assert self._render(segments, output, os.path.join(temp_dir, "cache")) == [0, 1]
+        assert len(_decode_frames(output)) == 30
+
+    def test_key_depends_on_render_settings(self, temp_dir):
+        """测试缓存键随渲染参数变化"""
+        segments = _color_segments(temp_dir, [0.0, 1.0, 2.0])
+        job = SegmentJob(segments[1], 10, 20, "unused.mp4")
+        base = segment_cache_key(job, (64, 48), 10)
+        assert segment_cache_key(job, (64, 48), 10) == base
+        assert segment_cache_key(job, (128, 96), 10) != base
+        assert segment_cache_key(job, (64, 48), 10, transition_duration=0.5) != base
+        assert segment_cache_key(job, (64, 48), 10, preset="ultrafast") != base
+        assert segment_cache_key(job, (64, 48), 10, static_vfr=True) != base
+        assert segment_cache_key(SegmentJob(segments[1], 10, 21, "unused.mp4"), (64, 48), 10) != base
+        # 交叉溶解时键还取决于上一个片段的媒体
+        crossfade = SegmentJob(segments[1], 10, 20, "unused.mp4", previous=segments[0])
+        other = SegmentJob(segments[1], 10, 20, "unused.mp4", previous=segments[1])
+        assert segment_cache_key(crossfade, (64, 48), 10, transition_style="crossfade") != \
+            segment_cache_key(other, (64, 48), 10, transition_style="crossfade")
+        assert segment_cache_key(crossfade, (64, 48), 10) == segment_cache_key(other, (64, 48), 10)
+        # 位置不同但内容相同的片段共享缓存键
+        moved = MediaSegment(segments[1].media_item, 5.0, 6.0, 5)
+        assert segment_cache_key(SegmentJob(moved, 50, 60, "unused.mp4"), (64, 48), 10) == base
+
+
+def _decode_timed_frames(path):
+    """解码输出视频的全部帧及其显示时间：[(秒, RGB)]"""
+    with av.open(path) as container:
+        return [(float(frame.time), frame.to_ndarray(format="rgb24")) for frame in container.decode(video=0)]
+
+
+def _frame_at(frames, t):
+    """取时间 t 正在显示的画面（可变帧率时为不晚于 t 的最后一帧）"""
+    return [rgb for time, rgb in frames if time <= t + 1e-6][-1]
+
+
+class TestStaticSegments:
+    """静态图片片段重复编码和可变帧率输出的测试"""
+
+    def test_static_frames_composited_once(self, temp_dir):
+        """测试静态片段只合成一次，其余帧直接重复编码"""
+        segments = _color_segments(temp_dir, [0.0, 1.0, 2.0])
+        output = os.path.join(temp_dir, "repeat.mp4")
+        with patch("utils.render_utils._segment_frame", wraps=_segment_frame) as compose:
+            n = render_slideshow(segments, output, (64, 48), 10, duration=2.0, transition_duration=0.5)
+        # 第一个片段 1 次，第二个片段过渡窗口 5 次加窗口后 1 次
+        assert compose.call_count == 7
+        assert n == len(_decode_frames(output)) == 20
+
+    def test_vfr_skips_static_frames(self, temp_dir):
+        """测试可变帧率模式只编码首尾帧，时长和画面不变"""
+        segments = _color_segments(temp_dir, [0.0, 1.0, 2.0])
+        cfr = os.path.join(temp_dir, "cfr.mp4")
+        vfr = os.path.join(temp_dir, "vfr.mp4")
+        render_slideshow(segments, cfr, (64, 48), 10, duration=2.0, transition_duration=0.5)
+        n = render_slideshow(segments, vfr, (64, 48), 10, duration=2.0, transition_duration=0.5,
+                             static_vfr=True)
+
+        expected = _decode_frames(cfr)
+        frames = _decode_timed_frames(vfr)
+        assert n == 20
+        # 第一个片段 1 帧，过渡窗口 5 帧，窗口后 1 帧，最后一帧
+        assert len(frames) == 8
+        assert frames[-1][0] == pytest.approx(1.9)
+        for i, reference in enumerate(expected):
+            diff = np.abs(_frame_at(frames, i / 10).astype(int) - reference.astype(int))
+            assert diff.mean() < 3
+
+    def test_vfr_parallel_concat(self, temp_dir):
+        """测试可变帧率片段可以直接拼接，结果与逐帧渲染一致"""
+        segments = _color_segments(temp_dir, [0.0, 0.75, 1.3, 2.0])
+        sequential = os.path.join(temp_dir, "sequential.mp4")
+        parallel = os.path.join(temp_dir, "parallel.mp4")
+        pcm = np.zeros((16000, 1), dtype=np.float32)
+        render_slideshow(segments, sequential, (64, 48), 10, duration=2.0, transition_duration=0.5,
+                         static_vfr=True)
+        render_slideshow_parallel(segments, parallel, (64, 48), 10, duration=2.0, transition_duration=0.5,
+                                  audio_pcm=pcm, audio_rate=8000, workers=1, static_vfr=True)
+
+        expected = _decode_timed_frames(sequential)
+        frames = _decode_timed_frames(parallel)
+        for i in range(20):
+            diff = np.abs(_frame_at(frames, i / 10).astype(int) - _frame_at(expected, i / 10).astype(int))
+            assert diff.mean() < 3
+        assert frames[-1][0] == pytest.approx(1.9)
+        with av.open(parallel) as container:
+            packets = [packet for packet in container.demux(video=0) if packet.size]
+        dts = [packet.dts for packet in packets]
+        assert dts == sorted(dts)
+
+
+class TestAnimatedSegments:
+    """带缩放和平移动画的图片片段渲染的测试"""
+
+    def _gradient_segments(self, temp_dir, animation):
+        path = os.path.join(temp_dir, "gradient.png")
+        y, x = np.mgrid[0:120, 0:160]
+        Image.fromarray(np.stack([x * 255 // 159, y * 255 // 119, np.zeros_like(x)],
+                                 axis=-1).astype(np.uint8)).save(path)
+        return [MediaSegment(_image_item(path), 0.0, 1.0, 0, animation)]
+
+    def test_animated_frames_change(self, temp_dir):
+        """测试动画片段逐帧生成画面，静态片段画面不变"""
+        output = os.path.join(temp_dir, "zoom.mp4")
+        segments = self._gradient_segments(temp_dir, AnimationConfig(AnimationConfig.ZOOM_IN, 0.5))
+        n = render_slideshow(segments, output, (64, 48), 10, duration=1.0)
+        frames = _decode_frames(output)
+        assert n == len(frames) == 10
+        assert np.abs(frames[0].astype(int) - frames[-1].astype(int)).mean() > 2
+
+        static_output = os.path.join(temp_dir, "static.mp4")
+        render_slideshow(self._gradient_segments(temp_dir, None), static_output, (64, 48), 10, duration=1.0)
+        static = _decode_frames(static_output)
+        assert np.abs(static[0].astype(int) - static[-1].astype(int)).mean() < 1
+
+    def test_parallel_matches_sequential(self, temp_dir):
+        """测试按片段并行渲染的动画画面与顺序渲染一致"""
+        segments = self._gradient_segments(temp_dir, AnimationConfig(AnimationConfig.PAN_LEFT, 0.5))
+        sequential = os.path.join(temp_dir, "sequential.mp4")
+        parallel = os.path.join(temp_dir, "parallel.mp4")
+        render_slideshow(segments, sequential, (64, 48), 10, duration=1.0)
+        render_slideshow_parallel(segments, parallel, (64, 48), 10, duration=1.0, workers=1)
+        for a, b in zip(_decode_frames(sequential), _decode_frames(parallel)):
+            assert np.abs(a.astype(int) - b.astype(int)).mean() < 2
+
+    def test_animation_in_cache_key(self, temp_dir):
+        """测试缓存键随动画参数变化"""
+        zoom = self._gradient_segments(temp_dir, AnimationConfig(AnimationConfig.ZOOM_IN, 0.5))[0]
+        pan = self._gradient_segments(temp_dir, AnimationConfig(AnimationConfig.PAN_LEFT, 0.5))[0]
+        keys = {
+            segment_cache_key(SegmentJob(segment, 0, 10, "unused.mp4", animation=_animation_key(segment)),
+                              (64, 48), 10)
+            for segment in [zoom, pan, self._gradient_segments(temp_dir, None)[0]]
+        }
+        assert len(keys) == 3
+
+    def test_benchmark_rows(self, temp_dir):
+        """测试基准为每个尺寸和动画类型返回一行结果"""
+        path = os.path.join(temp_dir, "bench.png")
+        Image.new("RGB", (160, 120), (10, 120, 200)).save(path)
+        results = benchmark_animation_render({"TINY": (64, 48)}, fps=10, duration=0.5, image_path=path,
+                                             preset="ultrafast")
+        assert [row["animation"] for row in results] == ["none", "zoom_in", "pan_left"]
+        assert all(row["frames"] == 5 and row["render_ms"] > 0 for row in results)
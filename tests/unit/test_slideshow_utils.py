@@ -1,9 +1,15 @@
 """
 slideshow_utils.py 模块的单元测试
 """
+import itertools
+
+import numpy as np
 import pytest
 
-from utils.slideshow_utils import SlideshowController
+from utils.media_utils import MediaItem, MediaType
+from utils.slideshow_utils import SlideshowController, StreamingSlideshowController, plan_segments
+from utils.slideshow_utils import SEED_STREAM_ANIMATION, SEED_STREAM_MEDIA, derive_seed
+from utils.slideshow_utils import _range_argmax
 
 
 class TestSlideshowController:
@@ -234,3 +240,198 @@ class TestSlideshowController:
         expected_sequence = ["img1.jpg", "img2.jpg", "img1.jpg", "img2.jpg", "img1.jpg"]
         for i, result in enumerate(results):
             assert result[0] == expected_sequence[i]
+
+
+def _media_items(n):
+    """创建 n 个图片 MediaItem"""
+    return [MediaItem(path=f"img{i}.jpg", media_type=MediaType.IMAGE, name=f"img{i}.jpg")
+            for i in range(n)]
+
+
+class TestStreamingSlideshowController:
+    """StreamingSlideshowController 类的测试"""
+
+    def test_same_segments_as_list(self):
+        """测试流式结果与一次性给出切换点的结果一致"""
+        items = _media_items(5)
+        pauses = [2.0, 5.0, 8.0]
+        expected = SlideshowController(items, [0.0] + pauses + [10.0])
+        controller = StreamingSlideshowController(items, iter(pauses), end_time=10.0)
+
+        while True:
+            a = expected.next()
+            b = controller.next()
+            if a is None:
+                assert b is None
+                break
+            assert (a.media_item, a.start_time, a.end_time) == (b.media_item, b.start_time, b.end_time)
+
+    def test_lazy_consumption(self):
+        """测试只在需要时读取停顿点"""
+        consumed = []
+
+        def stream():
+            for point in [2.0, 5.0, 8.0]:
+                consumed.append(point)
+                yield point
+
+        controller = StreamingSlideshowController(_media_items(3), stream(), end_time=10.0)
+        segment = controller.next()
+        assert (segment.start_time, segment.end_time) == (0.0, 2.0)
+        assert consumed == [2.0]
+
+    def test_totals(self):
+        """测试总数统计"""
+        controller = StreamingSlideshowController(_media_items(2), iter([3.0]), end_time=6.0)
+        controller.next()
+        assert controller.get_total_changes() == 2
+        controller.next()
+        assert controller.next() is None
+
+    def test_ignores_points_beyond_end(self):
+        """测试忽略超出结束时间的停顿点"""
+        controller = StreamingSlideshowController(_media_items(2), iter([3.0, 7.0, 9.0]), end_time=6.0)
+        assert controller.get_total_changes() == 2
+        assert controller.change_points == [0.0, 3.0, 6.0]
+
+    def test_empty_stream(self):
+        """测试没有停顿点时只有一个片段"""
+        controller = StreamingSlideshowController(_media_items(2), iter([]), end_time=4.0)
+        segment = controller.next()
+        assert (segment.start_time, segment.end_time) == (0.0, 4.0)
+        assert controller.next() is None
+
+
+class TestSeededController:
+    """指定随机种子时循环选择可复现的测试"""
+
+    def _names(self, controller):
+        names = []
+        while (segment := controller.next()) is not None:
+            names.append(segment.media_item.name)
+        return names
+
+    def test_same_seed_same_sequence(self):
+        """测试相同种子得到相同的媒体序列，reset 后从头复现"""
+        points = [float(t) for t in range(21)]
+        first = SlideshowController(_media_items(3), points, seed=7)
+        names = self._names(first)
+        assert names == self._names(SlideshowController(_media_items(3), points, seed=7))
+        first.reset()
+        assert self._names(first) == names
+        assert any(self._names(SlideshowController(_media_items(3), points, seed=s)) != names
+                   for s in range(8, 12))
+        # 循环阶段仍然避免连续使用同一素材
+        assert all(a != b for a, b in zip(names, names[1:]))
+
+    def test_streaming_uses_seed(self):
+        """测试流式控制器与一次性给出切换点的控制器使用相同种子时结果一致"""
+        pauses = [float(t) for t in range(1, 12)]
+        expected = SlideshowController(_media_items(3), [0.0] + pauses + [12.0], seed=3)
+        controller = StreamingSlideshowController(_media_items(3), iter(pauses), end_time=12.0, seed=3)
+        assert self._names(controller) == self._names(expected)
+
+    def test_derived_seeds_independent(self):
+        """测试各随机流的子种子可复现且互不相同，不指定主种子时仍为 None"""
+        media = derive_seed(42, SEED_STREAM_MEDIA)
+        assert media == derive_seed(42, SEED_STREAM_MEDIA)
+        assert media != derive_seed(42, SEED_STREAM_ANIMATION)
+        assert media != 42
+        assert derive_seed(None, SEED_STREAM_MEDIA) is None
+
+
+def _brute_force_plan(times, scores, duration, target_segments, min_segment, max_segment):
+    """穷举所有子集，返回 (切换点数量, 总评分) 的最优解"""
+    best = None
+    for count in range(len(times) + 1):
+        for combo in itertools.combinations(range(len(times)), count):
+            points = sorted(times[i] for i in combo)
+            gaps = np.diff([0.0] + points + [duration])
+            if (gaps < min_segment).any() or (gaps > max_segment).any():
+                continue
+            key = (abs(count - (target_segments - 1)), -sum(scores[i] for i in combo))
+            if best is None or key < best:
+                best = key
+    return best
+
+
+class TestPlanSegments:
+    """停顿候选规划器的测试"""
+
+    def test_range_argmax(self):
+        """测试稀疏表区间最大值查询"""
+        rng = np.random.default_rng(0)
+        values = rng.standard_normal(300)
+        lo = rng.integers(0, 300, 200)
+        hi = np.minimum(lo + rng.integers(-5, 80, 200), 299)
+        result = _range_argmax(values, lo, hi)
+        for l, h, r in zip(lo, hi, result):
+            if l > h:
+                assert r == -1
+            else:
+                assert r == l + np.argmax(values[l:h + 1])
+
+    def test_hits_target_count(self):
+        """测试在可行时恰好得到目标片段数量"""
+        times = [3.0, 5.0, 9.0, 12.0, 14.0, 18.0, 21.0, 25.0]
+        scores = [1.0] * len(times)
+        points = plan_segments(times, scores, duration=30.0, target_segments=4, min_segment=5.0)
+        assert len(points) == 3
+        gaps = np.diff([0.0] + points + [30.0])
+        assert (gaps >= 5.0).all()
+
+    def test_prefers_higher_scores(self):
+        """测试在满足约束的方案中选择总评分最高的"""
+        times = [10.0, 11.0, 20.0, 21.0]
+        scores = [1.0, 5.0, 5.0, 1.0]
+        assert plan_segments(times, scores, 30.0, target_segments=3, min_segment=5.0) == [11.0, 20.0]
+
+    def test_unreachable_target_uses_nearest(self):
+        """测试目标数量不可行时选择最接近的数量"""
+        times = [6.0, 12.0, 18.0]
+        points = plan_segments(times, [1.0] * 3, 24.0, target_segments=10, min_segment=5.0)
+        assert points == [6.0, 12.0, 18.0]
+        assert plan_segments(times, [1.0] * 3, 24.0, target_segments=1, min_segment=5.0) == []
+
+    def test_max_segment(self):
+        """测试最长片段约束，不可满足时忽略"""
+        times = [4.0, 8.0, 15.0, 22.0]
+        points = plan_segments(times, [1.0] * 4, 26.0, target_segments=2, min_segment=3.0,
+                               max_segment=10.0)
+        assert np.diff([0.0] + points + [26.0]).max() <= 10.0
+        points = plan_segments([5.0], [1.0], 60.0, target_segments=2, min_segment=3.0, max_segment=10.0)
+        assert points == [5.0]
+
+    def test_no_candidates(self):
+        """测试没有候选时只有一个片段"""
+        assert plan_segments([], [], 30.0, target_segments=5) == []
+
+    def test_matches_brute_force(self):
+        """测试与穷举结果一致"""
+        rng = np.random.default_rng(1)
+        for _ in range(60):
+            n = int(rng.integers(1, 9))
+            duration = float(rng.uniform(10, 50))
+            times = list(rng.uniform(0, duration, n))
+            scores = list(rng.uniform(0.1, 3, n))
+            target = int(rng.integers(1, 7))
+            min_segment = float(rng.uniform(1, 6))
+            max_segment = float(rng.uniform(min_segment + 1, 25))
+            expected = _brute_force_plan(times, scores, duration, target, min_segment, max_segment)
+            if expected is None:
+                continue
+            points = plan_segments(times, scores, duration, target, min_segment, max_segment)
+            total = sum(s for t, s in zip(times, scores) if t in points)
+            assert abs(len(points) - (target - 1)) == expected[0]
+            assert total == pytest.approx(-expected[1])
+
+    def test_thousands_of_candidates(self):
+        """测试数千个候选可以快速规划"""
+        rng = np.random.default_rng(2)
+        times = np.sort(rng.uniform(0, 3600, 5000))
+        scores = rng.uniform(0.1, 3, 5000)
+        points = plan_segments(times, scores, 3600.0, target_segments=100, min_segment=10.0,
+                               max_segment=90.0)
+        assert len(points) == 99
+        gaps = np.diff([0.0] + points + [3600.0])
+        assert gaps.min() >= 10.0 and gaps.max() <= 90.0
@@ -0,0 +1,113 @@
+"""
+timeline_utils.py 模块的单元测试
+"""
+import json
+import os
+from unittest.mock import patch
+
+import pytest
+
+from utils.animation_utils import AnimationConfig
+from utils.media_utils import MediaItem, MediaType
+from utils.slideshow_utils import MediaSegment, SlideshowController
+from utils.timeline_utils import (
+    Timeline,
+    TIMELINE_VERSION,
+    build_timeline,
+    iter_controller,
+)
+
+
+def _items():
+    return [
+        MediaItem(path="media/a.jpg", media_type=MediaType.IMAGE, name="a.jpg"),
+        MediaItem(path="media/b.mp4", media_type=MediaType.VIDEO, name="b.mp4"),
+        MediaItem(path="media/c.png", media_type=MediaType.IMAGE, name="c.png"),
+    ]
+
+
+def _timeline(**kwargs):
+    controller = SlideshowController(_items(), [0.0, 5.0, 11.0, 17.5, 23.0, 30.0], seed=kwargs.get("seed"))
+    return build_timeline(iter_controller(controller), "audio.wav", 30.0, **kwargs)
+
+
+class TestBuildTimeline:
+    """build_timeline 函数的测试"""
+
+    def test_matches_controller(self):
+        """测试时间线与控制器实际选择的媒体一致（包括循环时的随机选择）"""
+        with patch("utils.slideshow_utils.random.choice", side_effect=lambda items: items[-1]):
+            timeline = _timeline()
+        names = [segment.media_item.name for segment in timeline.segments]
+        # 循环阶段避开上一个媒体并选择候选中的最后一个，与 i % n 的顺序不同
+        assert names == ["a.jpg", "b.mp4", "c.png", "b.mp4", "c.png"]
+        assert timeline.change_points == [0.0, 5.0, 11.0, 17.5, 23.0, 30.0]
+        assert [segment.segment_index for segment in timeline.segments] == list(range(5))
+
+    def test_animations_only_for_images(self):
+        """测试只为图片片段分配动画"""
+        config = AnimationConfig(AnimationConfig.ZOOM_OUT)
+        timeline = _timeline(animation_config=config)
+        for segment in timeline.segments:
+            assert (segment.animation is config) == segment.is_image
+
+        timeline = _timeline(random_animation=True)
+        assert all((segment.animation is not None) == segment.is_image for segment in timeline.segments)
+
+    def test_no_animation(self):
+        """测试不指定动画时片段没有动画配置"""
+        assert all(segment.animation is None for segment in _timeline().segments)
+
+    def test_seed_reproducible(self):
+        """测试相同种子得到相同的时间线，种子记录在时间线中"""
+        timeline = _timeline(random_animation=True, seed=42)
+        assert timeline.seed == 42
+        assert timeline.to_dict() == _timeline(random_animation=True, seed=42).to_dict()
+        assert timeline.to_dict()["seed"] == 42
+
+
+class TestTimelineSerialization:
+    """时间线 JSON 导出和读取的测试"""
+
+    def test_round_trip(self, temp_dir):
+        """测试写入文件后读取得到相同的时间线"""
+        timeline = _timeline(random_animation=True, transition_duration=0.5, transition_style="crossfade")
+        path = os.path.join(temp_dir, "plan.json")
+        timeline.save(path)
+        loaded = Timeline.load(path)
+        assert loaded.to_dict() == timeline.to_dict()
+        assert loaded.transition_style == "crossfade"
+        assert loaded.segments[0].animation.animation_type == timeline.segments[0].animation.animation_type
+
+    def test_media_stored_once(self):
+        """测试循环使用的媒体只保存一份，片段按下标引用"""
+        data = _timeline().to_dict()
+        assert data["version"] == TIMELINE_VERSION
+        assert len(data["media"]) == 3
+        assert len(data["segments"]) == 5
+        assert {entry["media"] for entry in data["segments"]} == {0, 1, 2}
+        json.dumps(data)
+
+    def test_invalid_timeline(self, temp_dir):
+        """测试无效的时间线抛出 ValueError"""
+        data = _timeline().to_dict()
+        with pytest.raises(ValueError):
+            Timeline.from_dict({**data, "version": TIMELINE_VERSION + 1})
+        with pytest.raises(ValueError):
+            Timeline.from_dict({**data, "media": []})
+        gap = json.loads(json.dumps(data))
+        gap["segments"][2]["start"] = 12.0
+        with pytest.raises(ValueError):
+            Timeline.from_dict(gap)
+        path = os.path.join(temp_dir, "broken.json")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("{")
+        with pytest.raises(ValueError):
+            Timeline.load(path)
+
+    def test_segments_render_ready(self):
+        """测试读取的片段可以直接交给渲染器"""
+        loaded = Timeline.from_dict(_timeline().to_dict())
+        for segment in loaded.segments:
+            assert isinstance(segment, MediaSegment)
+            assert isinstance(segment.media_item.media_type, MediaType)
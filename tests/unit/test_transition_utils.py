@@ -0,0 +1,93 @@
+"""
+transition_utils.py 模块的单元测试
+"""
+import numpy as np
+import pytest
+from moviepy import ColorClip
+
+from utils.transition_utils import (
+    blend_weight,
+    compose_with_transitions,
+    TransitionBlender,
+    TRANSITION_CROSSFADE,
+    TRANSITION_FADE,
+)
+
+
+class TestBlendWeight:
+    """blend_weight 函数的测试"""
+
+    def test_range(self):
+        """测试权重范围和取整"""
+        assert blend_weight(0.0) == 0
+        assert blend_weight(0.5) == 128
+        assert blend_weight(1.0) == 256
+        assert blend_weight(-0.2) == 0
+        assert blend_weight(1.7) == 256
+
+
+class TestTransitionBlender:
+    """TransitionBlender 类的测试"""
+
+    def test_fade_from_black(self):
+        """测试从黑色淡入的整数混合"""
+        blender = TransitionBlender((4, 2), TRANSITION_FADE)
+        frame = np.full((2, 4, 3), 200, dtype=np.uint8)
+        result = blender.blend(frame, 0.25)
+        assert result.dtype == np.uint8
+        assert np.all(result == 50)
+        assert blender.needs_outgoing is False
+
+    def test_crossfade(self):
+        """测试交叉溶解"""
+        blender = TransitionBlender((4, 2), TRANSITION_CROSSFADE)
+        incoming = np.full((2, 4, 3), 255, dtype=np.uint8)
+        outgoing = np.zeros((2, 4, 3), dtype=np.uint8)
+        assert np.all(blender.blend(incoming, 0.5, outgoing) == 128)
+        assert np.all(blender.blend(incoming, 0.0, outgoing) == 0)
+        # 端点精确，不会溢出
+        assert np.all(blender.blend(outgoing, 0.0, incoming) == 255)
+
+    def test_buffer_reused_and_passthrough(self):
+        """测试复用输出缓冲区，过渡结束后原样透传"""
+        blender = TransitionBlender((4, 2), TRANSITION_CROSSFADE)
+        a = np.full((2, 4, 3), 10, dtype=np.uint8)
+        b = np.full((2, 4, 3), 90, dtype=np.uint8)
+        first = blender.blend(a, 0.3, b)
+        second = blender.blend(a, 0.6, b)
+        assert first is second is blender.output
+        assert blender.blend(a, 1.0, b) is a
+
+    def test_invalid_style(self):
+        """测试不支持的过渡样式"""
+        with pytest.raises(ValueError):
+            TransitionBlender((4, 2), "wipe")
+
+
+class TestComposeWithTransitions:
+    """compose_with_transitions 函数的测试"""
+
+    def _clips(self):
+        red = ColorClip((8, 6), color=(200, 0, 0), duration=2.0)
+        green = ColorClip((8, 6), color=(0, 200, 0), duration=2.0)
+        return [red, green]
+
+    def test_fade(self):
+        """测试从黑色淡入，过渡窗口外直接取片段帧"""
+        video = compose_with_transitions(self._clips(), [0.0, 1.0], 1.0, (8, 6))
+        assert video.duration == pytest.approx(3.0)
+        np.testing.assert_array_equal(video.get_frame(0.5)[0, 0], [200, 0, 0])
+        np.testing.assert_array_equal(video.get_frame(1.5)[0, 0], [0, 100, 0])
+        np.testing.assert_array_equal(video.get_frame(2.5)[0, 0], [0, 200, 0])
+
+    def test_crossfade(self):
+        """测试交叉溶解"""
+        video = compose_with_transitions(self._clips(), [0.0, 1.0], 1.0, (8, 6),
+                                         style=TRANSITION_CROSSFADE)
+        np.testing.assert_array_equal(video.get_frame(1.5)[0, 0], [100, 100, 0])
+        np.testing.assert_array_equal(video.get_frame(1.0)[0, 0], [200, 0, 0])
+
+    def test_no_transition(self):
+        """测试过渡时长为 0 时直接切换"""
+        video = compose_with_transitions(self._clips(), [0.0, 1.0], 0, (8, 6))
+        np.testing.assert_array_equal(video.get_frame(1.0)[0, 0], [0, 200, 0])
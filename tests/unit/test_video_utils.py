@@ -1,13 +1,23 @@
 """
 video_utils.py 模块的单元测试
 """
+import os
+
+import av
 import pytest
 from unittest.mock import MagicMock, patch
 
+from utils import video_utils
 from utils.video_utils import (
     resize_and_position_image,
     calculate_image_scale,
-    create_centered_video_frame
+    create_centered_video_frame,
+    probe_media,
+    make_video_proxy,
+    proxy_size,
+    MediaInfo,
+    VideoReader,
+    VideoReaderPool,
 )
 
 
@@ -237,3 +247,181 @@ class TestCreateCenteredVideoFrame:
         # 这可能会引发除零错误或产生意外结果
         with pytest.raises((ZeroDivisionError, ValueError)):
             scale, new_w, new_h = calculate_image_scale((0, 600), video_size)
+
+
+class TestProbeMedia:
+    """probe_media 函数的测试"""
+
+    @pytest.fixture(autouse=True)
+    def clear_memo(self):
+        video_utils._media_info_memo.clear()
+        yield
+        video_utils._media_info_memo.clear()
+
+    def test_basic_info(self, temp_video_file):
+        """测试读取时长、尺寸、帧率和编码"""
+        info = probe_media(temp_video_file(n_frames=20, fps=10, width=64, height=48))
+        assert info.duration == pytest.approx(2.0, abs=0.05)
+        assert (info.width, info.height) == (64, 48)
+        assert info.size == (64, 48)
+        assert info.fps == pytest.approx(10)
+        assert info.codec == "h264"
+        assert info.rotation == 0
+        assert info.has_audio is False
+
+    def test_rotation(self, temp_video_file):
+        """测试旋转角度和显示尺寸"""
+        info = probe_media(temp_video_file(n_frames=3, rotation=90))
+        assert info.rotation == 90
+        assert info.size == (48, 64)
+
+    def test_memo_and_disk_cache(self, temp_video_file, temp_dir):
+        """测试进程内缓存和磁盘缓存"""
+        path = temp_video_file(n_frames=5)
+        cache_dir = os.path.join(temp_dir, "cache")
+        with patch("utils.video_utils._read_media_info", wraps=video_utils._read_media_info) as spy:
+            first = probe_media(path, cache_dir=cache_dir)
+            assert probe_media(path, cache_dir=cache_dir) is first
+            video_utils._media_info_memo.clear()
+            assert probe_media(path, cache_dir=cache_dir) == first
+        assert spy.call_count == 1
+        assert isinstance(first, MediaInfo)
+
+    def test_invalid_file(self, temp_dir):
+        """测试无法解析的文件"""
+        path = os.path.join(temp_dir, "broken.mp4")
+        with open(path, "wb") as f:
+            f.write(b"not a video")
+        with pytest.raises(RuntimeError):
+            probe_media(path)
+
+    def test_missing_file(self, temp_dir):
+        """测试文件不存在"""
+        with pytest.raises(FileNotFoundError):
+            probe_media(os.path.join(temp_dir, "missing.mp4"))
+
+
+class TestVideoProxy:
+    """低分辨率代理视频的测试"""
+
+    def test_proxy_size(self):
+        """测试代理尺寸铺满舞台、不放大、宽高取偶数"""
+        assert proxy_size((1920, 1080), (640, 360)) == (640, 360)
+        assert proxy_size((1080, 1920), (640, 360)) == (640, 1138)
+        assert proxy_size((320, 240), (640, 360)) == (320, 240)
+
+    def test_proxy_keeps_timing(self, temp_video_file, temp_dir):
+        """测试代理视频缩小尺寸，帧数、时间戳和画面不变，再次调用命中缓存"""
+        path = temp_video_file(n_frames=20, fps=10, width=64, height=48)
+        cache_dir = os.path.join(temp_dir, "cache")
+        proxy = make_video_proxy(path, (32, 24), cache_dir)
+        assert proxy != path
+        info = probe_media(proxy)
+        assert info.size == (32, 24)
+        assert info.duration == pytest.approx(2.0, abs=0.05)
+        with av.open(proxy) as container:
+            frames = list(container.decode(video=0))
+        assert len(frames) == 20
+        assert float(frames[10].time) == pytest.approx(1.0)
+        assert frames[10].to_ndarray(format="rgb24")[..., 0].mean() == pytest.approx(80, abs=4)
+
+        with patch("utils.video_utils.av.open", side_effect=AssertionError("不应重新转码")):
+            assert make_video_proxy(path, (32, 24), cache_dir) == proxy
+
+    def test_rotated_proxy_upright(self, temp_video_file, temp_dir):
+        """测试带旋转信息的视频生成竖直的代理"""
+        path = temp_video_file(n_frames=3, width=64, height=48, rotation=90)
+        proxy = make_video_proxy(path, (24, 32), os.path.join(temp_dir, "cache"))
+        info = probe_media(proxy)
+        assert info.rotation == 0
+        assert info.size == (24, 32)
+
+    def test_small_video_not_proxied(self, temp_video_file, temp_dir):
+        """测试不需要缩小的视频直接使用原文件"""
+        path = temp_video_file(n_frames=3, width=64, height=48)
+        assert make_video_proxy(path, (128, 96), os.path.join(temp_dir, "cache")) == path
+
+
+class _FakeReader:
+    def __init__(self, path):
+        self.path = path
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class TestVideoReaderPool:
+    """VideoReaderPool 类的测试"""
+
+    def test_reuse_idle_reader(self):
+        """测试同一文件的空闲读取器被复用"""
+        pool = VideoReaderPool(_FakeReader)
+        first = pool.acquire("a.mp4")
+        pool.release(first)
+        assert pool.acquire("a.mp4") is first
+        assert pool.opened == 1
+
+    def test_busy_reader_not_shared(self):
+        """测试正在使用的读取器不会被同时交给其他使用者"""
+        pool = VideoReaderPool(_FakeReader)
+        first = pool.acquire("a.mp4")
+        second = pool.acquire("a.mp4")
+        assert first is not second
+        assert pool.open_count == 2
+
+    def test_evicts_least_recently_used_idle(self):
+        """测试超过上限时关闭最久未使用的空闲读取器"""
+        pool = VideoReaderPool(_FakeReader, max_open=2)
+        a = pool.acquire("a.mp4")
+        b = pool.acquire("b.mp4")
+        pool.release(a)
+        pool.release(b)
+        c = pool.acquire("c.mp4")
+        assert a.closed and not b.closed and not c.closed
+        assert pool.open_count == 2
+
+        # 全部在使用时允许暂时超过上限，归还后再收缩
+        d = pool.acquire("d.mp4")
+        assert b.closed
+        assert pool.open_count == 2
+        e = pool.acquire("e.mp4")
+        assert pool.open_count == 3
+        pool.release(e)
+        assert e.closed
+        assert not c.closed and not d.closed
+
+    def test_close_all(self):
+        """测试关闭所有读取器"""
+        with VideoReaderPool(_FakeReader) as pool:
+            a = pool.acquire("a.mp4")
+            with pool.reader("b.mp4") as b:
+                pass
+        assert a.closed and b.closed
+        assert pool.open_count == 0
+
+    def test_custom_closer(self):
+        """测试自定义关闭函数"""
+        closed = []
+        pool = VideoReaderPool(_FakeReader, closer=closed.append, max_open=0)
+        reader = pool.acquire("a.mp4")
+        pool.release(reader)
+        assert closed == [reader]
+        assert reader.closed is False
+
+
+class TestVideoReader:
+    """VideoReader 类的测试"""
+
+    def test_rewind(self, temp_video_file):
+        """测试再次从头解码"""
+        reader = VideoReader(temp_video_file(n_frames=10))
+        try:
+            first = [frame.to_ndarray(format="rgb24")[0, 0, 0] for frame in reader.frames()]
+            partial = next(iter(reader.frames())).to_ndarray(format="rgb24")[0, 0, 0]
+            again = [frame.to_ndarray(format="rgb24")[0, 0, 0] for frame in reader.frames()]
+        finally:
+            reader.close()
+        assert len(first) == 10
+        assert partial == first[0]
+        assert again == first
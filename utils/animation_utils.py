@@ -2,12 +2,28 @@
 动画效果工具模块
 提供图片动画效果配置和应用功能
 """
+from abc import ABC, abstractmethod
+
 import numpy as np
-from moviepy import CompositeVideoClip
+from moviepy import CompositeVideoClip, VideoClip
+from PIL import Image
+
+
+# 缩放动画的最大额外缩放比例（相对覆盖舞台的基础比例）
+ZOOM_RANGE_FACTOR = 0.3
+
+# 平移动画的额外缩放比例，以及最大移动幅度（相对舞台尺寸）
+PAN_SCALE_FACTOR = 0.5
+PAN_RANGE_FACTOR = 0.3
 
 
 class EasingCurve:
-    """缓动曲线类，提供各种动画缓动函数"""
+    """
+    缓动曲线类，提供各种动画缓动函数
+
+    所有函数既接受标量也接受 NumPy 数组：传入标量时返回 float，
+    传入数组时逐元素计算，便于一次算出整个片段每帧的进度。
+    """
 
     @staticmethod
     def linear(t):
@@ -27,7 +43,8 @@ class EasingCurve:
     @staticmethod
     def ease_in_out_quad(t):
         """二次缓入缓出"""
-        return 2 * t * t if t < 0.5 else -1 + (4 - 2 * t) * t
+        t = np.asarray(t, dtype=np.float64)
+        return _scalar_or_array(np.where(t < 0.5, 2 * t * t, -1 + (4 - 2 * t) * t))
 
     @staticmethod
     def ease_in_cubic(t):
@@ -42,7 +59,13 @@ class EasingCurve:
     @staticmethod
     def ease_in_out_cubic(t):
         """三次缓入缓出"""
-        return 4 * t * t * t if t < 0.5 else (t - 1) * (2 * t - 2) * (2 * t - 2) + 1
+        t = np.asarray(t, dtype=np.float64)
+        return _scalar_or_array(np.where(t < 0.5, 4 * t * t * t, (t - 1) * (2 * t - 2) * (2 * t - 2) + 1))
+
+
+def _scalar_or_array(result):
+    """0 维数组转换为 float，其余原样返回"""
+    return float(result) if result.ndim == 0 else result
 
 
 class AnimationConfig:
@@ -77,21 +100,56 @@ class AnimationConfig:
         """获取缓动函数"""
         return getattr(EasingCurve, self.easing, EasingCurve.linear)
 
+    def to_dict(self):
+        """
+        转换为可 JSON 序列化的字典
+
+        返回:
+            dict: 动画类型、强度、缓动曲线和持续时间
+        """
+        return {
+            "animation_type": self.animation_type,
+            "intensity": self.intensity,
+            "easing": self.easing,
+            "duration": self.duration,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        从 to_dict 生成的字典还原动画配置
+
+        参数:
+            data (dict): 动画配置字典
+
+        返回:
+            AnimationConfig: 动画配置
+        """
+        return cls(data.get("animation_type", cls.ZOOM_IN), data.get("intensity", 0.1),
+                   data.get("easing", "ease_in_out_quad"), data.get("duration"))
+
+
+# 缩放类和平移类动画
+ZOOM_TYPES = (AnimationConfig.ZOOM_IN, AnimationConfig.ZOOM_OUT)
+PAN_TYPES = (AnimationConfig.PAN_LEFT, AnimationConfig.PAN_RIGHT,
+             AnimationConfig.PAN_UP, AnimationConfig.PAN_DOWN)
+
 
-def apply_animation(clip, config, video_size):
+def apply_animation(clip, config, video_size, fps=None):
     """
     为图片片段应用动画效果
 
     注意：此函数应该在 resize_and_position_image 之前调用，
-    因为它会返回一个已经合成好的 CompositeVideoClip
+    因为它返回的片段已经是视频尺寸
 
     参数:
         clip: MoviePy 图片片段对象（原始 ImageClip）
         config (AnimationConfig): 动画配置
         video_size (tuple): 视频尺寸 (width, height)
+        fps (int): 输出帧率，用于预先计算每帧的变换参数；None 时使用片段的 fps，仍未知则逐帧计算
 
     返回:
-        CompositeVideoClip: 应用动画后的合成片段
+        VideoClip: 应用动画后的视频尺寸片段
     """
     if config.animation_type == AnimationConfig.NONE:
         # 无动画，使用标准的缩放和居中
@@ -104,16 +162,17 @@ def apply_animation(clip, config, video_size):
         return CompositeVideoClip([positioned_clip], size=video_size)
 
     easing_func = config.get_easing_function()
+    if fps is None:
+        fps = getattr(clip, "fps", None)
 
     if config.animation_type == AnimationConfig.ZOOM_IN:
-        return _apply_zoom(clip, config, video_size, easing_func, zoom_in=True)
+        return _apply_zoom(clip, config, video_size, easing_func, zoom_in=True, fps=fps)
 
     elif config.animation_type == AnimationConfig.ZOOM_OUT:
-        return _apply_zoom(clip, config, video_size, easing_func, zoom_in=False)
+        return _apply_zoom(clip, config, video_size, easing_func, zoom_in=False, fps=fps)
 
-    elif config.animation_type in [AnimationConfig.PAN_LEFT, AnimationConfig.PAN_RIGHT,
-                                    AnimationConfig.PAN_UP, AnimationConfig.PAN_DOWN]:
-        return _apply_pan(clip, config, video_size, easing_func)
+    elif config.animation_type in PAN_TYPES:
+        return _apply_pan(clip, config, video_size, easing_func, fps=fps)
 
     # 默认返回无动画版本
     video_w, video_h = video_size
@@ -125,100 +184,359 @@ def apply_animation(clip, config, video_size):
     return CompositeVideoClip([positioned_clip], size=video_size)
 
 
-def _apply_zoom(clip, config, video_size, easing_func, zoom_in=True):
+def _apply_zoom(clip, config, video_size, easing_func, zoom_in=True, fps=None):
     """
     应用缩放动画
-    通过动态 resize 实现缩放效果
+    每帧从源图中裁出可见区域并直接缩放到视频尺寸，不再逐帧缩放整张图片后合成
     """
-    video_w, video_h = video_size
-    img_w, img_h = clip.size
+    animator = ZoomAnimator(clip.get_frame(0), video_size, config.intensity,
+                            config.duration or clip.duration, easing_func, zoom_in, fps)
+    return VideoClip(animator.frame, duration=clip.duration)
 
-    # 计算基础缩放比例（确保图片覆盖视频区域）
-    base_scale = max(video_w / img_w, video_h / img_h)
 
-    # 计算动画缩放范围
-    zoom_range = config.intensity * 0.3  # 最大 30% 的缩放
-    start_scale = base_scale if zoom_in else base_scale * (1 + zoom_range)
-    end_scale = base_scale * (1 + zoom_range) if zoom_in else base_scale
+class _TransformTable(ABC):
+    """
+    动画帧生成器的公共部分：按缓动进度计算每帧的变换参数
 
-    # 使用 resize 的函数形式实现动态缩放
-    def resize_func(t):
-        progress = easing_func(min(t / clip.duration, 1.0))
-        scale = start_scale + (end_scale - start_scale) * progress
-        new_w = int(img_w * scale)
-        new_h = int(img_h * scale)
-        return (new_w, new_h)
+    帧率已知时，初始化时一次性向量化计算片段内每一帧的参数表，
+    逐帧渲染时按帧号查表，不再为每帧调用缓动函数和计算缩放、偏移。
+    """
 
-    # 调整图片大小（动态）
-    resized_clip = clip.resized(resize_func)
+    def _build_table(self, duration, easing_func, fps):
+        """
+        参数:
+            duration (float): 动画时长（秒）
+            easing_func (callable): 缓动函数，接受 NumPy 数组
+            fps (int): 帧率，None 表示不预先计算
+        """
+        self.duration = duration
+        self.easing_func = easing_func
+        self.fps = fps
+        self.table = None
+        if fps:
+            # 包含 t = duration 的最后一帧
+            count = int(np.floor(duration * fps + 1e-6)) + 1
+            self.table = self.transforms(self.progress(np.arange(count) / fps))
+
+    def progress(self, times):
+        """
+        计算缓动后的进度
 
-    # 设置位置（保持居中）
-    positioned_clip = resized_clip.with_position("center")
+        参数:
+            times (np.ndarray): 片段内时间（秒）
 
-    # 合成到指定尺寸的视频帧中
-    return CompositeVideoClip([positioned_clip], size=video_size)
+        返回:
+            np.ndarray: 0~1 的进度
+        """
+        times = np.asarray(times, dtype=np.float64)
+        if self.duration <= 0:
+            return np.ones_like(times)
+        return np.asarray(self.easing_func(np.minimum(times / self.duration, 1.0)), dtype=np.float64)
 
+    def transform_at(self, t):
+        """
+        获取 t 时刻的变换参数：有参数表时按最近的帧号查表，否则单独计算
 
-def _apply_pan(clip, config, video_size, easing_func):
+        参数:
+            t (float): 片段内时间（秒）
+
+        返回:
+            np.ndarray: 该帧的参数行
+        """
+        if self.table is not None:
+            index = min(max(int(round(t * self.fps)), 0), len(self.table) - 1)
+            return self.table[index]
+        return self.transforms(self.progress(np.array([t])))[0]
+
+    @abstractmethod
+    def transforms(self, progress):
+        """由进度数组计算每帧的参数，形状为 (帧数, 参数数)"""
+
+
+class ZoomAnimator(_TransformTable):
+    """
+    缩放动画帧生成器
+
+    源图在初始化时一次性缩小到刚好覆盖最大缩放时的画面，
+    之后每帧只裁出当前可见的矩形并直接缩放到舞台尺寸，写入预分配的缓冲区，
+    每帧开销与输出像素数成正比，与原图尺寸无关。
+    """
+
+    def __init__(self, image, stage_size, intensity, duration, easing_func=EasingCurve.linear,
+                 zoom_in=True, fps=None):
+        """
+        参数:
+            image (np.ndarray): 源图 (H, W, 3)，可以是原图，也可以是已按 zoom_headroom 缩小的图片
+            stage_size (tuple): 画面尺寸 (width, height)
+            intensity (float): 动画强度，最大额外缩放比例为 intensity * ZOOM_RANGE_FACTOR
+            duration (float): 动画时长（秒）
+            easing_func (callable): 缓动函数
+            zoom_in (bool): True 表示放大，False 表示缩小
+            fps (int): 帧率，已知时预先计算每帧的裁剪矩形
+        """
+        self.stage_size = tuple(stage_size)
+        zoom_range = intensity * ZOOM_RANGE_FACTOR
+        self.source = _cover_source(image, self.stage_size, 1 + zoom_range)
+
+        stage_w, stage_h = self.stage_size
+        src_w, src_h = self.source.size
+        base_scale = max(stage_w / src_w, stage_h / src_h)
+        self.start_scale = base_scale if zoom_in else base_scale * (1 + zoom_range)
+        self.end_scale = base_scale * (1 + zoom_range) if zoom_in else base_scale
+        self.output = np.empty((stage_h, stage_w, 3), dtype=np.uint8)
+        self._build_table(duration, easing_func, fps)
+
+    def crop_box(self, scale):
+        """
+        计算源图按 scale 缩放并居中时，舞台可见部分在源图中的矩形
+
+        参数:
+            scale (float or np.ndarray): 源图到舞台的缩放比例
+
+        返回:
+            tuple: (left, top, right, bottom)，可以是小数坐标；scale 为数组时每项也是数组
+        """
+        stage_w, stage_h = self.stage_size
+        src_w, src_h = self.source.size
+        half_w = stage_w / scale / 2
+        half_h = stage_h / scale / 2
+        return (src_w / 2 - half_w, src_h / 2 - half_h, src_w / 2 + half_w, src_h / 2 + half_h)
+
+    def frame(self, t):
+        """
+        生成 t 时刻的画面
+
+        参数:
+            t (float): 片段内时间（秒）
+
+        返回:
+            np.ndarray: 舞台尺寸的 uint8 画面（内部缓冲区，下次调用时会被覆盖）
+        """
+        box = tuple(float(v) for v in self.transform_at(t))
+        resized = self.source.resize(self.stage_size, Image.Resampling.BILINEAR, box=box)
+        np.copyto(self.output, np.asarray(resized))
+        return self.output
+
+    def transforms(self, progress):
+        """每帧的裁剪矩形 (left, top, right, bottom)"""
+        scales = self.start_scale + (self.end_scale - self.start_scale) * progress
+        return np.stack(self.crop_box(scales), axis=-1)
+
+
+def zoom_headroom(intensity):
+    """
+    缩放动画需要的源图余量：源图缩小到覆盖舞台尺寸的这个倍数即可保持最大缩放时的清晰度
+
+    参数:
+        intensity (float): 动画强度
+
+    返回:
+        float: 覆盖舞台的倍数
+    """
+    return 1 + intensity * ZOOM_RANGE_FACTOR
+
+
+def _cover_source(image, stage_size, headroom, upscale=False):
+    """
+    把源图转换为 PIL 图片，并一次性缩放到覆盖 stage_size * headroom 的尺寸
+
+    与目标尺寸相差不超过 1 像素的源图（如已按相同余量缩放过的缓存图片）保持不变。
+
+    参数:
+        image (np.ndarray): 源图 (H, W, 3) 或 (H, W, 4)
+        stage_size (tuple): 画面尺寸 (width, height)
+        headroom (float): 覆盖舞台的倍数
+        upscale (bool): 源图小于目标尺寸时是否放大
+
+    返回:
+        PIL.Image.Image: RGB 图片
+    """
+    array = np.asarray(image)
+    if array.ndim == 2:
+        array = np.stack([array] * 3, axis=-1)
+    source = Image.fromarray(np.ascontiguousarray(array[..., :3], dtype=np.uint8))
+    stage_w, stage_h = stage_size
+    src_w, src_h = source.size
+    scale = max(stage_w / src_w, stage_h / src_h) * headroom
+    new_w, new_h = max(stage_w, int(src_w * scale)), max(stage_h, int(src_h * scale))
+    if (scale < 1 or upscale) and (abs(new_w - src_w) > 1 or abs(new_h - src_h) > 1):
+        source = source.resize((new_w, new_h), Image.Resampling.LANCZOS)
+    return source
+
+
+def _apply_pan(clip, config, video_size, easing_func, fps=None):
     """
     应用平移动画
-    通过动态 position 实现平移效果
+    图片只缩放一次，每帧返回缩放后数组中舞台大小的窗口（切片视图），不再逐帧合成
     平移幅度基于视频画面比例，确保所有图片动画效果一致
     """
-    video_w, video_h = video_size
-    img_w, img_h = clip.size
+    animator = PanAnimator(clip.get_frame(0), video_size, config.intensity,
+                           config.duration or clip.duration, easing_func, config.animation_type, fps)
+    return VideoClip(animator.frame, duration=clip.duration)
 
-    # 计算基础缩放比例（确保图片覆盖视频区域）
-    base_scale = max(video_w / img_w, video_h / img_h)
-    # 额外缩放提供平移空间
-    scale = base_scale * (1 + config.intensity * 0.5)
-    new_w, new_h = int(img_w * scale), int(img_h * scale)
 
-    # 平移幅度基于视频宽度的百分比（统一所有图片的动画效果）
-    pan_percentage = config.intensity * 0.3  # 最大移动视频宽度的30%
-    max_offset_x = video_w * pan_percentage / 2
-    max_offset_y = video_h * pan_percentage / 2
-
-    def position_func(t):
-        progress = easing_func(min(t / clip.duration, 1.0))
-
-        # 居中位置
-        center_x = (video_w - new_w) / 2
-        center_y = (video_h - new_h) / 2
-
-        if config.animation_type == AnimationConfig.PAN_LEFT:
-            x = center_x + max_offset_x * (1 - 2 * progress)
-            y = center_y
-        elif config.animation_type == AnimationConfig.PAN_RIGHT:
-            x = center_x + max_offset_x * (2 * progress - 1)
-            y = center_y
-        elif config.animation_type == AnimationConfig.PAN_UP:
-            x = center_x
-            y = center_y + max_offset_y * (1 - 2 * progress)
+class PanAnimator(_TransformTable):
+    """
+    平移动画帧生成器
+
+    平移的图片始终覆盖整个舞台，每帧画面就是缩放后图片中的一个窗口：
+    初始化时一次性缩放源图，之后每帧按取整后的偏移返回切片视图，不复制像素。
+    """
+
+    def __init__(self, image, stage_size, intensity, duration, easing_func=EasingCurve.linear,
+                 direction=AnimationConfig.PAN_LEFT, fps=None):
+        """
+        参数:
+            image (np.ndarray): 源图 (H, W, 3)，可以是原图，也可以是已按 pan_headroom 缩放的图片
+            stage_size (tuple): 画面尺寸 (width, height)
+            intensity (float): 动画强度，额外缩放 intensity * PAN_SCALE_FACTOR，
+                最大移动舞台尺寸的 intensity * PAN_RANGE_FACTOR
+            duration (float): 动画时长（秒）
+            easing_func (callable): 缓动函数
+            direction (str): 平移方向，AnimationConfig.PAN_LEFT/PAN_RIGHT/PAN_UP/PAN_DOWN
+            fps (int): 帧率，已知时预先计算每帧的窗口位置
+        """
+        self.stage_size = tuple(stage_size)
+        self.direction = direction
+        self.source = np.asarray(_cover_source(image, self.stage_size, pan_headroom(intensity),
+                                               upscale=True))
+
+        stage_w, stage_h = self.stage_size
+        src_h, src_w = self.source.shape[:2]
+        # 居中时窗口左上角在图片中的位置，以及允许的最大偏移
+        self.center = ((src_w - stage_w) / 2, (src_h - stage_h) / 2)
+        self.limit = (src_w - stage_w, src_h - stage_h)
+        pan_percentage = intensity * PAN_RANGE_FACTOR
+        self.max_offset = (stage_w * pan_percentage / 2, stage_h * pan_percentage / 2)
+        self._build_table(duration, easing_func, fps)
+
+    def window_origin(self, progress):
+        """
+        计算平移进度对应的窗口左上角（图片坐标，取整并限制在图片范围内）
+
+        参数:
+            progress (float): 缓动后的进度（0~1）
+
+        返回:
+            tuple: (x, y)
+        """
+        x, y = self.transforms(np.array([progress], dtype=np.float64))[0]
+        return (int(x), int(y))
+
+    def transforms(self, progress):
+        """每帧的窗口左上角 (x, y)"""
+        x = np.full_like(progress, self.center[0])
+        y = np.full_like(progress, self.center[1])
+        if self.direction == AnimationConfig.PAN_LEFT:
+            x -= self.max_offset[0] * (1 - 2 * progress)
+        elif self.direction == AnimationConfig.PAN_RIGHT:
+            x -= self.max_offset[0] * (2 * progress - 1)
+        elif self.direction == AnimationConfig.PAN_UP:
+            y -= self.max_offset[1] * (1 - 2 * progress)
         else:  # PAN_DOWN
-            x = center_x
-            y = center_y + max_offset_y * (2 * progress - 1)
+            y -= self.max_offset[1] * (2 * progress - 1)
+        origins = np.stack([np.rint(x), np.rint(y)], axis=-1).astype(np.intp)
+        return np.clip(origins, 0, self.limit)
 
-        return (x, y)
+    def frame(self, t):
+        """
+        生成 t 时刻的画面
 
-    resized_clip = clip.resized(new_size=(new_w, new_h))
-    positioned_clip = resized_clip.with_position(position_func)
+        参数:
+            t (float): 片段内时间（秒）
 
-    return CompositeVideoClip([positioned_clip], size=video_size)
+        返回:
+            np.ndarray: 舞台尺寸的只读切片视图，与源图共享内存
+        """
+        x, y = self.transform_at(t)
+        stage_w, stage_h = self.stage_size
+        return self.source[y:y + stage_h, x:x + stage_w]
+
+
+def pan_headroom(intensity):
+    """
+    平移动画需要的源图余量：源图缩放到覆盖舞台尺寸的这个倍数
+
+    参数:
+        intensity (float): 动画强度
+
+    返回:
+        float: 覆盖舞台的倍数
+    """
+    return 1 + intensity * PAN_SCALE_FACTOR
+
+
+def is_animated(config):
+    """
+    判断动画配置是否会产生运动画面
+
+    参数:
+        config (AnimationConfig): 动画配置，可以为 None
+
+    返回:
+        bool: 缩放或平移动画返回 True，None、NONE 和未知类型返回 False
+    """
+    return config is not None and config.animation_type in ZOOM_TYPES + PAN_TYPES
+
+
+def animation_headroom(config):
+    """
+    动画需要的源图余量，用于按相同倍数预先缩放并缓存图片
+
+    参数:
+        config (AnimationConfig): 动画配置
+
+    返回:
+        float: 覆盖舞台的倍数，无动画时为 1
+    """
+    if config is None:
+        return 1.0
+    if config.animation_type in ZOOM_TYPES:
+        return zoom_headroom(config.intensity)
+    if config.animation_type in PAN_TYPES:
+        return pan_headroom(config.intensity)
+    return 1.0
+
+
+def create_animator(image, stage_size, config, duration, fps=None):
+    """
+    按动画配置创建帧生成器
+
+    参数:
+        image (np.ndarray): 源图，最好已按 animation_headroom(config) 预先缩放
+        stage_size (tuple): 画面尺寸 (width, height)
+        config (AnimationConfig): 动画配置
+        duration (float): 片段时长（秒），config.duration 为 None 时作为动画时长
+        fps (int): 帧率，已知时预先计算每帧的变换参数
+
+    返回:
+        ZoomAnimator or PanAnimator or None: 帧生成器，无动画时返回 None
+    """
+    if not is_animated(config):
+        return None
+    easing_func = config.get_easing_function()
+    duration = config.duration or duration
+    if config.animation_type in ZOOM_TYPES:
+        return ZoomAnimator(image, stage_size, config.intensity, duration, easing_func,
+                            config.animation_type == AnimationConfig.ZOOM_IN, fps)
+    return PanAnimator(image, stage_size, config.intensity, duration, easing_func,
+                       config.animation_type, fps)
 
 
-def get_random_animation_config(intensity=0.1, easing="ease_in_out_quad"):
+def get_random_animation_config(intensity=0.1, easing="ease_in_out_quad", rng=None):
     """
     获取随机动画配置
 
     参数:
         intensity (float): 动画强度
         easing (str): 缓动曲线
+        rng (random.Random): 随机数生成器，None 表示使用全局 random 模块
 
     返回:
         AnimationConfig: 随机动画配置
     """
     import random
+    rng = rng or random
     animation_types = [
         AnimationConfig.ZOOM_IN,
         AnimationConfig.ZOOM_OUT,
@@ -228,5 +546,5 @@ def get_random_animation_config(intensity=0.1, easing="ease_in_out_quad"):
         AnimationConfig.PAN_DOWN,
     ]
 
-    animation_type = random.choice(animation_types)
+    animation_type = rng.choice(animation_types)
     return AnimationConfig(animation_type, intensity, easing)
@@ -2,9 +2,21 @@
 音频处理工具模块
 提供音频时长获取和停顿点检测功能
 """
+import math
+import os
+import queue
+import struct
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import List, Optional
+
 import av
 import numpy as np
 
+from utils.cache_utils import DiskCache, file_fingerprint, make_cache_key
+
 
 def get_audio_duration_ffmpeg(audio_path):
     """
@@ -33,102 +45,1648 @@ def get_audio_duration_ffmpeg(audio_path):
         raise RuntimeError(f"无法获取音频时长（PyAV）：{e}")
 
 
-def get_audio_pauses(audio_path, min_pause=0.5, noise_threshold=-35, min_interval=5.0):
+# 静音包络的固定窗口长度（秒），与编解码器的帧大小无关
+DEFAULT_WINDOW = 0.025
+
+# 解码时拼接成大块再做向量化计算，每块约 2^18 个采样点
+DECODE_BLOCK_SIZE = 1 << 18
+
+# 低采样率分析模式使用的采样率，静音检测不需要完整的音频带宽
+LOW_ANALYSIS_RATE = 8000
+
+# RMS 为 0 时使用的 dB 下限
+SILENCE_FLOOR_DB = -100.0
+
+# 音频分析缓存的子目录和容量上限
+AUDIO_CACHE_NAMESPACE = "audio"
+AUDIO_CACHE_MAX_BYTES = 64 << 20
+
+# 分析算法版本，算法变化导致结果不同时递增，使旧缓存失效
+ANALYSIS_VERSION = 2
+
+
+def _window_samples(sample_rate, window):
+    """将窗口时长换算为采样点数（至少为 1）"""
+    return max(1, int(round(window * sample_rate)))
+
+
+def _window_mean_square(samples, win):
+    """
+    按窗口重排后逐行求平方和，计算完整窗口的均方值
+
+    参数:
+        samples (np.ndarray): 单声道 float32 采样
+        win (int): 每个窗口的采样点数
+
+    返回:
+        np.ndarray: 每个完整窗口的均方值（float64）
+    """
+    n_full = len(samples) // win
+    if n_full == 0:
+        return np.empty(0, dtype=np.float64)
+    windows = samples[:n_full * win].reshape(n_full, win)
+    return np.einsum("ij,ij->i", windows, windows, dtype=np.float64) / win
+
+
+def _mean_square_to_db(mean_square):
+    """均方值转换为 dB，RMS 为 0 时取 SILENCE_FLOOR_DB"""
+    envelope = np.full(mean_square.shape, SILENCE_FLOOR_DB, dtype=np.float64)
+    positive = mean_square > 0
+    # 20 * log10(sqrt(ms)) == 10 * log10(ms)
+    envelope[positive] = 10.0 * np.log10(mean_square[positive])
+    return envelope
+
+
+class _EnvelopeAccumulator:
+    """
+    增量计算固定窗口的均方值
+
+    每次送入一块采样，输出其中完整窗口的均方值；不足一个窗口的残余
+    采样带入下一块，因此窗口边界与解码帧、数据块的边界无关。
+    """
+
+    def __init__(self, win):
+        self.win = win
+        self.carry = np.empty(0, dtype=np.float32)
+        self.parts = []
+        self.total_samples = 0
+
+    def push(self, block):
+        """送入一块单声道采样，返回新产生的完整窗口均方值"""
+        self.total_samples += block.size
+        if self.carry.size:
+            block = np.concatenate((self.carry, block))
+        mean_square = _window_mean_square(block, self.win)
+        self.carry = block[len(mean_square) * self.win:]
+        self.parts.append(mean_square)
+        return mean_square
+
+    def finish(self):
+        """结束输入，返回末尾不完整窗口的均方值（0 或 1 个元素）"""
+        if self.carry.size:
+            tail = np.array([np.mean(np.square(self.carry, dtype=np.float64))])
+            self.carry = np.empty(0, dtype=np.float32)
+        else:
+            tail = np.empty(0, dtype=np.float64)
+        self.parts.append(tail)
+        return tail
+
+    def mean_square(self):
+        """返回目前为止所有窗口的均方值"""
+        if not self.parts:
+            return np.empty(0, dtype=np.float64)
+        return np.concatenate(self.parts)
+
+
+# WAV 格式标签
+WAV_FORMAT_PCM = 0x0001
+WAV_FORMAT_FLOAT = 0x0003
+WAV_FORMAT_EXTENSIBLE = 0xFFFE
+
+# 可以直接内存映射的 (格式标签, 位深) -> NumPy 数据类型；24 位等其他格式走 PyAV 解码
+_WAV_DTYPES = {
+    (WAV_FORMAT_PCM, 8): np.dtype("u1"),
+    (WAV_FORMAT_PCM, 16): np.dtype("<i2"),
+    (WAV_FORMAT_PCM, 32): np.dtype("<i4"),
+    (WAV_FORMAT_FLOAT, 32): np.dtype("<f4"),
+    (WAV_FORMAT_FLOAT, 64): np.dtype("<f8"),
+}
+
+
+@dataclass
+class WavInfo:
+    """未压缩 WAV 文件的格式信息数据类"""
+    sample_rate: int
+    channels: int
+    dtype: np.dtype
+    n_frames: int
+    data_offset: int
+
+
+def read_wav_header(audio_path):
+    """
+    解析 RIFF/WAVE 文件头，找出采样格式和 data 块的位置
+
+    参数:
+        audio_path (str): 音频文件路径
+
+    返回:
+        WavInfo or None: 可以直接内存映射时返回格式信息；文件不存在、不是 WAV、
+        或者是压缩/不支持的采样格式时返回 None
+    """
+    try:
+        file_size = os.path.getsize(audio_path)
+        with open(audio_path, "rb") as f:
+            riff = f.read(12)
+            if len(riff) < 12 or riff[:4] != b"RIFF" or riff[8:12] != b"WAVE":
+                return None
+
+            fmt = None
+            while True:
+                header = f.read(8)
+                if len(header) < 8:
+                    return None
+                chunk_id, chunk_size = struct.unpack("<4sI", header)
+                if chunk_id == b"fmt ":
+                    fmt = f.read(chunk_size)
+                    if chunk_size % 2:
+                        f.seek(1, os.SEEK_CUR)
+                elif chunk_id == b"data":
+                    data_offset = f.tell()
+                    break
+                else:
+                    f.seek(chunk_size + chunk_size % 2, os.SEEK_CUR)
+    except OSError:
+        return None
+
+    if fmt is None or len(fmt) < 16:
+        return None
+    format_tag, channels, sample_rate, _, block_align, bits = struct.unpack("<HHIIHH", fmt[:16])
+    if format_tag == WAV_FORMAT_EXTENSIBLE and len(fmt) >= 26:
+        # 子格式 GUID 的前两个字节即实际的格式标签
+        format_tag = struct.unpack("<H", fmt[24:26])[0]
+    dtype = _WAV_DTYPES.get((format_tag, bits))
+    if dtype is None or channels <= 0 or sample_rate <= 0 or block_align != dtype.itemsize * channels:
+        return None
+
+    # 流式写出的 WAV 可能把 data 块大小写成 0 或 0xFFFFFFFF，以实际文件大小为准
+    data_size = file_size - data_offset
+    if 0 < chunk_size <= data_size:
+        data_size = chunk_size
+    return WavInfo(
+        sample_rate=sample_rate,
+        channels=channels,
+        dtype=dtype,
+        n_frames=data_size // block_align,
+        data_offset=data_offset,
+    )
+
+
+def map_wav(audio_path, info=None):
+    """
+    以只读方式内存映射 WAV 的采样数据
+
+    参数:
+        audio_path (str): 音频文件路径
+        info (WavInfo): 已解析的格式信息，None 表示重新解析
+
+    返回:
+        np.ndarray: 形状为 (n_frames, channels) 的原始采样（未缩放），无采样时为空数组
+
+    异常:
+        ValueError: 文件不是可映射的 WAV 时抛出
+    """
+    if info is None:
+        info = read_wav_header(audio_path)
+    if info is None:
+        raise ValueError(f"不是可直接映射的 WAV 文件: {audio_path}")
+    if info.n_frames == 0:
+        return np.empty((0, info.channels), dtype=info.dtype)
+    return np.memmap(audio_path, dtype=info.dtype, mode="r", offset=info.data_offset,
+                     shape=(info.n_frames, info.channels))
+
+
+def _wav_to_float(raw):
+    """将原始整数/浮点采样缩放为 [-1, 1] 的 float32，与 PyAV 转换为 flt 的结果一致"""
+    if raw.dtype == np.uint8:
+        return (raw.astype(np.float32) - 128.0) / 128.0
+    if raw.dtype.kind == "i":
+        return raw.astype(np.float32) / float(1 << (8 * raw.dtype.itemsize - 1))
+    return raw.astype(np.float32)
+
+
+def _wav_downmix(samples):
+    """
+    多声道浮点采样混为单声道
+
+    单声道原样返回；立体声按 libswresample 的默认矩阵 (L + R) * sqrt(1/2) 混合，
+    保证与 PyAV 路径得到的包络一致。
+    """
+    if samples.shape[1] == 1:
+        return samples[:, 0]
+    return (samples[:, 0] + samples[:, 1]) * np.float32(np.sqrt(0.5))
+
+
+def _wav_step(wav, analysis_rate=None, decimate=False):
+    """
+    计算内存映射 WAV 时分析流的抽取步长
+
+    步长取能整除原采样率、且抽取后采样率不低于 analysis_rate 的最大整数，
+    抽取后的采样率仍为整数。
+
+    参数:
+        wav (WavInfo): WAV 格式信息，None 表示不是可映射的 WAV
+        analysis_rate (int): 目标分析采样率，None 表示保持原采样率
+        decimate (bool): 是否允许抽取；不允许时只有采样率相同才能映射
+
+    返回:
+        int or None: 抽取步长（1 表示不抽取），不能走内存映射路径时返回 None
+    """
+    if wav is None or wav.channels > 2:
+        return None
+    if analysis_rate in (None, wav.sample_rate):
+        return 1
+    if not decimate or analysis_rate > wav.sample_rate:
+        return None
+    step = max(1, wav.sample_rate // analysis_rate)
+    while wav.sample_rate % step:
+        step -= 1
+    return step
+
+
+class _AudioBlockDecoder:
+    """
+    使用 PyAV 一次性解复用和解码音频，按大块产出 PCM
+
+    每个解码帧分别重采样为单声道 float32（用于分析）和保留原声道布局的
+    float32（可选，用于后续合成），文件只读取一次。
+    分析用的单声道流可以在重采样时直接降到较低采样率，减少后续计算量。
+
+    单声道或立体声的未压缩 WAV 在不需要重采样时直接内存映射 data 块，
+    按块切片后缩放和混音，不经过 PyAV 解码。只计算能量包络时（decimate=True），
+    较低的分析采样率也走内存映射路径，按整数步长抽取采样：
+    抽取不做低通滤波，混叠保留了信号功率，窗口均方值仍与原采样率一致，
+    但不适用于频谱分析。
+    """
+
+    def __init__(self, audio_path, keep_pcm=False, block_size=DECODE_BLOCK_SIZE,
+                 analysis_rate=None, decimate=False):
+        """
+        参数:
+            audio_path (str): 音频文件路径
+            keep_pcm (bool): 是否同时产出原声道布局的 PCM（保持原采样率）
+            block_size (int): 每块的最少采样点数
+            analysis_rate (int): 单声道分析流的采样率，None 表示保持原采样率
+            decimate (bool): 分析流只用于能量包络，WAV 可以直接抽取到不低于 analysis_rate 的采样率
+        """
+        self.audio_path = audio_path
+        self.keep_pcm = keep_pcm
+        self.block_size = block_size
+        self.container = None
+        self.sample_rate = None
+        self.analysis_rate = analysis_rate
+        self.decimate = decimate
+        self.channels = None
+        self.start_time = None
+        self.mapped = None
+        self.step = 1
+
+    def __enter__(self):
+        wav = read_wav_header(self.audio_path)
+        step = _wav_step(wav, self.analysis_rate, self.decimate)
+        if step is not None:
+            self.mapped = map_wav(self.audio_path, wav)
+            self.step = step
+            self.sample_rate = wav.sample_rate
+            self.analysis_rate = wav.sample_rate // step
+            self.channels = wav.channels
+            return self
+
+        self.container = av.open(self.audio_path)
+        audio_stream = self.container.streams.audio[0]
+        self.sample_rate = audio_stream.rate
+        self.channels = audio_stream.codec_context.channels
+        if not self.analysis_rate:
+            self.analysis_rate = self.sample_rate
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.container is not None:
+            self.container.close()
+        self.mapped = None
+        return False
+
+    def blocks(self):
+        """
+        产出:
+            tuple: (mono, pcm)
+                - mono (np.ndarray): 单声道采样（analysis_rate），形状 (n,)
+                - pcm (np.ndarray or None): 原声道布局采样，形状 (n, channels)
+        """
+        if self.mapped is not None:
+            yield from self._mapped_blocks()
+            return
+
+        # 重采样到单声道 float32，便于直接做 NumPy 计算
+        mono_resampler = av.audio.resampler.AudioResampler(
+            format='flt',
+            layout='mono',
+            rate=self.analysis_rate
+        )
+        pcm_resampler = None
+        if self.keep_pcm:
+            pcm_resampler = av.audio.resampler.AudioResampler(
+                format='flt',
+                rate=self.sample_rate
+            )
+
+        pending_mono = []
+        pending_pcm = []
+        pending_size = 0
+
+        def _flush():
+            mono = np.concatenate(pending_mono)
+            pcm = np.concatenate(pending_pcm) if pending_pcm else None
+            pending_mono.clear()
+            pending_pcm.clear()
+            return mono, pcm
+
+        for frame in self._frames():
+            for out in mono_resampler.resample(frame):
+                if self.start_time is None:
+                    self.start_time = float(out.pts * out.time_base) if out.pts is not None else 0.0
+                chunk = out.to_ndarray().reshape(-1)
+                pending_mono.append(chunk)
+                pending_size += chunk.size
+            if pcm_resampler is not None:
+                for out in pcm_resampler.resample(frame):
+                    pending_pcm.append(out.to_ndarray().reshape(-1, self.channels))
+            if pending_size >= self.block_size:
+                yield _flush()
+                pending_size = 0
+
+        if self.start_time is None:
+            self.start_time = 0.0
+        if pending_mono:
+            yield _flush()
+
+    def _mapped_blocks(self):
+        """从内存映射的 WAV 数据中按块产出 (mono, pcm)"""
+        self.start_time = 0.0
+        step = self.step
+        # 块长取步长的整数倍，抽取的相位在块之间保持连续
+        block = -(-self.block_size // step) * step
+        for start in range(0, len(self.mapped), block):
+            raw = self.mapped[start:start + block]
+            samples = _wav_to_float(raw) if self.keep_pcm else None
+            mono = _wav_downmix(samples[::step] if samples is not None else _wav_to_float(raw[::step]))
+            yield mono, samples
+
+    def _frames(self):
+        """依次产出解码帧，最后产出 None 以刷新重采样器"""
+        for frame in self.container.decode(audio=0):
+            yield frame
+        yield None
+
+
+class PCMReader:
+    """
+    按采样数顺序读取保留原声道布局和采样率的 float32 PCM
+
+    底层由 _AudioBlockDecoder 按块解码，只缓存尚未读出的一块，
+    渲染时可以随视频帧逐段读取并编码，不需要把整段音频解码到内存中。
+    """
+
+    def __init__(self, audio_path, block_size=DECODE_BLOCK_SIZE):
+        """
+        参数:
+            audio_path (str): 音频文件路径
+            block_size (int): 每次解码的最少采样点数
+        """
+        self._decoder = _AudioBlockDecoder(audio_path, keep_pcm=True, block_size=block_size)
+        self._blocks = None
+        self._pending = None
+        self.sample_rate = None
+        self.channels = None
+
+    def open(self):
+        """打开音频文件，读取采样率和声道数"""
+        self._decoder.__enter__()
+        self.sample_rate = self._decoder.sample_rate
+        self.channels = self._decoder.channels
+        self._blocks = self._decoder.blocks()
+        self._pending = np.empty((0, self.channels), dtype=np.float32)
+        return self
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def close(self):
+        if self._blocks is not None:
+            self._blocks.close()
+            self._blocks = None
+        self._decoder.__exit__(None, None, None)
+
+    def read(self, count):
+        """
+        读取接下来的 count 个采样
+
+        参数:
+            count (int): 采样点数
+
+        返回:
+            np.ndarray: 形状为 (n, channels) 的 float32 PCM，到达结尾时 n 小于 count
+        """
+        chunks = [self._pending]
+        available = len(self._pending)
+        while available < count and self._blocks is not None:
+            try:
+                _, pcm = next(self._blocks)
+            except StopIteration:
+                self._blocks = None
+                break
+            chunks.append(pcm)
+            available += len(pcm)
+        data = chunks[0] if len(chunks) == 1 else np.concatenate(chunks)
+        self._pending = data[count:]
+        return data[:count]
+
+
+def decode_audio_mono(audio_path, analysis_rate=None):
+    """
+    将整个音频解码为一段连续的单声道 float32 PCM
+
+    参数:
+        audio_path (str): 音频文件路径
+        analysis_rate (int): 输出采样率，None 表示保持原采样率
+
+    返回:
+        tuple: (pcm, sample_rate)，pcm 取值范围为 [-1, 1]
+    """
+    with _AudioBlockDecoder(audio_path, analysis_rate=analysis_rate) as decoder:
+        chunks = [mono for mono, _ in decoder.blocks()]
+        sample_rate = decoder.analysis_rate
+    if not chunks:
+        return np.empty(0, dtype=np.float32), sample_rate
+    return np.concatenate(chunks), sample_rate
+
+
+def compute_rms_envelope(pcm, sample_rate, window=DEFAULT_WINDOW):
+    """
+    计算固定窗口的 RMS 包络（dB）
+
+    末尾不足一个窗口的采样单独计算为最后一个窗口。
+
+    参数:
+        pcm (np.ndarray): 单声道 PCM，取值范围 [-1, 1]
+        sample_rate (int): 采样率
+        window (float): 窗口时长（秒）
+
+    返回:
+        np.ndarray: 每个窗口的 RMS 值（dB）
+    """
+    pcm = np.asarray(pcm, dtype=np.float32).reshape(-1)
+    accumulator = _EnvelopeAccumulator(_window_samples(sample_rate, window))
+    accumulator.push(pcm)
+    accumulator.finish()
+    return _mean_square_to_db(accumulator.mean_square())
+
+
+def compute_audio_envelope(audio_path, window=DEFAULT_WINDOW, analysis_rate=None):
+    """
+    解码音频文件并计算固定窗口的 RMS 包络
+
+    解码结果按大块拼接后整体向量化计算，跨块的残余采样会带入下一块，
+    因此窗口边界与解码帧边界无关。
+
+    参数:
+        audio_path (str): 音频文件路径
+        window (float): 窗口时长（秒）
+        analysis_rate (int): 分析采样率，None 表示保持原采样率
+
+    返回:
+        tuple: (envelope_db, window, start_time, duration)
+            - envelope_db (np.ndarray): 每个窗口的 RMS 值（dB）
+            - window (float): 实际窗口时长（秒，按采样点取整）
+            - start_time (float): 第一个采样的时间戳（秒）
+            - duration (float): 解码得到的音频时长（秒）
+    """
+    with _AudioBlockDecoder(audio_path, analysis_rate=analysis_rate, decimate=True) as decoder:
+        win = _window_samples(decoder.analysis_rate, window)
+        accumulator = _EnvelopeAccumulator(win)
+        for mono, _ in decoder.blocks():
+            accumulator.push(mono)
+        accumulator.finish()
+        sample_rate = decoder.analysis_rate
+        start_time = decoder.start_time
+
+    return (_mean_square_to_db(accumulator.mean_square()), win / sample_rate,
+            start_time, accumulator.total_samples / sample_rate)
+
+
+# 并行分析时每个分块的最短时长（秒），以及每个进程分到的分块数
+PARALLEL_MIN_CHUNK_SECONDS = 60.0
+PARALLEL_CHUNKS_PER_WORKER = 2
+
+# 分块定位后向前多解码的时长（秒），丢弃这部分采样以避开解码器在定位点附近的不稳定输出
+PARALLEL_PREROLL_SECONDS = 1.0
+
+
+def _stream_sample_time(audio_path, analysis_rate=None):
+    """
+    读取音频流的分析采样率和第一个采样的时间戳
+
+    返回:
+        tuple: (analysis_rate, start_time)
+    """
+    with _AudioBlockDecoder(audio_path, analysis_rate=analysis_rate) as decoder:
+        for _ in decoder.blocks():
+            break
+        return decoder.analysis_rate, decoder.start_time or 0.0
+
+
+def _chunk_mean_square(audio_path, first_sample, end_sample, win, analysis_rate, start_time):
+    """
+    解码 [first_sample, end_sample) 区间并计算其中窗口的均方值（在子进程中执行）
+
+    first_sample 必须是 win 的整数倍，这样各分块的窗口与顺序分析的全局窗口网格对齐。
+    采样位置由定位后第一帧的时间戳确定，之后按输出采样数累加。
+
+    参数:
+        audio_path (str): 音频文件路径
+        first_sample (int): 分块起点（分析采样率下相对于第一个采样的位置）
+        end_sample (int or None): 分块终点（不含），None 表示读到文件结尾
+        win (int): 窗口采样点数
+        analysis_rate (int): 分析采样率
+        start_time (float): 第一个采样的时间戳（秒）
+
+    返回:
+        tuple: (mean_square, n_samples)，读到文件结尾时包含末尾不完整的窗口
+    """
+    with av.open(audio_path) as container:
+        stream = container.streams.audio[0]
+        seek_time = first_sample / analysis_rate - PARALLEL_PREROLL_SECONDS
+        if seek_time > 0:
+            container.seek(int((start_time + seek_time) / stream.time_base),
+                           stream=stream, backward=True)
+
+        resampler = av.audio.resampler.AudioResampler(format='flt', layout='mono', rate=analysis_rate)
+        accumulator = _EnvelopeAccumulator(win)
+        position = None
+        reached_end = False
+
+        def _frames():
+            for decoded in container.decode(stream):
+                yield decoded
+            yield None
+
+        for frame in _frames():
+            for out in resampler.resample(frame):
+                if position is None:
+                    if out.pts is None:
+                        raise RuntimeError("音频帧缺少时间戳，无法并行分析")
+                    position = int(round((float(out.pts * out.time_base) - start_time) * analysis_rate))
+                chunk = out.to_ndarray().reshape(-1)
+                lo = max(first_sample - position, 0)
+                hi = chunk.size if end_sample is None else min(end_sample - position, chunk.size)
+                position += chunk.size
+                if hi > lo:
+                    accumulator.push(chunk[lo:hi])
+                if end_sample is not None and position >= end_sample:
+                    reached_end = True
+                    break
+            if reached_end:
+                break
+
+        if not reached_end:
+            accumulator.finish()
+        return accumulator.mean_square(), accumulator.total_samples
+
+
+def compute_audio_envelope_parallel(audio_path, window=DEFAULT_WINDOW, analysis_rate=None,
+                                    workers=None, chunk_duration=None):
+    """
+    将音频按时间范围分块，在进程池中并行解码并计算 RMS 包络
+
+    分块边界取在全局窗口网格上，各块的窗口均方值直接拼接即得到与顺序分析一致的包络，
+    跨分块的静音区间在拼接后的包络上统一检测，不需要额外拼接停顿点。
+    时长较短（只够一个分块）时退回顺序分析。
+
+    参数:
+        audio_path (str): 音频文件路径
+        window (float): 窗口时长（秒）
+        analysis_rate (int): 分析采样率，None 表示保持原采样率
+        workers (int): 进程数，None 表示使用 CPU 核数
+        chunk_duration (float): 分块时长（秒），None 表示按进程数自动划分
+
+    返回:
+        tuple: (envelope_db, window, start_time, duration)，与 compute_audio_envelope 相同
+    """
+    workers = workers or os.cpu_count() or 1
+    if _wav_step(read_wav_header(audio_path), analysis_rate, decimate=True) is not None:
+        # 未压缩 WAV 直接内存映射计算，瓶颈不在解码，无需多进程
+        return compute_audio_envelope(audio_path, window, analysis_rate=analysis_rate)
+    duration = get_audio_duration_ffmpeg(audio_path)
+    if chunk_duration is None:
+        n_chunks = min(workers * PARALLEL_CHUNKS_PER_WORKER,
+                       int(duration // PARALLEL_MIN_CHUNK_SECONDS))
+    else:
+        n_chunks = int(math.ceil(duration / chunk_duration))
+    if workers <= 1 or n_chunks <= 1:
+        return compute_audio_envelope(audio_path, window, analysis_rate=analysis_rate)
+
+    rate, start_time = _stream_sample_time(audio_path, analysis_rate)
+    win = _window_samples(rate, window)
+    total_windows = int(math.ceil(duration * rate / win))
+    windows_per_chunk = max(1, int(math.ceil(total_windows / n_chunks)))
+    bounds = [k * windows_per_chunk * win for k in range(n_chunks)]
+
+    with ProcessPoolExecutor(max_workers=min(workers, n_chunks)) as executor:
+        futures = [
+            executor.submit(_chunk_mean_square, audio_path, first,
+                            bounds[k + 1] if k + 1 < n_chunks else None,
+                            win, rate, start_time)
+            for k, first in enumerate(bounds)
+        ]
+        results = [future.result() for future in futures]
+
+    mean_square = np.concatenate([ms for ms, _ in results])
+    total_samples = sum(n for _, n in results)
+    return _mean_square_to_db(mean_square), win / rate, start_time, total_samples / rate
+
+
+def find_silence_runs(envelope_db, noise_threshold):
+    """
+    对整条包络一次性阈值化，并用游程编码找出静音区间
+
+    参数:
+        envelope_db (np.ndarray): RMS 包络（dB）
+        noise_threshold (float): 噪音阈值（dB），低于该值视为静音
+
+    返回:
+        tuple: (starts, lengths)，均为窗口索引单位的 np.ndarray
+    """
+    silent = np.asarray(envelope_db) < noise_threshold
+    if silent.size == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty
+    padded = np.concatenate(([False], silent, [False])).astype(np.int8)
+    edges = np.diff(padded)
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    return starts, ends - starts
+
+
+def filter_min_interval(pauses, min_interval):
+    """
+    过滤掉与上一个保留点间隔小于 min_interval 的停顿点
+
+    参数:
+        pauses (list): 停顿时间点列表（秒），按时间升序
+        min_interval (float): 停顿点之间的最小间隔（秒）
+
+    返回:
+        list: 过滤后的停顿时间点列表
+    """
+    if min_interval <= 0 or not pauses:
+        return list(pauses)
+    filtered_pauses = []
+    last_point = 0.0
+    for point in pauses:
+        if point - last_point >= min_interval:
+            filtered_pauses.append(point)
+            last_point = point
+    return filtered_pauses
+
+
+def pauses_from_envelope(envelope_db, window, min_pause=0.5, noise_threshold=-35,
+                         min_interval=5.0, start_time=0.0, duration=None):
+    """
+    从 RMS 包络中提取停顿时间点
+
+    参数:
+        envelope_db (np.ndarray): RMS 包络（dB）
+        window (float): 窗口时长（秒）
+        min_pause (float): 最小停顿时长（秒）
+        noise_threshold (float): 噪音阈值（dB）
+        min_interval (float): 停顿点之间的最小间隔（秒）
+        start_time (float): 第一个窗口的起始时间（秒）
+        duration (float): 音频总时长（秒），用于截断最后一个不完整窗口
+
+    返回:
+        list: 停顿开始时间点列表（单位：秒）
+    """
+    starts, lengths = find_silence_runs(envelope_db, noise_threshold)
+    if starts.size == 0:
+        return []
+
+    run_start = starts * window
+    run_end = (starts + lengths) * window
+    if duration is not None:
+        run_end = np.minimum(run_end, duration)
+    # 加一个微小容差，避免窗口时长的浮点误差把恰好等于 min_pause 的静音排除
+    keep = (run_end - run_start) >= min_pause - 1e-9
+
+    pauses = [float(t) for t in run_start[keep] + start_time]
+    return filter_min_interval(pauses, min_interval)
+
+
+# 停顿候选评分中，低于阈值每 PAUSE_DEPTH_SCALE dB 相当于时长加倍
+PAUSE_DEPTH_SCALE = 20.0
+
+
+@dataclass
+class PauseCandidate:
+    """停顿候选数据类"""
+    time: float
+    length: float
+    depth: float
+
+    @property
+    def score(self) -> float:
+        """停顿越长、越安静，作为切换点越合适"""
+        return self.length * (1.0 + max(self.depth, 0.0) / PAUSE_DEPTH_SCALE)
+
+
+def find_pause_candidates(envelope_db, window, min_pause=0.3, noise_threshold=-35,
+                          start_time=0.0, duration=None):
+    """
+    列出所有停顿候选（不做最小间隔过滤），并给出静音时长和深度
+
+    深度为静音区间内包络均值低于噪音阈值的分贝数，用于规划器评分。
+
+    参数:
+        envelope_db (np.ndarray): RMS 包络（dB）
+        window (float): 窗口时长（秒）
+        min_pause (float): 最小停顿时长（秒）
+        noise_threshold (float): 噪音阈值（dB）
+        start_time (float): 第一个窗口的起始时间（秒）
+        duration (float): 音频总时长（秒），用于截断最后一个不完整窗口
+
+    返回:
+        list: PauseCandidate 列表，按时间排序
+    """
+    envelope_db = np.asarray(envelope_db, dtype=np.float64)
+    starts, lengths = find_silence_runs(envelope_db, noise_threshold)
+    if starts.size == 0:
+        return []
+
+    run_start = starts * window
+    run_end = (starts + lengths) * window
+    if duration is not None:
+        run_end = np.minimum(run_end, duration)
+    run_length = run_end - run_start
+    keep = run_length >= min_pause - 1e-9
+    cumsum = np.concatenate(([0.0], np.cumsum(envelope_db)))
+    mean_db = (cumsum[starts + lengths] - cumsum[starts]) / lengths
+    depth = noise_threshold - mean_db
+
+    return [
+        PauseCandidate(time=float(t), length=float(length), depth=float(d))
+        for t, length, d in zip(run_start[keep] + start_time, run_length[keep], depth[keep])
+    ]
+
+
+class _PauseTracker:
+    """
+    增量停顿检测器
+
+    按解码顺序接收包络块，静音区间一旦达到 min_pause 即确认其起点，
+    并在线应用 min_interval 过滤。结果与 pauses_from_envelope 一致。
+    """
+
+    def __init__(self, window, min_pause=0.5, noise_threshold=-35, min_interval=5.0, start_time=0.0):
+        self.window = window
+        self.min_pause = min_pause
+        self.noise_threshold = noise_threshold
+        self.min_interval = min_interval
+        self.start_time = start_time
+        self.offset = 0          # 已处理的窗口数
+        self.run_start = None    # 未结束静音区间的起点（窗口索引）
+        self.confirmed = False   # 未结束静音区间是否已输出
+        self.last_point = 0.0
+
+    def _long_enough(self, start, end_time):
+        # 与 pauses_from_envelope 相同的浮点容差
+        return end_time - start * self.window >= self.min_pause - 1e-9
+
+    def _emit(self, start, points):
+        point = float(start * self.window + self.start_time)
+        if self.min_interval <= 0 or point - self.last_point >= self.min_interval:
+            points.append(point)
+            self.last_point = point
+
+    def feed(self, envelope_db):
+        """
+        送入一段包络（dB），返回新确认的停顿点列表
+        """
+        points = []
+        n = len(envelope_db)
+        if n == 0:
+            return points
+        starts, lengths = find_silence_runs(envelope_db, self.noise_threshold)
+
+        # 上一块末尾的静音区间没有延续到本块，说明它已在块边界结束
+        if self.run_start is not None and (starts.size == 0 or starts[0] != 0):
+            self.run_start = None
+            self.confirmed = False
+
+        for start, length in zip(starts, lengths):
+            global_start = self.offset + start
+            global_end = global_start + length
+            if start == 0 and self.run_start is not None:
+                global_start = self.run_start
+            else:
+                self.confirmed = False
+
+            if not self.confirmed and self._long_enough(global_start, global_end * self.window):
+                self._emit(global_start, points)
+                self.confirmed = True
+
+            if start + length == n:
+                self.run_start = global_start
+            else:
+                self.run_start = None
+                self.confirmed = False
+
+        self.offset += n
+        return points
+
+    def finish(self, duration):
+        """
+        结束输入，返回结尾静音区间（按音频总时长计算）产生的停顿点
+        """
+        points = []
+        if self.run_start is not None and not self.confirmed:
+            if self._long_enough(self.run_start, duration):
+                self._emit(self.run_start, points)
+        self.run_start = None
+        self.confirmed = False
+        return points
+
+
+def get_audio_pauses(audio_path, min_pause=0.5, noise_threshold=-35, min_interval=5.0,
+                     window=DEFAULT_WINDOW, analysis_rate=None, workers=1):
     """
     使用 PyAV 检测音频静音区间，返回停顿时间点集合。
     只有停顿时长 >= min_pause 才计入。
     过滤掉间隔小于 min_interval 的停顿点。
 
+    音频先解码为大块单声道 PCM，再用累积和计算固定窗口的 RMS 包络，
+    对整条包络一次性阈值化并用游程编码查找静音区间。
+
     参数:
         audio_path (str): 音频文件路径
         min_pause (float): 最小停顿时长（秒）
         noise_threshold (float): 噪音阈值（dB），默认 -35dB
         min_interval (float): 停顿点之间的最小间隔（秒），默认 5.0
+        window (float): 包络窗口时长（秒），默认 DEFAULT_WINDOW
+        analysis_rate (int): 分析采样率（如 LOW_ANALYSIS_RATE），None 表示保持原采样率
+        workers (int): 并行分析的进程数，1 表示顺序分析，None 表示使用 CPU 核数
 
     返回:
         list: 停顿开始时间点列表（单位：秒），已过滤间隔过小的点
     """
-    pauses = []
-
     try:
-        with av.open(audio_path) as container:
-            audio_stream = container.streams.audio[0]
-
-            # 重采样到单声道，便于处理
-            resampler = av.audio.resampler.AudioResampler(
-                format='s16',
-                layout='mono',
-                rate=audio_stream.rate
+        if workers == 1:
+            envelope_db, window, start_time, duration = compute_audio_envelope(
+                audio_path, window, analysis_rate=analysis_rate
+            )
+        else:
+            envelope_db, window, start_time, duration = compute_audio_envelope_parallel(
+                audio_path, window, analysis_rate=analysis_rate, workers=workers
             )
-
-            silence_start = None
-            current_time = 0.0
-            frame_duration = 0.0
-
-            for frame in container.decode(audio=0):
-                # 重采样为单声道
-                frame = resampler.resample(frame)
-                if not frame:
-                    continue
-                frame = frame[0]
-
-                # 将音频帧转换为 numpy 数组
-                audio_array = frame.to_ndarray()
-
-                # 计算当前帧的时间戳
-                if frame.pts is not None:
-                    current_time = float(frame.pts * frame.time_base)
-
-                # 计算帧时长
-                frame_duration = float(frame.samples) / frame.sample_rate
-
-                # 计算帧的 RMS（均方根）振幅，并归一化到 [0, 1]
-                if audio_array.size > 0:
-                    # 归一化到 [-1, 1] 范围
-                    audio_normalized = audio_array.astype(np.float32) / 32768.0
-
-                    # 计算 RMS
-                    rms = np.sqrt(np.mean(audio_normalized ** 2))
-
-                    # 转换为 dB
-                    if rms > 0:
-                        rms_db = 20 * np.log10(rms)
-                    else:
-                        rms_db = -100  # 极小值
-
-                    # 检测静音
-                    is_silent = rms_db < noise_threshold
-
-                    if is_silent:
-                        if silence_start is None:
-                            silence_start = current_time
-                    else:
-                        if silence_start is not None:
-                            silence_duration = current_time - silence_start
-                            if silence_duration >= min_pause:
-                                pauses.append(silence_start)
-                            silence_start = None
-
-            # 处理结尾的静音
-            if silence_start is not None:
-                silence_duration = (current_time + frame_duration) - silence_start
-                if silence_duration >= min_pause:
-                    pauses.append(silence_start)
-
     except Exception as e:
         print(f"警告：检测音频停顿时出错（PyAV）：{e}")
         import traceback
         traceback.print_exc()
         return []
 
-    # 过滤掉间隔小于 min_interval 的停顿点
-    if min_interval > 0 and len(pauses) > 0:
-        filtered_pauses = []
-        last_point = 0.0
-        for point in pauses:
-            if point - last_point >= min_interval:
-                filtered_pauses.append(point)
-                last_point = point
-        return filtered_pauses
-
-    return pauses
+    return pauses_from_envelope(
+        envelope_db, window,
+        min_pause=min_pause,
+        noise_threshold=noise_threshold,
+        min_interval=min_interval,
+        start_time=start_time,
+        duration=duration
+    )
+
+
+@dataclass
+class AudioProbe:
+    """
+    音频探测结果数据类
+
+    一次解复用和解码得到的全部音频信息，供后续各阶段复用，避免重复读取文件。
+    """
+    duration: float
+    sample_rate: int
+    channels: int
+    window: float
+    envelope: np.ndarray
+    pause_points: List[float]
+    start_time: float = 0.0
+    pcm: Optional[np.ndarray] = None
+
+    def pauses(self, min_pause=0.5, noise_threshold=-35, min_interval=5.0):
+        """
+        使用其他参数从已有包络重新计算停顿点（不解码）
+
+        返回:
+            list: 停顿开始时间点列表（秒）
+        """
+        return pauses_from_envelope(
+            self.envelope, self.window,
+            min_pause=min_pause,
+            noise_threshold=noise_threshold,
+            min_interval=min_interval,
+            start_time=self.start_time,
+            duration=self.duration - self.start_time
+        )
+
+    def candidates(self, min_pause=0.3, noise_threshold=-35):
+        """
+        从已有包络列出所有停顿候选（不解码，不做最小间隔过滤）
+
+        返回:
+            list: PauseCandidate 列表
+        """
+        return find_pause_candidates(
+            self.envelope, self.window,
+            min_pause=min_pause,
+            noise_threshold=noise_threshold,
+            start_time=self.start_time,
+            duration=self.duration - self.start_time
+        )
+
+
+def _probe_cache_key(audio_path, window, analysis_rate=None):
+    """由文件指纹、包络窗口、分析采样率和算法版本生成探测结果缓存键"""
+    return make_cache_key("audio-probe", ANALYSIS_VERSION, file_fingerprint(audio_path),
+                          window, analysis_rate)
+
+
+def _load_cached_probe(cache, key):
+    """从缓存读取包络和元数据，未命中时返回 None"""
+    meta = cache.get_json(key)
+    if meta is None:
+        return None
+    envelope = cache.get_array(key)
+    if envelope is None:
+        return None
+    return meta, envelope
+
+
+def probe_audio(audio_path, min_pause=0.5, noise_threshold=-35, min_interval=5.0,
+                window=DEFAULT_WINDOW, keep_pcm=False, cache_dir=None, analysis_rate=None,
+                workers=1):
+    """
+    单次解复用和解码音频，得到时长、采样率、静音包络、停顿点和可选的 PCM
+
+    包络与停顿参数无关，缓存按文件指纹和窗口时长保存包络，命中时任意
+    停顿参数都可直接从包络计算，完全跳过解码。
+
+    参数:
+        audio_path (str): 音频文件路径
+        min_pause (float): 最小停顿时长（秒）
+        noise_threshold (float): 噪音阈值（dB）
+        min_interval (float): 停顿点之间的最小间隔（秒）
+        window (float): 包络窗口时长（秒）
+        keep_pcm (bool): 解码时是否保留原声道布局的 PCM；缓存命中时不解码，pcm 为 None
+        cache_dir (str): 缓存根目录，None 表示不使用缓存
+        analysis_rate (int): 包络分析采样率，None 表示保持原采样率；PCM 始终保持原采样率
+        workers (int): 并行分析的进程数，1 表示顺序分析，None 表示使用 CPU 核数；
+            并行分析时各进程只计算包络，不保留 PCM
+
+    返回:
+        AudioProbe: 探测结果
+
+    异常:
+        RuntimeError: 无法解码音频时抛出
+    """
+    cache = None
+    key = None
+    if cache_dir:
+        cache = DiskCache(cache_dir, AUDIO_CACHE_NAMESPACE, AUDIO_CACHE_MAX_BYTES)
+        key = _probe_cache_key(audio_path, window, analysis_rate)
+        cached = _load_cached_probe(cache, key)
+        if cached is not None:
+            meta, envelope = cached
+            probe = AudioProbe(
+                duration=meta["duration"],
+                sample_rate=meta["sample_rate"],
+                channels=meta["channels"],
+                window=meta["window"],
+                envelope=np.asarray(envelope, dtype=np.float64),
+                pause_points=[],
+                start_time=meta["start_time"],
+            )
+            probe.pause_points = probe.pauses(min_pause, noise_threshold, min_interval)
+            return probe
+
+    pcm = None
+    try:
+        if workers != 1:
+            envelope, actual_window, start_time, analysed = compute_audio_envelope_parallel(
+                audio_path, window, analysis_rate=analysis_rate, workers=workers
+            )
+            with av.open(audio_path) as container:
+                audio_stream = container.streams.audio[0]
+                sample_rate = audio_stream.rate
+                channels = audio_stream.codec_context.channels
+        else:
+            with _AudioBlockDecoder(audio_path, keep_pcm=keep_pcm,
+                                    analysis_rate=analysis_rate, decimate=True) as decoder:
+                win = _window_samples(decoder.analysis_rate, window)
+                accumulator = _EnvelopeAccumulator(win)
+                pcm_chunks = []
+                for mono, block_pcm in decoder.blocks():
+                    accumulator.push(mono)
+                    if block_pcm is not None:
+                        pcm_chunks.append(block_pcm)
+                accumulator.finish()
+                sample_rate = decoder.sample_rate
+                rate = decoder.analysis_rate
+                channels = decoder.channels
+                start_time = decoder.start_time
+            envelope = _mean_square_to_db(accumulator.mean_square())
+            actual_window = win / rate
+            analysed = accumulator.total_samples / rate
+            if keep_pcm:
+                pcm = (np.concatenate(pcm_chunks) if pcm_chunks
+                       else np.empty((0, channels), dtype=np.float32))
+    except Exception as e:
+        raise RuntimeError(f"无法解码音频（PyAV）：{e}")
+
+    probe = AudioProbe(
+        duration=start_time + analysed,
+        sample_rate=sample_rate,
+        channels=channels,
+        window=actual_window,
+        envelope=envelope,
+        pause_points=[],
+        start_time=start_time,
+        pcm=pcm,
+    )
+    probe.pause_points = probe.pauses(min_pause, noise_threshold, min_interval)
+
+    if cache is not None:
+        cache.set_array(key, probe.envelope.astype(np.float32))
+        cache.set_json(key, {
+            "duration": probe.duration,
+            "sample_rate": probe.sample_rate,
+            "channels": probe.channels,
+            "window": probe.window,
+            "start_time": probe.start_time,
+        })
+    return probe
+
+
+def sweep_pauses_from_envelope(envelope_db, window, min_pauses, noise_thresholds, min_intervals,
+                               start_time=0.0, duration=None):
+    """
+    在同一条包络上评估一组停顿检测参数组合
+
+    每个噪音阈值只做一次阈值化和游程编码，每个 min_pause 只做一次长度筛选，
+    min_interval 过滤在最内层完成，因此整个网格的开销远小于逐个组合重新分析。
+
+    参数:
+        envelope_db (np.ndarray): RMS 包络（dB）
+        window (float): 窗口时长（秒）
+        min_pauses (iterable): 最小停顿时长候选值（秒）
+        noise_thresholds (iterable): 噪音阈值候选值（dB）
+        min_intervals (iterable): 最小间隔候选值（秒）
+        start_time (float): 第一个窗口的起始时间（秒）
+        duration (float): 包络覆盖的时长（秒），用于截断最后一个不完整窗口并统计片段
+
+    返回:
+        list: 每个组合一个 dict，按 (noise_threshold, min_pause, min_interval) 排序
+            - min_pause / noise_threshold / min_interval: 参数值
+            - pauses_ms (list): 停顿开始时间点（毫秒，整数）
+            - segments (int): 切分得到的片段数量
+            - shortest_segment_ms / longest_segment_ms (int): 最短/最长片段时长（毫秒）
+    """
+    if duration is None:
+        duration = len(envelope_db) * window
+    results = []
+    for noise_threshold in sorted(noise_thresholds):
+        starts, lengths = find_silence_runs(envelope_db, noise_threshold)
+        run_start = starts * window
+        run_length = np.minimum((starts + lengths) * window, duration) - run_start
+        for min_pause in sorted(min_pauses):
+            keep = run_length >= min_pause - 1e-9
+            candidates = [float(t) for t in run_start[keep] + start_time]
+            for min_interval in sorted(min_intervals):
+                pauses = filter_min_interval(candidates, min_interval)
+                bounds = np.array([start_time] + pauses + [start_time + duration])
+                segment_lengths = np.diff(bounds)
+                results.append({
+                    "min_pause": min_pause,
+                    "noise_threshold": noise_threshold,
+                    "min_interval": min_interval,
+                    "pauses_ms": [int(round(p * 1000)) for p in pauses],
+                    "segments": len(pauses) + 1,
+                    "shortest_segment_ms": int(round(float(np.min(segment_lengths)) * 1000)),
+                    "longest_segment_ms": int(round(float(np.max(segment_lengths)) * 1000)),
+                })
+    return results
+
+
+def sweep_pause_parameters(audio_path, min_pauses, noise_thresholds, min_intervals,
+                           window=DEFAULT_WINDOW, analysis_rate=None, cache_dir=None):
+    """
+    只解码一次音频（或直接读取缓存的包络），评估整组停顿检测参数
+
+    参数:
+        audio_path (str): 音频文件路径
+        min_pauses (iterable): 最小停顿时长候选值（秒）
+        noise_thresholds (iterable): 噪音阈值候选值（dB）
+        min_intervals (iterable): 最小间隔候选值（秒）
+        window (float): 包络窗口时长（秒）
+        analysis_rate (int): 分析采样率，None 表示保持原采样率
+        cache_dir (str): 缓存根目录，None 表示不使用缓存
+
+    返回:
+        list: 见 sweep_pauses_from_envelope
+
+    异常:
+        RuntimeError: 无法解码音频时抛出
+    """
+    probe = probe_audio(audio_path, window=window, cache_dir=cache_dir, analysis_rate=analysis_rate)
+    return sweep_pauses_from_envelope(
+        probe.envelope, probe.window, min_pauses, noise_thresholds, min_intervals,
+        start_time=probe.start_time, duration=probe.duration - probe.start_time
+    )
+
+
+def print_sweep_results(results):
+    """打印参数扫描结果表格"""
+    print(f"{'min_pause':>10s} {'threshold':>10s} {'interval':>9s} {'segments':>9s} "
+          f"{'shortest':>10s} {'longest':>10s}  pauses(ms)")
+    print("-" * 80)
+    for row in results:
+        pauses = ", ".join(str(p) for p in row["pauses_ms"])
+        print(f"{row['min_pause']:>10.2f} {row['noise_threshold']:>10.1f} {row['min_interval']:>9.2f} "
+              f"{row['segments']:>9d} {row['shortest_segment_ms']:>10d} {row['longest_segment_ms']:>10d}"
+              f"  [{pauses}]")
+
+
+# 节拍检测使用的采样率、STFT 帧长和帧移（约 23ms 一帧）
+ONSET_ANALYSIS_RATE = 11025
+ONSET_FRAME_SIZE = 1024
+ONSET_HOP = 256
+
+# 每批做 FFT 的帧数，限制中间数组的内存占用
+ONSET_BATCH_FRAMES = 4096
+
+# 估计节拍相位时折叠的周期数
+PHASE_SEARCH_PERIODS = 8
+
+
+@dataclass
+class BeatAnalysis:
+    """节拍检测结果数据类"""
+    tempo: float
+    beat_times: List[float]
+    onset_times: List[float]
+    duration: float
+
+
+def compute_onset_envelope(pcm, sample_rate, frame_size=ONSET_FRAME_SIZE, hop=ONSET_HOP,
+                           batch_frames=ONSET_BATCH_FRAMES):
+    """
+    计算谱通量起音包络
+
+    使用 stride 视图切帧，按批对帧做加窗 rfft，对数压缩后取相邻帧的
+    正向差分之和，整个过程没有逐采样的 Python 循环。
+
+    参数:
+        pcm (np.ndarray): 单声道 PCM
+        sample_rate (int): 采样率
+        frame_size (int): STFT 帧长（采样点）
+        hop (int): 帧移（采样点）
+        batch_frames (int): 每批 FFT 的帧数
+
+    返回:
+        tuple: (onset_env, frame_rate)
+            - onset_env (np.ndarray): 每帧的谱通量，第 0 帧为 0
+            - frame_rate (float): 包络的帧率（帧/秒）
+    """
+    pcm = np.asarray(pcm, dtype=np.float32).reshape(-1)
+    frame_rate = sample_rate / hop
+    if pcm.size < frame_size:
+        return np.zeros(0), frame_rate
+
+    frames = np.lib.stride_tricks.sliding_window_view(pcm, frame_size)[::hop]
+    window = np.hanning(frame_size).astype(np.float32)
+    n_frames = frames.shape[0]
+    onset_env = np.zeros(n_frames)
+    previous = None
+    for start in range(0, n_frames, batch_frames):
+        batch = frames[start:start + batch_frames] * window
+        spectrum = np.log1p(100.0 * np.abs(np.fft.rfft(batch, axis=1)))
+        if previous is not None:
+            spectrum_prev = np.vstack((previous, spectrum[:-1]))
+        else:
+            spectrum_prev = np.vstack((spectrum[:1], spectrum[:-1]))
+        onset_env[start:start + len(batch)] = np.maximum(spectrum - spectrum_prev, 0).sum(axis=1)
+        previous = spectrum[-1:]
+    return onset_env, frame_rate
+
+
+def pick_onsets(onset_env, frame_rate, delta=0.5, average_window=0.5, min_gap=0.1):
+    """
+    自适应阈值峰值检测，返回起音时间点
+
+    一帧被认为是起音需要同时满足：在 ±min_gap 内是局部最大值，且高于
+    周围 average_window 内的均值加上 delta 倍标准差。
+
+    参数:
+        onset_env (np.ndarray): 起音包络
+        frame_rate (float): 包络帧率
+        delta (float): 阈值相对于局部均值的标准差倍数
+        average_window (float): 局部均值窗口（秒）
+        min_gap (float): 相邻起音的最小间隔（秒）
+
+    返回:
+        list: 起音时间点（秒）
+    """
+    n = len(onset_env)
+    if n == 0:
+        return []
+    std = float(np.std(onset_env))
+    if std == 0:
+        return []
+
+    half_max = max(1, int(round(min_gap * frame_rate)))
+    padded = np.pad(onset_env, half_max, mode="constant", constant_values=-np.inf)
+    local_max = np.lib.stride_tricks.sliding_window_view(padded, 2 * half_max + 1).max(axis=1)
+
+    half_avg = max(1, int(round(average_window * frame_rate / 2)))
+    cumsum = np.concatenate(([0.0], np.cumsum(onset_env)))
+    lo = np.clip(np.arange(n) - half_avg, 0, n)
+    hi = np.clip(np.arange(n) + half_avg + 1, 0, n)
+    local_mean = (cumsum[hi] - cumsum[lo]) / (hi - lo)
+
+    peaks = np.flatnonzero((onset_env >= local_max) & (onset_env > local_mean + delta * std))
+    return [float(i / frame_rate) for i in peaks]
+
+
+def estimate_tempo(onset_env, frame_rate, min_bpm=60.0, max_bpm=200.0, prior_bpm=120.0):
+    """
+    基于起音包络自相关估计速度
+
+    自相关用 FFT 计算，并按以 prior_bpm 为中心的对数高斯权重偏好常见速度。
+
+    参数:
+        onset_env (np.ndarray): 起音包络
+        frame_rate (float): 包络帧率
+        min_bpm / max_bpm (float): 速度搜索范围
+        prior_bpm (float): 偏好的速度
+
+    返回:
+        tuple: (bpm, period)，period 为节拍周期（帧）；无法估计时返回 (0.0, 0)
+    """
+    min_lag = max(1, int(np.floor(60.0 * frame_rate / max_bpm)))
+    max_lag = int(np.ceil(60.0 * frame_rate / min_bpm))
+    if len(onset_env) <= max_lag + 1:
+        return 0.0, 0
+
+    centered = onset_env - np.mean(onset_env)
+    size = 1 << int(np.ceil(np.log2(2 * len(centered))))
+    spectrum = np.fft.rfft(centered, size)
+    autocorr = np.fft.irfft(spectrum * np.conj(spectrum), size)[:max_lag + 1]
+    if autocorr[0] <= 0:
+        return 0.0, 0
+
+    lags = np.arange(min_lag, max_lag + 1)
+    bpms = 60.0 * frame_rate / lags
+    weights = np.exp(-0.5 * np.log2(bpms / prior_bpm) ** 2)
+    period = int(lags[np.argmax(autocorr[lags] * weights)])
+    return float(60.0 * frame_rate / period), period
+
+
+def track_beats(onset_env, period, snap=0.1):
+    """
+    按估计的周期逐拍跟踪节拍
+
+    先在开头若干个周期内选出使节拍位置上起音强度之和最大的相位（向量化计算，
+    只取开头是为了避免整数帧周期的误差在折叠时抹平峰值）。
+    之后每一拍都从上一拍的位置前进一个周期，并吸附到 ±snap*period 范围内的起音峰值，
+    这样整数帧周期的误差不会随时间累积。循环次数等于节拍数，而不是采样点数。
+
+    参数:
+        onset_env (np.ndarray): 起音包络
+        period (int): 节拍周期（帧）
+        snap (float): 吸附范围（相对于周期）
+
+    返回:
+        np.ndarray: 节拍所在帧索引
+    """
+    n = len(onset_env)
+    if period <= 0 or n < period:
+        return np.empty(0, dtype=np.int64)
+
+    n_periods = min(n // period, PHASE_SEARCH_PERIODS)
+    folded = onset_env[:n_periods * period].reshape(n_periods, period)
+    beat = int(np.argmax(folded.sum(axis=0)))
+
+    radius = int(round(snap * period))
+    padded = np.pad(onset_env, radius, mode="constant", constant_values=-np.inf)
+    beats = []
+    while beat < n:
+        window = padded[beat:beat + 2 * radius + 1]
+        beat = beat + int(np.argmax(window)) - radius
+        if beats and beat <= beats[-1]:
+            beat = beats[-1] + period
+            if beat >= n:
+                break
+        beats.append(beat)
+        beat += period
+    return np.asarray(beats, dtype=np.int64)
+
+
+def detect_beats(audio_path, analysis_rate=ONSET_ANALYSIS_RATE, min_bpm=60.0, max_bpm=200.0):
+    """
+    检测音乐的起音和节拍
+
+    参数:
+        audio_path (str): 音频文件路径
+        analysis_rate (int): 降采样后的分析采样率
+        min_bpm / max_bpm (float): 速度搜索范围
+
+    返回:
+        BeatAnalysis: 检测结果
+
+    异常:
+        RuntimeError: 无法解码音频时抛出
+    """
+    try:
+        pcm, sample_rate = decode_audio_mono(audio_path, analysis_rate=analysis_rate)
+    except Exception as e:
+        raise RuntimeError(f"无法解码音频（PyAV）：{e}")
+
+    onset_env, frame_rate = compute_onset_envelope(pcm, sample_rate)
+    tempo, period = estimate_tempo(onset_env, frame_rate, min_bpm=min_bpm, max_bpm=max_bpm)
+    beats = track_beats(onset_env, period)
+    # 帧的时间取帧中心
+    offset = ONSET_FRAME_SIZE / 2 / sample_rate
+    return BeatAnalysis(
+        tempo=tempo,
+        beat_times=[float(b / frame_rate + offset) for b in beats],
+        onset_times=[t + offset for t in pick_onsets(onset_env, frame_rate)],
+        duration=len(pcm) / sample_rate,
+    )
+
+
+def beats_to_change_points(beat_times, beats_per_change=8, min_interval=5.0, duration=None):
+    """
+    从节拍中选出轮播切换点
+
+    每隔 beats_per_change 个节拍取一个切换点，并保证相邻切换点
+    （包括开头 0 和结尾）间隔不小于 min_interval。
+
+    参数:
+        beat_times (list): 节拍时间点（秒）
+        beats_per_change (int): 每个片段包含的节拍数
+        min_interval (float): 切换点之间的最小间隔（秒）
+        duration (float): 音频时长（秒），用于避免最后一个片段过短
+
+    返回:
+        list: 切换时间点（秒），不含 0 和结尾，可直接拼接为 SlideshowController 的 change_points
+    """
+    if beats_per_change <= 0:
+        raise ValueError("beats_per_change 必须大于 0")
+    candidates = list(beat_times[beats_per_change::beats_per_change])
+    points = filter_min_interval(candidates, min_interval)
+    if duration is not None:
+        while points and duration - points[-1] < min_interval:
+            points.pop()
+    return points
+
+
+def get_beat_change_points(audio_path, beats_per_change=8, min_interval=5.0,
+                           analysis_rate=ONSET_ANALYSIS_RATE, cache_dir=None):
+    """
+    检测音乐节拍并生成轮播切换点，适用于没有停顿的背景音乐
+
+    参数:
+        audio_path (str): 音频文件路径
+        beats_per_change (int): 每个片段包含的节拍数
+        min_interval (float): 切换点之间的最小间隔（秒）
+        analysis_rate (int): 降采样后的分析采样率
+        cache_dir (str): 缓存根目录，None 表示不使用缓存
+
+    返回:
+        list: 切换时间点（秒），不含 0 和结尾
+
+    异常:
+        RuntimeError: 无法解码音频时抛出
+    """
+    cache = None
+    key = None
+    if cache_dir:
+        cache = DiskCache(cache_dir, AUDIO_CACHE_NAMESPACE, AUDIO_CACHE_MAX_BYTES)
+        key = make_cache_key("audio-beats", ANALYSIS_VERSION, file_fingerprint(audio_path), analysis_rate)
+        cached = cache.get_json(key)
+        if cached is not None:
+            return beats_to_change_points(cached["beat_times"], beats_per_change,
+                                          min_interval, cached["duration"])
+
+    analysis = detect_beats(audio_path, analysis_rate=analysis_rate)
+    if cache is not None:
+        cache.set_json(key, {
+            "tempo": analysis.tempo,
+            "beat_times": analysis.beat_times,
+            "duration": analysis.duration,
+        })
+    return beats_to_change_points(analysis.beat_times, beats_per_change, min_interval, analysis.duration)
+
+
+def _match_points(reference, candidates, tolerance):
+    """
+    将两组升序时间点按最近距离一一配对
+
+    返回:
+        tuple: (shifts, missing, extra)
+            - shifts (list): 配对成功的时间差（candidates - reference，秒）
+            - missing (list): reference 中未配对的点
+            - extra (list): candidates 中未配对的点
+    """
+    shifts = []
+    missing = []
+    used = set()
+    candidates = list(candidates)
+    for point in reference:
+        best = None
+        for j, other in enumerate(candidates):
+            if j in used or abs(other - point) > tolerance:
+                continue
+            if best is None or abs(other - point) < abs(candidates[best] - point):
+                best = j
+        if best is None:
+            missing.append(point)
+        else:
+            used.add(best)
+            shifts.append(candidates[best] - point)
+    extra = [point for j, point in enumerate(candidates) if j not in used]
+    return shifts, missing, extra
+
+
+def compare_analysis_rates(audio_path, low_rate=LOW_ANALYSIS_RATE, min_pause=0.5,
+                           noise_threshold=-35, min_interval=5.0, window=DEFAULT_WINDOW):
+    """
+    对比低采样率分析与原采样率分析的结果差异
+
+    两种模式各解码一次，比较停顿点位置和包络数值，用于确认低采样率
+    模式对某类音频是否足够准确。
+
+    参数:
+        audio_path (str): 音频文件路径
+        low_rate (int): 低采样率分析使用的采样率
+        min_pause (float): 最小停顿时长（秒）
+        noise_threshold (float): 噪音阈值（dB）
+        min_interval (float): 停顿点之间的最小间隔（秒）
+        window (float): 包络窗口时长（秒）
+
+    返回:
+        dict: 对比报告
+            - full_pauses / low_pauses (list): 两种模式的停顿点
+            - matched (int): 在容差内配对成功的停顿点数量
+            - missing (list): 仅原采样率模式检测到的停顿点
+            - extra (list): 仅低采样率模式检测到的停顿点
+            - max_shift / mean_shift (float): 配对停顿点的最大/平均绝对偏移（秒）
+            - envelope_mean_abs_db / envelope_max_abs_db (float): 包络逐窗口差异（dB）
+            - full_seconds / low_seconds (float): 两种模式的分析耗时（秒）
+    """
+    timings = {}
+    results = {}
+    for name, rate in (("full", None), ("low", low_rate)):
+        start = time.perf_counter()
+        envelope, win, start_time, duration = compute_audio_envelope(audio_path, window, rate)
+        timings[name] = time.perf_counter() - start
+        pauses = pauses_from_envelope(envelope, win, min_pause=min_pause,
+                                      noise_threshold=noise_threshold, min_interval=min_interval,
+                                      start_time=start_time, duration=duration)
+        results[name] = (envelope, win, pauses)
+
+    full_envelope, full_window, full_pauses = results["full"]
+    low_envelope, low_window, low_pauses = results["low"]
+
+    shifts, missing, extra = _match_points(full_pauses, low_pauses,
+                                           tolerance=2 * max(full_window, low_window))
+    abs_shifts = np.abs(shifts) if shifts else np.zeros(1)
+
+    if len(full_envelope) > 0 and len(low_envelope) > 0:
+        # 两种采样率下窗口的采样点数取整不同，按窗口中心时间插值对齐后再比较；
+        # 同时截到阈值以下 30dB，避免数字静音区的差异被放大
+        floor = noise_threshold - 30
+        full_times = (np.arange(len(full_envelope)) + 0.5) * full_window
+        low_times = (np.arange(len(low_envelope)) + 0.5) * low_window
+        low_aligned = np.interp(full_times, low_times, np.maximum(low_envelope, floor))
+        diff = np.abs(np.maximum(full_envelope, floor) - low_aligned)
+        envelope_mean, envelope_max = float(np.mean(diff)), float(np.max(diff))
+    else:
+        envelope_mean = envelope_max = 0.0
+
+    return {
+        "full_pauses": full_pauses,
+        "low_pauses": low_pauses,
+        "matched": len(shifts),
+        "missing": missing,
+        "extra": extra,
+        "max_shift": float(np.max(abs_shifts)),
+        "mean_shift": float(np.mean(abs_shifts)),
+        "envelope_mean_abs_db": envelope_mean,
+        "envelope_max_abs_db": envelope_max,
+        "full_seconds": timings["full"],
+        "low_seconds": timings["low"],
+    }
+
+
+def iter_audio_pauses(audio_path, min_pause=0.5, noise_threshold=-35, min_interval=5.0,
+                      window=DEFAULT_WINDOW, cache_dir=None, analysis_rate=None):
+    """
+    流式检测音频停顿，按解码顺序逐个产出已确认的停顿点
+
+    每解码一大块音频就更新包络并检查静音区间，无需等待整个文件分析完成，
+    产出的结果与 get_audio_pauses 一致。缓存命中时直接产出全部结果；
+    分析完成后写入与 probe_audio 相同的缓存。
+
+    参数:
+        audio_path (str): 音频文件路径
+        min_pause (float): 最小停顿时长（秒）
+        noise_threshold (float): 噪音阈值（dB）
+        min_interval (float): 停顿点之间的最小间隔（秒）
+        window (float): 包络窗口时长（秒）
+        cache_dir (str): 缓存根目录，None 表示不使用缓存
+        analysis_rate (int): 分析采样率，None 表示保持原采样率
+
+    产出:
+        float: 停顿开始时间点（秒）
+
+    异常:
+        RuntimeError: 无法解码音频时抛出
+    """
+    if cache_dir:
+        cache = DiskCache(cache_dir, AUDIO_CACHE_NAMESPACE, AUDIO_CACHE_MAX_BYTES)
+        key = _probe_cache_key(audio_path, window, analysis_rate)
+        if _load_cached_probe(cache, key) is not None:
+            probe = probe_audio(audio_path, min_pause=min_pause, noise_threshold=noise_threshold,
+                                min_interval=min_interval, window=window, cache_dir=cache_dir,
+                                analysis_rate=analysis_rate)
+            yield from probe.pause_points
+            return
+
+    try:
+        with _AudioBlockDecoder(audio_path, analysis_rate=analysis_rate, decimate=True) as decoder:
+            win = _window_samples(decoder.analysis_rate, window)
+            accumulator = _EnvelopeAccumulator(win)
+            tracker = None
+            for mono, _ in decoder.blocks():
+                if tracker is None:
+                    tracker = _PauseTracker(win / decoder.analysis_rate, min_pause, noise_threshold,
+                                            min_interval, decoder.start_time)
+                yield from tracker.feed(_mean_square_to_db(accumulator.push(mono)))
+            sample_rate = decoder.sample_rate
+            rate = decoder.analysis_rate
+            channels = decoder.channels
+            start_time = decoder.start_time
+    except Exception as e:
+        raise RuntimeError(f"无法解码音频（PyAV）：{e}")
+
+    duration = accumulator.total_samples / rate
+    if tracker is not None:
+        yield from tracker.feed(_mean_square_to_db(accumulator.finish()))
+        yield from tracker.finish(duration)
+
+    if cache_dir:
+        cache.set_array(key, _mean_square_to_db(accumulator.mean_square()).astype(np.float32))
+        cache.set_json(key, {
+            "duration": start_time + duration,
+            "sample_rate": sample_rate,
+            "channels": channels,
+            "window": win / rate,
+            "start_time": start_time,
+        })
+
+
+def prefetch_in_background(iterable, max_buffered=0):
+    """
+    在后台线程中消费可迭代对象，主线程按需取出结果
+
+    用于让音频分析与片段构建、编码并行进行。后台线程中的异常会在
+    主线程取到对应位置时重新抛出。
+
+    参数:
+        iterable: 任意可迭代对象
+        max_buffered (int): 最多缓冲的结果数量，0 表示不限制
+
+    产出:
+        可迭代对象中的元素，顺序不变
+    """
+    buffer = queue.Queue(maxsize=max_buffered)
+    done = object()
+
+    def _worker():
+        try:
+            for item in iterable:
+                buffer.put((item, None))
+        except BaseException as e:
+            buffer.put((done, e))
+            return
+        buffer.put((done, None))
+
+    thread = threading.Thread(target=_worker, daemon=True)
+    thread.start()
+    while True:
+        item, error = buffer.get()
+        if item is done:
+            if error is not None:
+                raise error
+            return
+        yield item
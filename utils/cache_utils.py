@@ -0,0 +1,280 @@
+"""
+缓存工具模块
+提供文件指纹计算和基于目录的持久化缓存（按总大小淘汰）
+"""
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+
+# 默认缓存目录，可通过环境变量 GENVIDEO_CACHE_DIR 覆盖
+DEFAULT_CACHE_DIR = os.environ.get("GENVIDEO_CACHE_DIR", ".genvideo_cache")
+
+# 默认缓存容量上限（字节）
+DEFAULT_MAX_BYTES = 1 << 30
+
+# 计算内容哈希时每次读取的字节数
+HASH_CHUNK_SIZE = 1 << 20
+
+# 进程内的文件指纹缓存：(绝对路径, 大小, mtime_ns) -> 指纹
+_fingerprint_memo = {}
+
+
+def file_fingerprint(path):
+    """
+    计算文件指纹（大小、修改时间和内容哈希）
+
+    同一进程内，大小和修改时间未变化的文件不会重复计算哈希。
+
+    参数:
+        path (str): 文件路径
+
+    返回:
+        dict: {"size": int, "mtime_ns": int, "hash": str}
+
+    异常:
+        FileNotFoundError: 文件不存在时抛出
+    """
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    fingerprint = _fingerprint_memo.get(memo_key)
+    if fingerprint is not None:
+        return fingerprint
+
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+
+    fingerprint = {
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "hash": digest.hexdigest(),
+    }
+    _fingerprint_memo[memo_key] = fingerprint
+    return fingerprint
+
+
+def make_cache_key(*parts):
+    """
+    由任意可 JSON 序列化的参数生成稳定的缓存键
+
+    参数:
+        *parts: 参与计算的参数（dict、list、str、数值等）
+
+    返回:
+        str: 十六进制缓存键
+    """
+    payload = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class DiskCache:
+    """
+    基于目录的持久化缓存
+
+    每个缓存项是目录中的一个文件，文件名由缓存键和后缀组成。
+    命中时刷新文件修改时间，超出容量上限时按修改时间从旧到新淘汰（LRU）。
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, namespace="default", max_bytes=DEFAULT_MAX_BYTES):
+        """
+        初始化缓存
+
+        参数:
+            cache_dir (str): 缓存根目录
+            namespace (str): 子目录名称，不同用途的缓存相互隔离
+            max_bytes (int): 该子目录的容量上限（字节）
+        """
+        self.directory = os.path.join(cache_dir, namespace)
+        self.max_bytes = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+
+    def path_for(self, key, suffix=""):
+        """
+        获取缓存项对应的文件路径（不检查是否存在）
+
+        参数:
+            key (str): 缓存键
+            suffix (str): 文件后缀，如 ".json"、".mp4"
+
+        返回:
+            str: 文件路径
+        """
+        return os.path.join(self.directory, f"{key}{suffix}")
+
+    def get_path(self, key, suffix=""):
+        """
+        查找缓存文件，命中时刷新其访问顺序
+
+        返回:
+            str or None: 文件路径，未命中时返回 None
+        """
+        path = self.path_for(key, suffix)
+        if not os.path.exists(path):
+            return None
+        self._touch(path)
+        return path
+
+    def get_json(self, key):
+        """
+        读取 JSON 缓存项
+
+        返回:
+            object or None: 缓存的值，未命中或文件损坏时返回 None
+        """
+        path = self.get_path(key, ".json")
+        if path is None:
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def set_json(self, key, value):
+        """
+        写入 JSON 缓存项（原子替换），并按容量上限淘汰旧项
+
+        参数:
+            key (str): 缓存键
+            value: 可 JSON 序列化的值
+        """
+        data = json.dumps(value, ensure_ascii=False).encode("utf-8")
+        path = self.path_for(key, ".json")
+        self._write_atomic(path, data)
+        self.evict(keep=path)
+
+    def get_array(self, key, mmap=False):
+        """
+        读取 NumPy 数组缓存项
+
+        参数:
+            key (str): 缓存键
+            mmap (bool): 是否以只读内存映射方式加载
+
+        返回:
+            np.ndarray or None: 缓存的数组，未命中或文件损坏时返回 None
+        """
+        path = self.get_path(key, ".npy")
+        if path is None:
+            return None
+        try:
+            return np.load(path, mmap_mode="r" if mmap else None, allow_pickle=False)
+        except (OSError, ValueError):
+            return None
+
+    def set_array(self, key, array):
+        """
+        写入 NumPy 数组缓存项（.npy 格式，原子替换），并按容量上限淘汰旧项
+
+        参数:
+            key (str): 缓存键
+            array (np.ndarray): 要缓存的数组
+        """
+        buffer = io.BytesIO()
+        np.save(buffer, np.ascontiguousarray(array), allow_pickle=False)
+        path = self.path_for(key, ".npy")
+        self._write_atomic(path, buffer.getvalue())
+        self.evict(keep=path)
+
+    def put_file(self, key, src_path, suffix="", move=True):
+        """
+        将已有文件放入缓存
+
+        参数:
+            key (str): 缓存键
+            src_path (str): 源文件路径
+            suffix (str): 缓存文件后缀
+            move (bool): True 表示移动源文件，False 表示复制
+
+        返回:
+            str: 缓存文件路径
+        """
+        dst = self.path_for(key, suffix)
+        if move:
+            shutil.move(src_path, dst)
+        else:
+            shutil.copyfile(src_path, dst)
+        self._touch(dst)
+        self.evict(keep=dst)
+        return dst
+
+    def total_bytes(self):
+        """返回缓存目录中所有文件的总大小（字节）"""
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self, keep=None):
+        """
+        淘汰最久未使用的缓存项，直到总大小不超过上限
+
+        参数:
+            keep (str): 不参与淘汰的文件路径（通常是刚写入的项）
+        """
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_bytes:
+            return
+        entries.sort(key=lambda entry: entry[2])
+        for path, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            if keep is not None and os.path.abspath(path) == os.path.abspath(keep):
+                continue
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+    def clear(self):
+        """删除所有缓存项"""
+        for path, _, _ in self._entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _entries(self):
+        """列出缓存文件：[(路径, 大小, 修改时间)]"""
+        entries = []
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return entries
+        for name in names:
+            if name.startswith("."):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if os.path.isfile(path):
+                entries.append((path, stat.st_size, stat.st_mtime_ns))
+        return entries
+
+    def _write_atomic(self, path, data):
+        """先写入临时文件再替换，避免并发读到半个文件"""
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @staticmethod
+    def _touch(path):
+        """刷新文件修改时间，用于 LRU 排序"""
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
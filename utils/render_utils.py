@@ -0,0 +1,1152 @@
+"""
+原生渲染工具模块
+直接用 NumPy 构建每一帧，并在进程内通过 PyAV 编码和封装音视频，绕过 MoviePy 的图层合成和 ffmpeg 管道
+"""
+import math
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from fractions import Fraction
+from typing import Iterable, List, Optional
+
+import av
+import numpy as np
+from PIL import Image
+
+from utils.animation_utils import AnimationConfig, animation_headroom, create_animator, is_animated
+from utils.audio_utils import PCMReader
+from utils.cache_utils import DiskCache, file_fingerprint, make_cache_key
+from utils.media_utils import MediaType
+from utils.transition_utils import TRANSITION_CROSSFADE, TRANSITION_FADE, TransitionBlender
+from utils.video_utils import VideoReader, VideoReaderPool, probe_media
+
+
+# 与 MoviePy 路径一致的默认编码参数
+DEFAULT_VIDEO_BITRATE = 5_000_000
+DEFAULT_AUDIO_BITRATE = 192_000
+DEFAULT_PRESET = "medium"
+DEFAULT_THREADS = 4
+
+# 与 MoviePy 读取视频帧时一致的时间容差
+FRAME_TIME_EPSILON = 1e-5
+
+# 并行渲染时每个进程的编码线程数，并行度主要来自多个片段同时渲染
+PARALLEL_ENCODER_THREADS = 1
+
+# 单个片段渲染失败后的默认重试次数
+DEFAULT_SEGMENT_RETRIES = 1
+
+# 预缩放图片缓存：子目录名和容量上限（字节）
+IMAGE_CACHE_NAMESPACE = "images"
+IMAGE_CACHE_MAX_BYTES = 2 << 30
+
+# 片段编码结果缓存：子目录名、容量上限（字节）和格式版本（渲染逻辑变化时递增）
+SEGMENT_CACHE_NAMESPACE = "segments"
+SEGMENT_CACHE_MAX_BYTES = 4 << 30
+SEGMENT_CACHE_VERSION = 2
+
+# 可变帧率输出关闭 B 帧：静态片段的时间戳间隔很大，B 帧重排会让开头的 dts 远小于 0，
+# 按片段拼接时无法保持 dts 单调递增
+STATIC_VFR_OPTIONS = {"bf": "0"}
+
+# 动画渲染基准：默认测试的动画类型和合成测试图片的尺寸
+BENCHMARK_ANIMATIONS = (AnimationConfig.NONE, AnimationConfig.ZOOM_IN, AnimationConfig.PAN_LEFT)
+BENCHMARK_IMAGE_SIZE = (4000, 3000)
+
+
+def cover_size(image_size, stage_size, headroom=1.0):
+    """
+    计算按覆盖方式缩放后的图片尺寸
+
+    参数:
+        image_size (tuple): 原始图片尺寸 (width, height)
+        stage_size (tuple): 舞台尺寸 (width, height)
+        headroom (float): 在覆盖尺寸基础上的额外放大倍数，为缩放和平移动画留出余量
+
+    返回:
+        tuple: 缩放后的尺寸 (width, height)，每边至少为舞台尺寸
+    """
+    img_w, img_h = image_size
+    stage_w, stage_h = stage_size
+    scale = max(stage_w / img_w, stage_h / img_h) * headroom
+    # 浮点误差可能让向下取整后的覆盖边少一个像素（如 960x535 -> 1920x1079）
+    return max(stage_w, int(img_w * scale)), max(stage_h, int(img_h * scale))
+
+
+def scale_image(image, stage_size, headroom=1.0):
+    """
+    按覆盖方式缩放图片（不裁剪）
+
+    参数:
+        image (PIL.Image.Image or np.ndarray): 原始图片
+        stage_size (tuple): 舞台尺寸 (width, height)
+        headroom (float): 额外放大倍数
+
+    返回:
+        np.ndarray: 形状为 (height, width, 3) 的 uint8 RGB 图片
+    """
+    if isinstance(image, np.ndarray):
+        image = Image.fromarray(image)
+    image = image.convert("RGB")
+    # LANCZOS 与 MoviePy 的 resized 相同
+    return np.asarray(image.resize(cover_size(image.size, stage_size, headroom), Image.Resampling.LANCZOS))
+
+
+def fit_frame(image, stage_size):
+    """
+    按覆盖方式缩放图片并居中裁剪到舞台尺寸（与 resize_and_position_image 的结果一致）
+
+    参数:
+        image (PIL.Image.Image or np.ndarray): 原始图片
+        stage_size (tuple): 舞台尺寸 (width, height)
+
+    返回:
+        np.ndarray: 形状为 (height, width, 3) 的 uint8 RGB 帧
+    """
+    return _center_crop(scale_image(image, stage_size), stage_size)
+
+
+def _center_crop(frame, stage_size):
+    """从缩放后的帧中居中裁出舞台区域，偏移量与 MoviePy 的 "center" 定位一样向零取整"""
+    stage_w, stage_h = stage_size
+    new_h, new_w = frame.shape[:2]
+    x = -int((stage_w - new_w) / 2)
+    y = -int((stage_h - new_h) / 2)
+    return np.ascontiguousarray(frame[y:y + stage_h, x:x + stage_w])
+
+
+def load_scaled_image(image_path, stage_size, headroom=1.0, cache_dir=None):
+    """
+    读取图片并按覆盖方式缩放，结果按素材缓存为 .npy 文件
+
+    原图（常见 24~50MP）的解码和缩放对每个素材、每种目标尺寸只做一次，
+    之后以只读内存映射方式加载。
+
+    参数:
+        image_path (str): 图片路径
+        stage_size (tuple): 舞台尺寸 (width, height)
+        headroom (float): 额外放大倍数，为动画留出余量
+        cache_dir (str): 缓存目录，None 表示不使用缓存
+
+    返回:
+        np.ndarray: 形状为 (height, width, 3) 的 uint8 RGB 图片（命中缓存时为只读内存映射）
+    """
+    if cache_dir is None:
+        with Image.open(image_path) as image:
+            return scale_image(image, stage_size, headroom)
+
+    cache = DiskCache(cache_dir, namespace=IMAGE_CACHE_NAMESPACE, max_bytes=IMAGE_CACHE_MAX_BYTES)
+    with Image.open(image_path) as image:
+        # 只读取文件头获得原始尺寸，未命中时才解码像素
+        target_size = cover_size(image.size, stage_size, headroom)
+        key = make_cache_key("image", file_fingerprint(image_path)["hash"], list(target_size), "lanczos")
+        cached = cache.get_array(key, mmap=True)
+        if cached is not None:
+            return cached
+        scaled = scale_image(image, stage_size, headroom)
+    cache.set_array(key, scaled)
+    return scaled
+
+
+def load_image_frame(image_path, stage_size, cache_dir=None):
+    """
+    读取图片并生成舞台尺寸的帧
+
+    参数:
+        image_path (str): 图片路径
+        stage_size (tuple): 舞台尺寸 (width, height)
+        cache_dir (str): 预缩放图片的缓存目录，None 表示不使用缓存
+
+    返回:
+        np.ndarray: 形状为 (height, width, 3) 的 uint8 RGB 帧
+    """
+    return _center_crop(load_scaled_image(image_path, stage_size, cache_dir=cache_dir), stage_size)
+
+
+def load_animator(image_path, stage_size, config, duration, fps=None, cache_dir=None):
+    """
+    读取按动画余量预缩放的图片并创建动画帧生成器
+
+    预缩放结果与静态图片共用图片缓存（余量不同时缓存键不同）。
+
+    参数:
+        image_path (str): 图片路径
+        stage_size (tuple): 舞台尺寸 (width, height)
+        config (AnimationConfig): 动画配置
+        duration (float): 片段时长（秒）
+        fps (int): 帧率，已知时预先计算每帧的变换参数
+        cache_dir (str): 预缩放图片的缓存目录，None 表示不使用缓存
+
+    返回:
+        ZoomAnimator or PanAnimator or None: 帧生成器，无动画时返回 None
+    """
+    if not is_animated(config):
+        return None
+    image = load_scaled_image(image_path, stage_size, headroom=animation_headroom(config),
+                              cache_dir=cache_dir)
+    return create_animator(image, stage_size, config, duration, fps)
+
+
+class _ImageSource:
+    """静态图片帧源，整段只缩放一次"""
+
+    static = True
+
+    def __init__(self, image_path, stage_size, cache_dir=None):
+        self.frame_data = load_image_frame(image_path, stage_size, cache_dir=cache_dir)
+
+    def frame(self, t):
+        return self.frame_data
+
+    def close(self):
+        self.frame_data = None
+
+
+class _AnimatedImageSource:
+    """带缩放或平移动画的图片帧源，按片段内时间查表生成画面"""
+
+    static = False
+
+    def __init__(self, animator):
+        self.animator = animator
+
+    def frame(self, t):
+        return self.animator.frame(t)
+
+    def close(self):
+        self.animator = None
+
+
+class _VideoSource:
+    """
+    视频帧源，按时间顺序解码
+
+    第 t 秒取源视频的第 int(fps * t) 帧，超过视频结尾后停留在最后一帧，
+    与 MoviePy 路径中视频不足时补静止帧的行为一致。带旋转信息的视频按显示方向旋转后再缩放裁剪。
+    """
+
+    static = False
+
+    def __init__(self, video_path, stage_size, cache_dir=None, readers=None):
+        self.stage_size = stage_size
+        info = probe_media(video_path, cache_dir=cache_dir)
+        # 有读取器池时复用同一文件已打开的解码器，否则单独打开
+        self.readers = readers
+        self.reader = readers.acquire(video_path) if readers is not None else VideoReader(video_path)
+        self.fps = info.fps or 25.0
+        self.rotation = info.rotation
+        self.frames = self.reader.frames()
+        self.index = -1
+        self.current = None
+        self.exhausted = False
+
+        # 缩放比例按显示尺寸计算，缩放时使用旋转前的尺寸
+        scaled_w, scaled_h = cover_size(info.size, stage_size)
+        self.scaled_size = (scaled_h, scaled_w) if self.rotation % 180 else (scaled_w, scaled_h)
+
+    def frame(self, t):
+        target = int(self.fps * t + FRAME_TIME_EPSILON)
+        pending = None
+        while self.index < target and not self.exhausted:
+            try:
+                pending = next(self.frames)
+            except StopIteration:
+                self.exhausted = True
+                break
+            self.index += 1
+        # 跳过的中间帧不做颜色转换和缩放
+        if pending is not None:
+            rgb = pending.reformat(width=self.scaled_size[0], height=self.scaled_size[1],
+                                   format="rgb24", interpolation="LANCZOS").to_ndarray()
+            if self.rotation:
+                # 显示矩阵的角度为逆时针方向，与 np.rot90 一致
+                rgb = np.rot90(rgb, self.rotation // 90)
+            self.current = _center_crop(rgb, self.stage_size)
+        return self.current
+
+    def close(self):
+        if self.readers is not None:
+            self.readers.release(self.reader)
+        else:
+            self.reader.close()
+
+
+class WindowedVideoFrames:
+    """
+    供 MoviePy VideoClip 使用的视频帧函数，画面与 PyAV 后端的视频帧源一致
+
+    解码器在第一次取帧时才从读取器池获取，取到片段显示窗口内的最后一帧后立即归还，
+    因此写入视频时读取器只在各片段的时间窗口内占用，时间不重叠的片段复用同一个解码器，
+    再次播放时回到开头重新解码，不重新打开文件。取帧时间回退时同样从头解码。
+    """
+
+    def __init__(self, video_path, stage_size, window, fps, readers, cache_dir=None):
+        """
+        参数:
+            video_path (str): 视频文件路径
+            stage_size (tuple): 视频尺寸 (width, height)
+            window (float): 片段内最后一次取帧之后的时间（秒），即片段在成片中的显示时长
+            fps (int): 输出帧率
+            readers (VideoReaderPool): 共享的视频读取器池
+            cache_dir (str): 视频元数据的缓存目录，None 表示不使用缓存
+        """
+        self.video_path = video_path
+        self.stage_size = stage_size
+        self.window = window
+        self.frame_interval = 1.0 / fps
+        self.readers = readers
+        self.cache_dir = cache_dir
+        self.source = None
+        self.time = None
+
+    def __call__(self, t):
+        if self.source is not None and t < self.time:
+            self.close()
+        if self.source is None:
+            self.source = _VideoSource(self.video_path, self.stage_size, cache_dir=self.cache_dir,
+                                       readers=self.readers)
+        self.time = t
+        frame = self.source.frame(t)
+        # 下一帧已超出显示窗口，归还读取器供后续片段使用
+        if t + self.frame_interval >= self.window - FRAME_TIME_EPSILON:
+            self.close()
+        return frame
+
+    def close(self):
+        """归还读取器（之后再取帧时重新获取）"""
+        if self.source is not None:
+            self.source.close()
+            self.source = None
+
+
+def _open_source(segment, stage_size, fps=None, cache_dir=None, readers=None):
+    """
+    根据片段的媒体类型和动画配置创建帧源
+
+    cache_dir 用于图片的预缩放缓存和视频元数据缓存，readers 为视频读取器池（None 表示不共享）
+    """
+    media_item = segment.media_item
+    if media_item.media_type == MediaType.IMAGE:
+        animation = getattr(segment, "animation", None)
+        if is_animated(animation):
+            return _AnimatedImageSource(load_animator(media_item.path, stage_size, animation,
+                                                      segment.duration, fps, cache_dir=cache_dir))
+        return _ImageSource(media_item.path, stage_size, cache_dir=cache_dir)
+    return _VideoSource(media_item.path, stage_size, cache_dir=cache_dir, readers=readers)
+
+
+def _animation_key(segment):
+    """片段画面使用的动画参数（动画时长展开为实际值），静态片段返回 None"""
+    animation = getattr(segment, "animation", None)
+    if segment.media_item.media_type != MediaType.IMAGE or not is_animated(animation):
+        return None
+    return dict(animation.to_dict(), duration=animation.duration or segment.duration)
+
+
+class _ArrayPCMReader:
+    """把内存中的 PCM 包装为与 PCMReader 相同的顺序读取接口"""
+
+    def __init__(self, pcm, sample_rate):
+        self.pcm = pcm
+        self.sample_rate = sample_rate
+        self.channels = 1 if pcm.ndim == 1 else pcm.shape[1]
+        self.position = 0
+
+    def read(self, count):
+        data = self.pcm[self.position:self.position + count]
+        self.position += len(data)
+        return data
+
+    def close(self):
+        self.pcm = None
+
+
+def _open_audio(audio_pcm=None, audio_rate=None, audio_path=None):
+    """
+    打开顺序读取的音频：指定 audio_path 时边解码边读取，否则读取内存中的 audio_pcm
+
+    返回:
+        PCMReader or _ArrayPCMReader or None: 没有音频时返回 None
+    """
+    if audio_path is not None:
+        return PCMReader(audio_path).open()
+    if audio_pcm is not None:
+        return _ArrayPCMReader(audio_pcm, audio_rate)
+    return None
+
+
+def _audio_frame(pcm, channels, sample_rate, pts):
+    """把 PCM 转为指定声道数的 fltp AudioFrame"""
+    pcm = np.asarray(pcm, dtype=np.float32)
+    if pcm.ndim == 1:
+        pcm = pcm[:, None]
+    if pcm.shape[1] != channels:
+        pcm = pcm[:, :channels] if pcm.shape[1] > channels else np.repeat(pcm, channels, axis=1)
+    frame = av.AudioFrame.from_ndarray(np.ascontiguousarray(pcm.T), format="fltp",
+                                       layout="mono" if channels == 1 else "stereo")
+    frame.sample_rate = sample_rate
+    frame.pts = pts
+    return frame
+
+
+def _segment_frame(source, segment, t, transition_duration, blender, previous=None):
+    """
+    取片段在全局时间 t 的画面
+
+    只有非第一个片段开头 transition_duration 秒的过渡窗口内才混合画面，其余帧原样返回。
+    previous 为上一个片段及其帧源 (segment, source)，交叉溶解时使用。
+    """
+    local = t - segment.start_time
+    frame = source.frame(local)
+    if segment.segment_index == 0 or not 0 <= local < transition_duration:
+        return frame
+    outgoing = None
+    if previous is not None and blender.needs_outgoing:
+        previous_segment, previous_source = previous
+        outgoing = previous_source.frame(t - previous_segment.start_time)
+    return blender.blend(frame, local / transition_duration, outgoing)
+
+
+def _encode_frame(encoder, source, segment, t, transition_duration, blender, previous,
+                  held, last, static_vfr):
+    """
+    编码全局时间 t 的一帧
+
+    静态片段（图片且不在过渡窗口内）只有第一帧需要合成和颜色转换，之后重复编码上一帧；
+    static_vfr 为 True 时直接跳过这些帧，由上一帧持续显示（可变帧率），
+    但 last 为 True 的最后一帧仍然写入，保证视频时长不变。
+
+    参数:
+        held: 当前保持画面的静态片段，None 表示没有
+
+    返回:
+        编码后保持画面的静态片段
+    """
+    local = t - segment.start_time
+    static = source.static and (segment.segment_index == 0 or not 0 <= local < transition_duration)
+    if static and held is segment:
+        if static_vfr and not last:
+            encoder.skip_frame()
+        else:
+            encoder.repeat_frame()
+        return held
+    encoder.write_frame(_segment_frame(source, segment, t, transition_duration, blender, previous))
+    return segment if static else None
+
+
+class PyAVEncoder:
+    """
+    进程内的 H.264 + AAC 编码器
+
+    视频帧写入一个复用的 rgb24 VideoFrame 缓冲区，再转换为 yuv420p 交给编码器；
+    转换后的帧会保留下来，静态画面可以直接重复编码或跳过（可变帧率）。
+    音频按视频进度分块编码，两路数据交错封装到同一个容器中。
+    """
+
+    def __init__(self, output_path, stage_size, fps, audio_rate=None, audio_channels=None,
+                 video_bitrate=DEFAULT_VIDEO_BITRATE, audio_bitrate=DEFAULT_AUDIO_BITRATE,
+                 preset=DEFAULT_PRESET, threads=DEFAULT_THREADS, options=None):
+        """
+        参数:
+            output_path (str): 输出文件路径
+            stage_size (tuple): 视频尺寸 (width, height)
+            fps (int): 帧率
+            audio_rate (int): 音频采样率，None 表示不写音频
+            audio_channels (int): 音频声道数
+            video_bitrate (int): 视频码率（bit/s）
+            audio_bitrate (int): 音频码率（bit/s）
+            preset (str): libx264 预设
+            threads (int): 编码线程数
+            options (dict): 额外的 libx264 选项
+        """
+        self.container = av.open(output_path, mode="w")
+        self.fps = Fraction(fps).limit_denominator(1001)
+        self.video_stream = self.container.add_stream("libx264", rate=self.fps)
+        self.video_stream.width, self.video_stream.height = stage_size
+        self.video_stream.pix_fmt = "yuv420p"
+        self.video_stream.bit_rate = video_bitrate
+        self.video_stream.options = {"preset": preset, **(options or {})}
+        self.video_stream.codec_context.thread_count = threads
+        self.video_stream.time_base = 1 / self.fps
+
+        self.frame = av.VideoFrame(stage_size[0], stage_size[1], "rgb24")
+        plane = self.frame.planes[0]
+        # 行宽可能带有对齐填充，只写入有效像素部分
+        self.pixels = np.frombuffer(plane, dtype=np.uint8).reshape(
+            stage_size[1], plane.line_size)[:, :stage_size[0] * 3]
+        self.frame_count = 0
+        self.last_frame = None
+
+        self.audio_stream = None
+        self.audio_samples = 0
+        if audio_rate:
+            layout = "mono" if audio_channels == 1 else "stereo"
+            self.audio_stream = self.container.add_stream("aac", rate=audio_rate, layout=layout)
+            self.audio_stream.bit_rate = audio_bitrate
+            self.audio_channels = 1 if audio_channels == 1 else 2
+
+    def write_frame(self, rgb):
+        """
+        编码一帧
+
+        参数:
+            rgb (np.ndarray): 形状为 (height, width, 3) 的 uint8 RGB 帧
+        """
+        self.pixels[:] = rgb.reshape(self.pixels.shape)
+        # 与编码器内部相同的颜色转换，结果保留给 repeat_frame 使用
+        self.last_frame = self.frame.reformat(format="yuv420p")
+        self._encode(self.last_frame)
+
+    def repeat_frame(self):
+        """再次编码上一帧，不做合成和颜色转换"""
+        self._encode(self.last_frame)
+
+    def skip_frame(self):
+        """跳过一帧：不编码，上一帧一直显示到下一帧的时间戳（可变帧率）"""
+        self.frame_count += 1
+
+    def _encode(self, frame):
+        frame.pts = self.frame_count
+        self.frame_count += 1
+        for packet in self.video_stream.encode(frame):
+            self.container.mux(packet)
+
+    def write_audio(self, pcm):
+        """
+        编码一段音频
+
+        参数:
+            pcm (np.ndarray): 形状为 (n, channels) 的 float32 PCM
+        """
+        if self.audio_stream is None or len(pcm) == 0:
+            return
+        frame = _audio_frame(pcm, self.audio_channels, self.audio_stream.rate, self.audio_samples)
+        self.audio_samples += frame.samples
+        for packet in self.audio_stream.encode(frame):
+            self.container.mux(packet)
+
+    def close(self):
+        """刷新编码器并关闭容器"""
+        for packet in self.video_stream.encode(None):
+            self.container.mux(packet)
+        if self.audio_stream is not None:
+            for packet in self.audio_stream.encode(None):
+                self.container.mux(packet)
+        self.container.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+def render_slideshow(segments: Iterable, output_path, stage_size, fps, duration,
+                     transition_duration=1.0, audio_pcm: Optional[np.ndarray] = None,
+                     audio_rate: Optional[int] = None, audio_path=None, video_bitrate=DEFAULT_VIDEO_BITRATE,
+                     audio_bitrate=DEFAULT_AUDIO_BITRATE, preset=DEFAULT_PRESET,
+                     threads=DEFAULT_THREADS, cache_dir=None, transition_style=TRANSITION_FADE,
+                     static_vfr=False):
+    """
+    按轮播片段直接渲染视频
+
+    画面与 MoviePy 路径一致：每个片段从其开始时间起显示，除第一个片段外，
+    开头 transition_duration 秒为过渡窗口：默认从黑色淡入（淡入的片段覆盖在上一个片段之上），
+    交叉溶解样式则与上一个片段混合。片段按需依次读取，可以直接传入流式控制器产生的片段。
+
+    参数:
+        segments (Iterable[MediaSegment]): 按时间排序的媒体片段
+        output_path (str): 输出视频路径
+        stage_size (tuple): 视频尺寸 (width, height)
+        fps (int): 帧率
+        duration (float): 视频时长（秒）
+        transition_duration (float): 过渡时长（秒）
+        audio_pcm (np.ndarray): 形状为 (n, channels) 的 float32 音频，None 表示无音频
+        audio_rate (int): 音频采样率
+        audio_path (str): 音频文件路径，指定时随视频帧边解码边编码，优先于 audio_pcm
+        video_bitrate / audio_bitrate (int): 码率（bit/s）
+        preset (str): libx264 预设
+        threads (int): 编码线程数
+        cache_dir (str): 预缩放图片和视频元数据的缓存目录，None 表示不使用缓存
+        transition_style (str): 过渡样式，"fade" 或 "crossfade"
+        static_vfr (bool): 静态图片片段是否只编码首尾帧（可变帧率），False 时重复编码同一帧
+
+    返回:
+        int: 视频帧数（按固定帧率计算，包括可变帧率模式下跳过的帧）
+    """
+    n_frames = int(duration * fps)
+    blender = TransitionBlender(stage_size, transition_style)
+    keep_previous = blender.needs_outgoing and transition_duration > 0
+    previous = None
+
+    segments = iter(segments)
+    segment = next(segments, None)
+    if segment is None:
+        raise ValueError("没有可渲染的片段")
+    # 循环使用的视频共享已打开的解码器
+    readers = VideoReaderPool(VideoReader)
+    source = _open_source(segment, stage_size, fps, cache_dir=cache_dir, readers=readers)
+
+    audio = None
+    try:
+        audio = _open_audio(audio_pcm, audio_rate, audio_path)
+        with PyAVEncoder(output_path, stage_size, fps,
+                         audio_rate=None if audio is None else audio.sample_rate,
+                         audio_channels=None if audio is None else audio.channels,
+                         video_bitrate=video_bitrate,
+                         audio_bitrate=audio_bitrate, preset=preset, threads=threads,
+                         options=STATIC_VFR_OPTIONS if static_vfr else None) as encoder:
+            held = None
+            audio_end = 0 if audio is None else int(round(duration * audio.sample_rate))
+            audio_written = 0
+            for n in range(n_frames):
+                t = n / fps
+                while t >= segment.end_time:
+                    following = next(segments, None)
+                    if following is None:
+                        break
+                    # 交叉溶解时保留上一个片段的帧源，直到下一次切换
+                    if previous is not None:
+                        previous[1].close()
+                        previous = None
+                    if keep_previous:
+                        previous = (segment, source)
+                    else:
+                        source.close()
+                    segment = following
+                    source = _open_source(segment, stage_size, fps, cache_dir=cache_dir,
+                                          readers=readers)
+
+                held = _encode_frame(encoder, source, segment, t, transition_duration, blender,
+                                     previous, held, n == n_frames - 1, static_vfr)
+
+                if audio is not None:
+                    target = min(audio_end, int(round((n + 1) / fps * audio.sample_rate)))
+                    if target > audio_written:
+                        encoder.write_audio(audio.read(target - audio_written))
+                        audio_written = target
+
+            if audio is not None and audio_written < audio_end:
+                encoder.write_audio(audio.read(audio_end - audio_written))
+    finally:
+        if audio is not None:
+            audio.close()
+        source.close()
+        if previous is not None:
+            previous[1].close()
+        readers.close()
+    return n_frames
+
+
+def segment_frame_ranges(segments, fps, duration):
+    """
+    计算每个片段负责的全局帧区间，与 render_slideshow 的逐帧分配规则一致
+
+    第 n 帧（时间 n / fps）属于第一个满足 n / fps < end_time 的片段，
+    超出最后一个片段结束时间的帧归最后一个片段。
+
+    参数:
+        segments (list[MediaSegment]): 按时间排序的媒体片段
+        fps (int): 帧率
+        duration (float): 视频时长（秒）
+
+    返回:
+        list[tuple]: 每个片段的 (起始帧, 结束帧)，左闭右开，可能为空区间
+    """
+    n_frames = int(duration * fps)
+    ranges = []
+    first = 0
+    for i, segment in enumerate(segments):
+        if i == len(segments) - 1:
+            stop = n_frames
+        else:
+            # 先按乘法估计，再用与逐帧渲染相同的浮点比较修正边界
+            stop = min(n_frames, max(first, math.ceil(segment.end_time * fps)))
+            while stop < n_frames and stop / fps < segment.end_time:
+                stop += 1
+            while stop > first and (stop - 1) / fps >= segment.end_time:
+                stop -= 1
+        ranges.append((first, stop))
+        first = stop
+    return ranges
+
+
+@dataclass
+class SegmentJob:
+    """
+    单个片段的渲染任务：把全局帧 [first_frame, stop_frame) 编码为独立的视频文件
+
+    previous 为上一个片段，交叉溶解时过渡窗口内需要它的画面（即上一个片段的过渡尾部）。
+    animation 为片段的动画参数（AnimationConfig.to_dict()，动画时长展开为实际值），参与缓存键计算。
+    """
+    segment: object
+    first_frame: int
+    stop_frame: int
+    path: str
+    animation: Optional[dict] = None
+    previous: Optional[object] = None
+
+    @property
+    def n_frames(self):
+        return self.stop_frame - self.first_frame
+
+
+def segment_cache_key(job, stage_size, fps, transition_duration=1.0,
+                      video_bitrate=DEFAULT_VIDEO_BITRATE, preset=DEFAULT_PRESET,
+                      threads=PARALLEL_ENCODER_THREADS, transition_style=TRANSITION_FADE,
+                      static_vfr=False):
+    """
+    计算片段编码结果的缓存键
+
+    键只包含影响该片段画面和码流的参数：媒体内容哈希、帧数、首帧相对片段开始的偏移、
+    过渡参数（交叉溶解时还包括上一个片段的媒体和偏移）、动画参数、舞台尺寸、帧率和编码设置。
+    片段在全片中的位置不参与计算，
+    因此改动某一段媒体只会使该段失效，循环使用的同一媒体也能共享结果。
+
+    参数:
+        job (SegmentJob): 渲染任务
+        stage_size (tuple): 视频尺寸 (width, height)
+        fps (int): 帧率
+        transition_duration (float): 过渡时长（秒）
+        video_bitrate (int): 视频码率（bit/s）
+        preset (str): libx264 预设
+        threads (int): 编码线程数（多线程编码的码流与线程数有关）
+        transition_style (str): 过渡样式，"fade" 或 "crossfade"
+        static_vfr (bool): 是否以可变帧率编码静态片段
+
+    返回:
+        str: 缓存键
+    """
+    media_item = job.segment.media_item
+    transition = None
+    if job.segment.segment_index > 0 and transition_duration > 0:
+        transition = {"style": transition_style, "duration": transition_duration}
+        if transition_style == TRANSITION_CROSSFADE and job.previous is not None:
+            previous_item = job.previous.media_item
+            transition["previous"] = [
+                file_fingerprint(previous_item.path)["hash"], previous_item.media_type.value,
+                round(job.first_frame / fps - job.previous.start_time, 6),
+                _animation_key(job.previous),
+            ]
+    encoder = {
+        "codec": "libx264",
+        "libavcodec": av.library_versions.get("libavcodec"),
+        "bitrate": video_bitrate,
+        "preset": preset,
+        "threads": threads,
+        "options": STATIC_VFR_OPTIONS if static_vfr else None,
+        "static_vfr": static_vfr,
+    }
+    return make_cache_key(
+        "segment", SEGMENT_CACHE_VERSION,
+        file_fingerprint(media_item.path)["hash"], media_item.media_type.value,
+        job.n_frames, round(job.first_frame / fps - job.segment.start_time, 6),
+        transition, job.animation,
+        list(stage_size), fps, encoder,
+    )
+
+
+def render_segment_chunk(job, stage_size, fps, transition_duration=1.0,
+                         video_bitrate=DEFAULT_VIDEO_BITRATE, preset=DEFAULT_PRESET,
+                         threads=PARALLEL_ENCODER_THREADS, cache_dir=None,
+                         transition_style=TRANSITION_FADE, static_vfr=False):
+    """
+    把一个片段渲染为只含视频的独立文件
+
+    每个文件都由新的编码器生成，第一帧必然是关键帧，
+    因此各文件可以在片段边界直接拼接而无需重新编码。
+
+    参数:
+        job (SegmentJob): 渲染任务
+        stage_size (tuple): 视频尺寸 (width, height)
+        fps (int): 帧率
+        transition_duration (float): 过渡时长（秒）
+        video_bitrate (int): 视频码率（bit/s）
+        preset (str): libx264 预设
+        threads (int): 编码线程数
+        cache_dir (str): 预缩放图片和视频元数据的缓存目录，None 表示不使用缓存
+        transition_style (str): 过渡样式，"fade" 或 "crossfade"
+        static_vfr (bool): 静态图片片段是否只编码首尾帧（可变帧率）
+
+    返回:
+        str: 生成的文件路径
+    """
+    blender = TransitionBlender(stage_size, transition_style)
+    segment = job.segment
+    source = _open_source(segment, stage_size, fps, cache_dir=cache_dir)
+    previous = None
+    if blender.needs_outgoing and job.previous is not None and segment.segment_index > 0 \
+            and job.first_frame / fps - segment.start_time < transition_duration:
+        previous = (job.previous, _open_source(job.previous, stage_size, fps, cache_dir=cache_dir))
+    try:
+        with PyAVEncoder(job.path, stage_size, fps, video_bitrate=video_bitrate,
+                         preset=preset, threads=threads,
+                         options=STATIC_VFR_OPTIONS if static_vfr else None) as encoder:
+            held = None
+            for n in range(job.first_frame, job.stop_frame):
+                held = _encode_frame(encoder, source, segment, n / fps, transition_duration, blender,
+                                     previous, held, n == job.stop_frame - 1, static_vfr)
+    finally:
+        source.close()
+        if previous is not None:
+            previous[1].close()
+    return job.path
+
+
+def _run_segment_jobs(jobs, workers, render_kwargs):
+    """
+    执行一轮渲染任务
+
+    返回:
+        dict: 失败任务的下标 -> 异常
+    """
+    failures = {}
+    if workers <= 1 or len(jobs) <= 1:
+        for i, job in enumerate(jobs):
+            try:
+                render_segment_chunk(job, **render_kwargs)
+            except Exception as exc:
+                failures[i] = exc
+        return failures
+
+    # 每轮使用新的进程池，某个进程崩溃导致进程池损坏时不影响重试
+    with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+        futures = [pool.submit(render_segment_chunk, job, **render_kwargs) for job in jobs]
+        for i, future in enumerate(futures):
+            try:
+                future.result()
+            except Exception as exc:
+                failures[i] = exc
+    return failures
+
+
+def render_segment_jobs(jobs: List[SegmentJob], stage_size, fps, transition_duration=1.0,
+                        workers=None, retries=DEFAULT_SEGMENT_RETRIES,
+                        video_bitrate=DEFAULT_VIDEO_BITRATE, preset=DEFAULT_PRESET,
+                        threads=PARALLEL_ENCODER_THREADS, cache_dir=None,
+                        transition_style=TRANSITION_FADE, static_vfr=False):
+    """
+    在进程池中并行渲染各片段，失败的片段单独重试
+
+    参数:
+        jobs (list[SegmentJob]): 渲染任务
+        stage_size (tuple): 视频尺寸 (width, height)
+        fps (int): 帧率
+        transition_duration (float): 过渡时长（秒）
+        workers (int): 进程数，None 表示使用 CPU 核数，1 表示在当前进程中依次渲染
+        retries (int): 每个失败片段的最大重试次数
+        video_bitrate (int): 视频码率（bit/s）
+        preset (str): libx264 预设
+        threads (int): 每个进程的编码线程数
+        cache_dir (str): 预缩放图片和视频元数据的缓存目录，None 表示不使用缓存
+        transition_style (str): 过渡样式，"fade" 或 "crossfade"
+        static_vfr (bool): 静态图片片段是否只编码首尾帧（可变帧率）
+
+    异常:
+        RuntimeError: 片段在重试后仍然渲染失败时抛出
+    """
+    workers = workers or os.cpu_count() or 1
+    render_kwargs = dict(stage_size=stage_size, fps=fps, transition_duration=transition_duration,
+                         video_bitrate=video_bitrate, preset=preset, threads=threads,
+                         cache_dir=cache_dir, transition_style=transition_style,
+                         static_vfr=static_vfr)
+    pending = list(jobs)
+    for attempt in range(retries + 1):
+        failures = _run_segment_jobs(pending, workers, render_kwargs)
+        if not failures:
+            return
+        for i, exc in sorted(failures.items()):
+            print(f"片段 {pending[i].segment.segment_index} 渲染失败（第 {attempt + 1} 次）: {exc}")
+        pending = [pending[i] for i in sorted(failures)]
+    failed = ", ".join(str(job.segment.segment_index) for job in pending)
+    raise RuntimeError(f"片段 {failed} 重试 {retries} 次后仍渲染失败")
+
+
+def concat_segment_chunks(jobs: List[SegmentJob], output_path, fps, duration,
+                          audio_pcm: Optional[np.ndarray] = None, audio_rate: Optional[int] = None,
+                          audio_bitrate=DEFAULT_AUDIO_BITRATE, audio_path=None):
+    """
+    以流复制方式按顺序拼接各片段的视频，并随视频包逐段编码封装整段音频
+
+    各片段文件以关键帧开头、编码参数相同，视频包只需平移时间戳即可写入输出文件；
+    音频包按时间与视频包交错写入。
+
+    参数:
+        jobs (list[SegmentJob]): 已渲染的片段任务，按时间排序
+        output_path (str): 输出视频路径
+        fps (int): 帧率
+        duration (float): 视频时长（秒）
+        audio_pcm (np.ndarray): 形状为 (n, channels) 的 float32 音频，None 表示无音频
+        audio_rate (int): 音频采样率
+        audio_bitrate (int): 音频码率（bit/s）
+        audio_path (str): 音频文件路径，指定时边解码边编码，优先于 audio_pcm
+
+    返回:
+        int: 写入的视频帧数
+
+    异常:
+        RuntimeError: 片段的编码参数不一致或不以关键帧开头时抛出
+    """
+    frame_rate = Fraction(fps).limit_denominator(1001)
+    frame_tb = 1 / frame_rate
+    output = av.open(output_path, mode="w")
+    audio = None
+    try:
+        video_stream = None
+        extradata = None
+        audio_stream = None
+        audio_channels = 1
+        audio_end = 0
+        audio_written = 0
+        audio = _open_audio(audio_pcm, audio_rate, audio_path)
+        if audio is not None:
+            audio_rate = audio.sample_rate
+            audio_channels = 1 if audio.channels == 1 else 2
+            audio_end = int(round(duration * audio_rate))
+
+        def mux_audio_until(samples):
+            nonlocal audio_written, audio_end
+            samples = min(samples, audio_end)
+            # 每次最多编码一秒音频，保持交错粒度
+            while audio_written < samples:
+                pcm = audio.read(min(samples - audio_written, audio_rate))
+                if len(pcm) == 0:
+                    # 音频比视频短
+                    audio_end = audio_written
+                    break
+                frame = _audio_frame(pcm, audio_channels, audio_rate, audio_written)
+                audio_written += len(pcm)
+                for packet in audio_stream.encode(frame):
+                    output.mux(packet)
+
+        n_frames = 0
+        for job in jobs:
+            with av.open(job.path) as chunk:
+                in_stream = chunk.streams.video[0]
+                if video_stream is None:
+                    video_stream = output.add_stream_from_template(in_stream)
+                    extradata = in_stream.codec_context.extradata
+                    if audio is not None:
+                        audio_stream = output.add_stream(
+                            "aac", rate=audio_rate, layout="mono" if audio_channels == 1 else "stereo")
+                        audio_stream.bit_rate = audio_bitrate
+                elif in_stream.codec_context.extradata != extradata:
+                    raise RuntimeError(f"片段 {job.segment.segment_index} 的编码参数与其他片段不一致，无法直接拼接")
+
+                in_tb = in_stream.time_base
+                first = True
+                for packet in chunk.demux(in_stream):
+                    if packet.size == 0:
+                        continue
+                    if first and not packet.is_keyframe:
+                        raise RuntimeError(f"片段 {job.segment.segment_index} 不以关键帧开头，无法直接拼接")
+                    first = False
+                    # 时间戳换算为帧序号后整体平移到片段在全片中的位置
+                    pts = round(packet.pts * in_tb / frame_tb) + job.first_frame
+                    dts = round(packet.dts * in_tb / frame_tb) + job.first_frame
+                    duration_frames = max(1, round(packet.duration * in_tb / frame_tb)) if packet.duration else 1
+                    packet.pts, packet.dts, packet.duration = pts, dts, duration_frames
+                    packet.time_base = frame_tb
+                    packet.stream = video_stream
+                    if audio_stream is not None:
+                        mux_audio_until(int(round((dts + 1) / frame_rate * audio_rate)))
+                    output.mux(packet)
+            n_frames += job.n_frames
+
+        if audio_stream is not None:
+            mux_audio_until(audio_end)
+            for packet in audio_stream.encode(None):
+                output.mux(packet)
+    finally:
+        if audio is not None:
+            audio.close()
+        output.close()
+    return n_frames
+
+
+def render_slideshow_parallel(segments: Iterable, output_path, stage_size, fps, duration,
+                              transition_duration=1.0, audio_pcm: Optional[np.ndarray] = None,
+                              audio_rate: Optional[int] = None, audio_path=None, workers=None,
+                              retries=DEFAULT_SEGMENT_RETRIES, work_dir=None, cache_dir=None,
+                              video_bitrate=DEFAULT_VIDEO_BITRATE, audio_bitrate=DEFAULT_AUDIO_BITRATE,
+                              preset=DEFAULT_PRESET, threads=PARALLEL_ENCODER_THREADS,
+                              transition_style=TRANSITION_FADE, static_vfr=False):
+    """
+    按片段并行渲染视频，再以流复制拼接并封装音频
+
+    画面与 render_slideshow 一致：每个片段（含开头的过渡窗口，交叉溶解时还需要上一个片段的尾部画面）
+    负责的帧区间与逐帧渲染相同，
+    在进程池中分别编码为中间文件，最后按顺序拼接，视频不再重新编码。
+    指定 cache_dir 时，各片段的编码结果按内容缓存，再次渲染时只重新编码键发生变化的片段。
+    帧区间和缓存键需要全部片段，开始编码前会先读完 segments；
+    流式控制器逐个产生的片段应交给 render_slideshow，才能边产生边编码。
+
+    参数:
+        segments (Iterable[MediaSegment]): 按时间排序的媒体片段
+        output_path (str): 输出视频路径
+        stage_size (tuple): 视频尺寸 (width, height)
+        fps (int): 帧率
+        duration (float): 视频时长（秒）
+        transition_duration (float): 过渡时长（秒）
+        audio_pcm (np.ndarray): 形状为 (n, channels) 的 float32 音频，None 表示无音频
+        audio_rate (int): 音频采样率
+        audio_path (str): 音频文件路径，指定时在拼接阶段边解码边编码，优先于 audio_pcm
+        workers (int): 渲染进程数，None 表示使用 CPU 核数
+        retries (int): 每个失败片段的最大重试次数
+        work_dir (str): 中间文件所在目录，None 表示使用系统临时目录
+        cache_dir (str): 缓存目录（片段编码结果和预缩放图片），None 表示不使用缓存
+        video_bitrate / audio_bitrate (int): 码率（bit/s）
+        preset (str): libx264 预设
+        threads (int): 每个进程的编码线程数
+        transition_style (str): 过渡样式，"fade" 或 "crossfade"
+        static_vfr (bool): 静态图片片段是否只编码首尾帧（可变帧率）
+
+    返回:
+        int: 视频帧数（按固定帧率计算）
+
+    异常:
+        ValueError: 没有可渲染的片段时抛出
+        RuntimeError: 片段重试后仍渲染失败时抛出
+    """
+    segments = list(segments)
+    if not segments:
+        raise ValueError("没有可渲染的片段")
+    cache = None
+    if cache_dir is not None:
+        cache = DiskCache(cache_dir, namespace=SEGMENT_CACHE_NAMESPACE, max_bytes=SEGMENT_CACHE_MAX_BYTES)
+
+    with tempfile.TemporaryDirectory(dir=work_dir, prefix="genvideo-segments-") as tmp_dir:
+        jobs = [
+            SegmentJob(segment, first, stop, os.path.join(tmp_dir, f"segment_{i:05d}.mp4"),
+                       animation=_animation_key(segment), previous=segments[i - 1] if i > 0 else None)
+            for i, (segment, (first, stop)) in enumerate(
+                zip(segments, segment_frame_ranges(segments, fps, duration)))
+            if stop > first
+        ]
+
+        # 命中缓存的片段直接使用缓存文件，键相同的片段只渲染一次
+        pending = jobs
+        rendered = {}
+        duplicates = []
+        if cache is not None:
+            pending = []
+            hits = 0
+            for job in jobs:
+                key = segment_cache_key(job, stage_size, fps, transition_duration,
+                                        video_bitrate=video_bitrate, preset=preset, threads=threads,
+                                        transition_style=transition_style, static_vfr=static_vfr)
+                cached = cache.get_path(key, ".mp4")
+                if cached is not None:
+                    job.path = cached
+                    hits += 1
+                elif key in rendered:
+                    duplicates.append((job, key))
+                else:
+                    rendered[key] = job
+                    pending.append(job)
+            print(f"片段缓存命中 {hits}/{len(jobs)}，需要渲染 {len(pending)} 个片段")
+
+        render_segment_jobs(pending, stage_size, fps, transition_duration=transition_duration,
+                            workers=workers, retries=retries, video_bitrate=video_bitrate,
+                            preset=preset, threads=threads, cache_dir=cache_dir,
+                            transition_style=transition_style, static_vfr=static_vfr)
+        for job, key in duplicates:
+            job.path = rendered[key].path
+        n_frames = concat_segment_chunks(jobs, output_path, fps, duration, audio_pcm=audio_pcm,
+                                         audio_rate=audio_rate, audio_bitrate=audio_bitrate,
+                                         audio_path=audio_path)
+
+        # 拼接完成后再写入缓存，避免容量淘汰删掉本次要用的文件
+        for key, job in rendered.items():
+            cache.put_file(key, job.path, ".mp4")
+        return n_frames
+
+
+def _benchmark_image(path, image_size=BENCHMARK_IMAGE_SIZE):
+    """生成带渐变和噪点的测试图片（接近照片的编码难度）"""
+    width, height = image_size
+    rng = np.random.default_rng(0)
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    image = np.stack([np.broadcast_to(x, (height, width)), np.broadcast_to(y, (height, width)),
+                      (x + y) / 2], axis=-1)
+    image += rng.normal(0, 8, image.shape).astype(np.float32)
+    Image.fromarray(np.clip(image, 0, 255).astype(np.uint8)).save(path)
+
+
+def benchmark_animation_render(stage_sizes, fps=24, duration=2.0, animations=BENCHMARK_ANIMATIONS,
+                               image_path=None, preset=DEFAULT_PRESET, threads=DEFAULT_THREADS):
+    """
+    测量图片片段在不同画面尺寸和动画类型下的渲染耗时
+
+    每个组合按 render_slideshow 的方式渲染一个片段并编码为临时文件：
+    静态图片只生成和转换一次画面，之后重复编码；动画片段逐帧生成画面。
+    图片的预缩放不计入耗时（实际渲染时命中图片缓存）。
+
+    参数:
+        stage_sizes (dict): {名称: (width, height)}，如 VideoSize.list_presets()
+        fps (int): 帧率
+        duration (float): 片段时长（秒）
+        animations (Iterable[str]): 动画类型，AnimationConfig.NONE 表示静态图片
+        image_path (str): 测试图片路径，None 表示使用合成的 4000x3000 图片
+        preset (str): libx264 预设
+        threads (int): 编码线程数
+
+    返回:
+        list[dict]: 每个组合的结果，包含 size、width、height、animation、frames、
+            frame_ms（每帧生成画面的平均耗时）和 render_ms（含编码的总耗时）
+    """
+    results = []
+    n_frames = max(1, int(round(duration * fps)))
+    with tempfile.TemporaryDirectory(prefix="genvideo-bench-") as tmp_dir:
+        if image_path is None:
+            image_path = os.path.join(tmp_dir, "bench.png")
+            _benchmark_image(image_path)
+        output_path = os.path.join(tmp_dir, "bench.mp4")
+        for name, stage_size in stage_sizes.items():
+            for animation_type in animations:
+                config = AnimationConfig(animation_type=animation_type)
+                if is_animated(config):
+                    source = _AnimatedImageSource(load_animator(image_path, stage_size, config,
+                                                                duration, fps))
+                else:
+                    source = _ImageSource(image_path, stage_size)
+                frame_seconds = 0.0
+                start = time.perf_counter()
+                with PyAVEncoder(output_path, stage_size, fps, preset=preset, threads=threads) as encoder:
+                    for n in range(n_frames):
+                        if source.static and n > 0:
+                            encoder.repeat_frame()
+                            continue
+                        frame_start = time.perf_counter()
+                        frame = source.frame(n / fps)
+                        frame_seconds += time.perf_counter() - frame_start
+                        encoder.write_frame(frame)
+                source.close()
+                results.append({
+                    "size": name,
+                    "width": stage_size[0],
+                    "height": stage_size[1],
+                    "animation": animation_type,
+                    "frames": n_frames,
+                    "frame_ms": round(frame_seconds * 1000 / n_frames, 3),
+                    "render_ms": round((time.perf_counter() - start) * 1000, 1),
+                })
+    return results
+
+
+def print_benchmark_results(results):
+    """打印动画渲染基准结果表格，动画行附带相对静态图片的耗时倍数"""
+    static = {row["size"]: row["render_ms"] for row in results
+              if row["animation"] == AnimationConfig.NONE}
+    print(f"{'size':>16s} {'resolution':>11s} {'animation':>10s} {'frames':>7s} "
+          f"{'frame_ms':>9s} {'render_ms':>10s} {'vs_static':>10s}")
+    print("-" * 80)
+    for row in results:
+        baseline = static.get(row["size"])
+        ratio = f"{row['render_ms'] / baseline:.2f}x" if baseline else "-"
+        print(f"{row['size']:>16s} {row['width']:>5d}x{row['height']:<5d} {row['animation']:>10s} "
+              f"{row['frames']:>7d} {row['frame_ms']:>9.3f} {row['render_ms']:>10.1f} {ratio:>10s}")
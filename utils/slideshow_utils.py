@@ -3,10 +3,15 @@
 提供图片和视频混合轮播切换逻辑控制功能
 """
 from dataclasses import dataclass
-from typing import Optional, List, Union
+from typing import TYPE_CHECKING, Optional, List, Union, Iterable
 from utils.media_utils import MediaItem, MediaType
 import random
 
+import numpy as np
+
+if TYPE_CHECKING:
+    from utils.animation_utils import AnimationConfig
+
 
 @dataclass
 class MediaSegment:
@@ -15,6 +20,7 @@ class MediaSegment:
     start_time: float
     end_time: float
     segment_index: int
+    animation: Optional["AnimationConfig"] = None
     
     @property
     def duration(self) -> float:
@@ -29,6 +35,38 @@ class MediaSegment:
         return self.media_item.is_video
 
 
+# 同一主种子派生出的各随机流：循环选择媒体、随机选择动画
+SEED_STREAM_MEDIA = 0
+SEED_STREAM_ANIMATION = 1
+
+
+def derive_seed(seed, stream):
+    """
+    由主种子派生指定随机流的子种子
+
+    各随机流依次从以主种子初始化的生成器中取 64 位作为子种子，
+    结果仍可由主种子复现，不同随机流的抽样之间互不相关。
+
+    参数:
+        seed (int): 主种子，None 表示不指定
+        stream (int): 随机流序号，如 SEED_STREAM_MEDIA
+
+    返回:
+        int: 子种子，seed 为 None 时返回 None
+    """
+    if seed is None:
+        return None
+    master = random.Random(seed)
+    for _ in range(stream):
+        master.getrandbits(64)
+    return master.getrandbits(64)
+
+
+def _make_rng(seed):
+    """按种子创建循环选择媒体的随机数生成器，seed 为 None 时返回全局 random 模块"""
+    return random if seed is None else random.Random(derive_seed(seed, SEED_STREAM_MEDIA))
+
+
 class SlideshowController:
     """
     控制媒体轮播切换的控制器类
@@ -37,9 +75,11 @@ class SlideshowController:
     每次调用 next() 方法会返回当前应该显示的媒体项目、路径和其对应的播放时间区间。
     支持图片和视频混合轮播。
     当素材数量少于切换点时，循环使用素材且随机选择，避免连续使用同一素材。
+    指定随机种子时，相同输入总是得到相同的片段序列。
     """
 
-    def __init__(self, media_items: List[MediaItem], change_points: List[float], random_loop: bool = True):
+    def __init__(self, media_items: List[MediaItem], change_points: List[float], random_loop: bool = True,
+                 seed: Optional[int] = None):
         """
         初始化轮播控制器
 
@@ -47,12 +87,15 @@ class SlideshowController:
             media_items (list): MediaItem 媒体项目列表
             change_points (list): 切换时间点列表（单位：秒）
             random_loop (bool): 循环时是否随机选择，默认为 True
+            seed (int): 主种子，循环时随机选择使用由它派生的子种子，None 表示使用全局 random 模块
         """
         self.media_items = media_items
         self.change_points = change_points
         self.n_items = len(media_items)
         self.idx = 0
         self.random_loop = random_loop
+        self.seed = seed
+        self.rng = _make_rng(seed)
         self.last_media_item = None
 
     def next(self) -> Optional[MediaSegment]:
@@ -74,7 +117,7 @@ class SlideshowController:
                 available_items = [item for item in self.media_items if item != self.last_media_item]
                 if not available_items:
                     available_items = self.media_items
-                media_item = random.choice(available_items)
+                media_item = self.rng.choice(available_items)
             else:
                 media_item = self.media_items[self.idx % self.n_items]
         
@@ -92,9 +135,10 @@ class SlideshowController:
 
     def reset(self):
         """
-        重置控制器到初始状态
+        重置控制器到初始状态（指定种子时随机序列也从头开始）
         """
         self.idx = 0
+        self.rng = _make_rng(self.seed)
         self.last_media_item = None
 
     def get_remaining_changes(self) -> int:
@@ -116,6 +160,77 @@ class SlideshowController:
         return len(self.change_points) - 1
 
 
+class StreamingSlideshowController(SlideshowController):
+    """
+    流式轮播控制器
+
+    切换时间点由停顿点生成器逐步提供（例如 iter_audio_pauses），
+    只要下一个片段的结束点已确认即可返回该片段，无需等待整段音频分析完成。
+    """
+
+    def __init__(self, media_items: List[MediaItem], pause_stream: Iterable[float],
+                 end_time: float, start_time: float = 0.0, random_loop: bool = True,
+                 seed: Optional[int] = None):
+        """
+        初始化流式轮播控制器
+
+        参数:
+            media_items (list): MediaItem 媒体项目列表
+            pause_stream (iterable): 按时间升序产出停顿点（秒）的可迭代对象
+            end_time (float): 最后一个片段的结束时间（通常为音频时长）
+            start_time (float): 第一个片段的开始时间
+            random_loop (bool): 循环时是否随机选择，默认为 True
+            seed (int): 主种子，循环时随机选择使用由它派生的子种子，None 表示使用全局 random 模块
+        """
+        super().__init__(media_items, [start_time], random_loop, seed)
+        self._stream = iter(pause_stream)
+        self.end_time = end_time
+        self._exhausted = False
+
+    def _fill(self, count: int):
+        """从停顿点流中读取，直到已知切换点数量达到 count 或流结束"""
+        while len(self.change_points) < count and not self._exhausted:
+            try:
+                point = next(self._stream)
+            except StopIteration:
+                self.change_points.append(self.end_time)
+                self._exhausted = True
+                break
+            # 忽略超出目标时长或与上一个切换点重合的停顿
+            if self.change_points[-1] < point < self.end_time:
+                self.change_points.append(point)
+
+    def next(self) -> Optional[MediaSegment]:
+        """
+        返回下一个片段，必要时等待停顿点流确认该片段的结束点
+
+        返回:
+            MediaSegment or None: 所有片段处理完后返回 None
+        """
+        self._fill(self.idx + 2)
+        return super().next()
+
+    def get_remaining_changes(self) -> int:
+        """
+        获取剩余的切换次数（会读完整个停顿点流）
+
+        返回:
+            int: 剩余的切换次数
+        """
+        self._fill(float("inf"))
+        return super().get_remaining_changes()
+
+    def get_total_changes(self) -> int:
+        """
+        获取总的切换次数（会读完整个停顿点流）
+
+        返回:
+            int: 总的切换次数
+        """
+        self._fill(float("inf"))
+        return super().get_total_changes()
+
+
 class VideoSegmentController:
     """
     视频片段专用控制器
@@ -163,3 +278,119 @@ class VideoSegmentController:
             bool: 是否有视频文件
         """
         return self.n_videos > 0
+
+
+def _range_argmax(values: np.ndarray, lo: np.ndarray, hi: np.ndarray) -> np.ndarray:
+    """
+    批量查询区间最大值的位置（稀疏表，构建 O(n log n)，每次查询 O(1)）
+
+    参数:
+        values (np.ndarray): 数值数组
+        lo (np.ndarray): 每个查询区间的左端点（含）
+        hi (np.ndarray): 每个查询区间的右端点（含）
+
+    返回:
+        np.ndarray: 每个区间内最大值的位置，空区间为 -1
+    """
+    n = len(values)
+    table = [np.arange(n)]
+    level = 1
+    while (1 << level) <= n:
+        prev = table[-1]
+        span = n - (1 << level) + 1
+        left = prev[:span]
+        right = prev[1 << (level - 1):(1 << (level - 1)) + span]
+        table.append(np.where(values[right] > values[left], right, left))
+        level += 1
+
+    result = np.full(len(lo), -1, dtype=np.int64)
+    valid = np.flatnonzero(lo <= hi)
+    if valid.size == 0:
+        return result
+    l = lo[valid]
+    h = hi[valid]
+    levels = np.floor(np.log2(h - l + 1)).astype(np.int64)
+    for k in np.unique(levels):
+        sel = levels == k
+        left = table[k][l[sel]]
+        right = table[k][h[sel] - (1 << k) + 1]
+        result[valid[sel]] = np.where(values[right] > values[left], right, left)
+    return result
+
+
+def plan_segments(times: List[float], scores: List[float], duration: float, target_segments: int,
+                  min_segment: float = 5.0, max_segment: Optional[float] = None,
+                  start_time: float = 0.0) -> List[float]:
+    """
+    从停顿候选中选出切换点，使片段数量尽量接近目标且总评分最高
+
+    按时间排序的候选上做分层动态规划：第 j 层表示已选 j 个切换点、最后一个落在某候选上的
+    最高总评分。上一个切换点必须落在 [t - max_segment, t - min_segment] 内，对应有序候选上的
+    一段连续区间，用稀疏表一次性求出所有区间的最大值，每层 O(n log n)。
+    目标数量无法满足时选择最接近的可行数量；任何数量都无法满足 max_segment 时忽略该约束。
+
+    参数:
+        times (list): 候选停顿时间点（秒）
+        scores (list): 每个候选的评分，越大越适合作为切换点
+        duration (float): 音频结束时间（秒）
+        target_segments (int): 目标片段数量
+        min_segment (float): 片段最短时长（秒）
+        max_segment (float): 片段最长时长（秒），None 表示不限制
+        start_time (float): 第一个片段的开始时间（秒）
+
+    返回:
+        list: 选中的切换时间点（秒），按时间排序，不含开始和结束时间
+    """
+    times = np.asarray(times, dtype=np.float64)
+    scores = np.asarray(scores, dtype=np.float64)
+    order = np.argsort(times, kind="stable")
+    times = times[order]
+    scores = scores[order]
+    max_limit = np.inf if max_segment is None else max_segment
+    target_cuts = max(int(target_segments) - 1, 0)
+
+    inside = (times - start_time >= min_segment) & (duration - times >= min_segment)
+    times = times[inside]
+    scores = scores[inside]
+    n = len(times)
+
+    # 可行数量 -> (总评分, 最后一个切换点的位置)
+    feasible = {}
+    if min_segment <= duration - start_time <= max_limit:
+        feasible[0] = (0.0, -1)
+
+    parents = [None, None]
+    if n:
+        lo = np.searchsorted(times, times - max_limit, side="left")
+        hi = np.searchsorted(times, times - min_segment, side="right") - 1
+        last_ok = duration - times <= max_limit
+        layer = np.where(times - start_time <= max_limit, scores, -np.inf)
+        count = 1
+        while count <= n and np.isfinite(layer).any():
+            ends = np.where(last_ok, layer, -np.inf)
+            best = int(np.argmax(ends))
+            if np.isfinite(ends[best]):
+                feasible[count] = (float(ends[best]), best)
+            nearest = min((abs(c - target_cuts) for c in feasible), default=None)
+            if nearest is not None and count >= target_cuts + nearest:
+                break
+            arg = _range_argmax(layer, lo, hi)
+            previous = np.where(arg >= 0, layer[np.maximum(arg, 0)], -np.inf)
+            layer = previous + scores
+            parents.append(arg)
+            count += 1
+
+    if not feasible:
+        if max_segment is not None:
+            return plan_segments(times, scores, duration, target_segments,
+                                 min_segment=min_segment, max_segment=None, start_time=start_time)
+        return []
+
+    chosen = min(feasible, key=lambda c: (abs(c - target_cuts), -feasible[c][0]))
+    points = []
+    index = feasible[chosen][1]
+    for layer_index in range(chosen, 0, -1):
+        points.append(float(times[index]))
+        if layer_index > 1:
+            index = int(parents[layer_index][index])
+    return points[::-1]
@@ -0,0 +1,263 @@
+"""
+时间线工具模块
+把音频分析和轮播控制器的结果整理为可序列化的时间线（片段、媒体、动画、过渡和随机种子），
+时间线可以导出为 JSON，也可以直接作为渲染输入，跳过音频分析和片段规划
+"""
+import json
+import os
+import random
+from dataclasses import dataclass
+from typing import Iterable, Iterator, List, Optional
+
+from utils.animation_utils import AnimationConfig, get_random_animation_config
+from utils.media_utils import MediaItem, MediaType
+from utils.slideshow_utils import SEED_STREAM_ANIMATION, MediaSegment, derive_seed
+from utils.transition_utils import TRANSITION_FADE, TRANSITION_STYLES
+
+
+# 时间线 JSON 格式版本，格式不兼容时递增
+TIMELINE_VERSION = 1
+
+
+@dataclass
+class Timeline:
+    """
+    轮播时间线
+
+    片段按时间排序、首尾相接，覆盖 [0, duration]；每个片段带有播放的媒体和动画配置。
+    过渡参数对所有片段统一生效：除第一个片段外，每个片段开头的 transition_duration 秒为过渡窗口。
+    """
+    audio_path: str
+    duration: float
+    segments: List[MediaSegment]
+    transition_duration: float = 1.0
+    transition_style: str = TRANSITION_FADE
+    seed: Optional[int] = None
+    change_mode: str = "pause"
+
+    @property
+    def change_points(self) -> List[float]:
+        """切换时间点（含开始和结束时间）"""
+        if not self.segments:
+            return [0.0, self.duration]
+        return [segment.start_time for segment in self.segments] + [self.segments[-1].end_time]
+
+    @property
+    def media_items(self) -> List[MediaItem]:
+        """时间线使用的媒体（按首次出现的顺序去重）"""
+        items = []
+        seen = set()
+        for segment in self.segments:
+            key = (segment.media_item.path, segment.media_item.media_type)
+            if key not in seen:
+                seen.add(key)
+                items.append(segment.media_item)
+        return items
+
+    def to_dict(self) -> dict:
+        """
+        转换为可 JSON 序列化的字典，媒体只保存一份，片段按下标引用
+
+        返回:
+            dict: 时间线字典
+        """
+        media = self.media_items
+        index = {(item.path, item.media_type): i for i, item in enumerate(media)}
+        return {
+            "version": TIMELINE_VERSION,
+            "audio": {"path": self.audio_path, "duration": self.duration},
+            "change_mode": self.change_mode,
+            "transition": {"duration": self.transition_duration, "style": self.transition_style},
+            "seed": self.seed,
+            "media": [
+                {"path": item.path, "type": item.media_type.value, "name": item.name}
+                for item in media
+            ],
+            "segments": [
+                {
+                    "media": index[(segment.media_item.path, segment.media_item.media_type)],
+                    "start": segment.start_time,
+                    "end": segment.end_time,
+                    "animation": None if segment.animation is None else segment.animation.to_dict(),
+                }
+                for segment in self.segments
+            ],
+        }
+
+    @classmethod
+    def from_dict(cls, data) -> "Timeline":
+        """
+        从 to_dict 生成的字典还原时间线
+
+        参数:
+            data (dict): 时间线字典
+
+        返回:
+            Timeline: 时间线
+
+        异常:
+            ValueError: 版本不兼容、字段缺失或片段时间不连续时抛出
+        """
+        if not isinstance(data, dict) or data.get("version") != TIMELINE_VERSION:
+            raise ValueError(f"不支持的时间线版本: {data.get('version') if isinstance(data, dict) else data!r}")
+        try:
+            media = [
+                MediaItem(path=item["path"], media_type=MediaType(item["type"]),
+                          name=item.get("name") or os.path.basename(item["path"]))
+                for item in data["media"]
+            ]
+            segments = [
+                MediaSegment(
+                    media_item=media[entry["media"]],
+                    start_time=float(entry["start"]),
+                    end_time=float(entry["end"]),
+                    segment_index=i,
+                    animation=None if entry.get("animation") is None
+                    else AnimationConfig.from_dict(entry["animation"]),
+                )
+                for i, entry in enumerate(data["segments"])
+            ]
+            transition = data.get("transition") or {}
+            timeline = cls(
+                audio_path=data["audio"]["path"],
+                duration=float(data["audio"]["duration"]),
+                segments=segments,
+                transition_duration=float(transition.get("duration", 1.0)),
+                transition_style=transition.get("style", TRANSITION_FADE),
+                seed=data.get("seed"),
+                change_mode=data.get("change_mode", "pause"),
+            )
+        except (KeyError, IndexError, TypeError) as exc:
+            raise ValueError(f"时间线格式错误: {exc!r}") from exc
+        timeline.validate()
+        return timeline
+
+    def validate(self):
+        """
+        检查片段是否按时间首尾相接，过渡样式是否受支持
+
+        异常:
+            ValueError: 时间线无效时抛出
+        """
+        if not self.segments:
+            raise ValueError("时间线中没有片段")
+        if self.transition_style not in TRANSITION_STYLES:
+            raise ValueError(f"不支持的过渡样式: {self.transition_style}")
+        previous_end = self.segments[0].start_time
+        for segment in self.segments:
+            if segment.start_time != previous_end or segment.end_time < segment.start_time:
+                raise ValueError(
+                    f"片段 {segment.segment_index} 的时间区间无效: "
+                    f"{segment.start_time:.2f} - {segment.end_time:.2f}")
+            previous_end = segment.end_time
+
+    def save(self, path):
+        """
+        写入 JSON 文件
+
+        参数:
+            path (str): 输出路径
+        """
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+
+    @classmethod
+    def load(cls, path) -> "Timeline":
+        """
+        读取 save 写入的 JSON 文件
+
+        参数:
+            path (str): 时间线文件路径
+
+        返回:
+            Timeline: 时间线
+
+        异常:
+            ValueError: 文件内容不是有效的时间线时抛出
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            try:
+                data = json.load(f)
+            except json.JSONDecodeError as exc:
+                raise ValueError(f"时间线文件不是有效的 JSON: {path}") from exc
+        return cls.from_dict(data)
+
+    def print_plan(self):
+        """打印每个片段的媒体、时间区间和动画"""
+        print("轮播切换顺序:")
+        for segment in self.segments:
+            media_item = segment.media_item
+            animation = "" if segment.animation is None else f" | 动画: {segment.animation.animation_type}"
+            print(f"媒体: {media_item.name} ({media_item.media_type.value}) | "
+                  f"时间区间: {segment.start_time:.2f} - {segment.end_time:.2f}{animation}")
+
+
+def assign_animations(segments: Iterable[MediaSegment], animation_config=None,
+                      random_animation=False, seed=None) -> Iterator[MediaSegment]:
+    """
+    依次为图片片段确定动画配置（视频片段不加动画），已有配置的片段保持不变
+
+    参数:
+        segments (Iterable[MediaSegment]): 按时间排序的片段
+        animation_config (AnimationConfig): 所有图片使用的动画配置，None 表示不指定
+        random_animation (bool): 是否为每张图片随机选择动画（优先于 animation_config）
+        seed (int): 主种子，随机选择动画使用由它派生的子种子，None 表示使用全局 random 模块
+
+    返回:
+        Iterator[MediaSegment]: 带动画配置的片段
+    """
+    # 动画使用由主种子派生的独立随机流，与控制器循环选择媒体的抽样互不相关
+    rng = None if seed is None else random.Random(derive_seed(seed, SEED_STREAM_ANIMATION))
+    for segment in segments:
+        animation = segment.animation
+        if animation is None and segment.is_image:
+            if random_animation:
+                animation = get_random_animation_config(rng=rng)
+            elif animation_config is not None:
+                animation = animation_config
+        yield MediaSegment(segment.media_item, segment.start_time, segment.end_time,
+                           segment.segment_index, animation)
+
+
+def build_timeline(segments: Iterable[MediaSegment], audio_path, duration,
+                   transition_duration=1.0, transition_style=TRANSITION_FADE,
+                   animation_config=None, random_animation=False, seed=None,
+                   change_mode="pause") -> Timeline:
+    """
+    由控制器产生的片段构建时间线，并为图片片段确定动画配置
+
+    参数:
+        segments (Iterable[MediaSegment]): 按时间排序的片段，如 iter_controller(controller)
+        audio_path (str): 音频文件路径
+        duration (float): 视频时长（秒）
+        transition_duration (float): 过渡时长（秒）
+        transition_style (str): 过渡样式，"fade" 或 "crossfade"
+        animation_config (AnimationConfig): 所有图片使用的动画配置，None 表示不指定
+        random_animation (bool): 是否为每张图片随机选择动画（优先于 animation_config）
+        seed (int): 随机选择动画使用的种子（应与控制器的种子相同），同时记录在时间线中
+        change_mode (str): 切换点来源，"pause" 或 "beat"
+
+    返回:
+        Timeline: 时间线
+    """
+    planned = list(assign_animations(segments, animation_config, random_animation, seed))
+    return Timeline(audio_path=audio_path, duration=duration, segments=planned,
+                    transition_duration=transition_duration, transition_style=transition_style,
+                    seed=seed, change_mode=change_mode)
+
+
+def iter_controller(controller) -> Iterator[MediaSegment]:
+    """
+    依次取出控制器的全部片段
+
+    参数:
+        controller (SlideshowController): 轮播控制器
+
+    返回:
+        Iterator[MediaSegment]: 片段序列
+    """
+    while True:
+        segment = controller.next()
+        if segment is None:
+            return
+        yield segment
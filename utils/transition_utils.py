@@ -0,0 +1,124 @@
+"""
+过渡效果工具模块
+只在相邻片段重叠的过渡窗口内混合画面，混合使用 uint8 整数运算写入预分配的缓冲区，
+过渡窗口以外的帧原样透传
+"""
+import numpy as np
+from moviepy import VideoClip
+
+
+# 过渡样式：从黑色淡入（与原 FadeIn/FadeOut 合成结果一致）和交叉溶解
+TRANSITION_FADE = "fade"
+TRANSITION_CROSSFADE = "crossfade"
+TRANSITION_STYLES = (TRANSITION_FADE, TRANSITION_CROSSFADE)
+
+# 混合权重的定点精度：权重取值 0~256，结果右移 8 位
+BLEND_SHIFT = 8
+BLEND_ONE = 1 << BLEND_SHIFT
+
+
+def blend_weight(progress):
+    """
+    把过渡进度转换为定点权重
+
+    参数:
+        progress (float): 过渡进度，0 表示刚开始，1 表示结束
+
+    返回:
+        int: 0~256 的整数权重
+    """
+    return min(BLEND_ONE, max(0, int(progress * BLEND_ONE + 0.5)))
+
+
+class TransitionBlender:
+    """
+    过渡混合器
+
+    所有中间结果写入初始化时分配的缓冲区，逐帧混合时不再分配内存。
+    uint16 累加器足以容纳 255 * 256 + 128，不会溢出。
+    """
+
+    def __init__(self, stage_size, style=TRANSITION_FADE):
+        """
+        参数:
+            stage_size (tuple): 画面尺寸 (width, height)
+            style (str): 过渡样式，"fade" 或 "crossfade"
+
+        异常:
+            ValueError: 不支持的过渡样式
+        """
+        if style not in TRANSITION_STYLES:
+            raise ValueError(f"不支持的过渡样式: {style}")
+        self.style = style
+        stage_w, stage_h = stage_size
+        self.output = np.empty((stage_h, stage_w, 3), dtype=np.uint8)
+        self._acc = np.empty((stage_h, stage_w, 3), dtype=np.uint16)
+        self._tmp = np.empty((stage_h, stage_w, 3), dtype=np.uint16) if style == TRANSITION_CROSSFADE else None
+
+    @property
+    def needs_outgoing(self):
+        """混合时是否需要上一个片段的画面"""
+        return self.style == TRANSITION_CROSSFADE
+
+    def blend(self, incoming, progress, outgoing=None):
+        """
+        混合过渡窗口内的一帧
+
+        参数:
+            incoming (np.ndarray): 进入片段的 uint8 画面
+            progress (float): 过渡进度（0~1）
+            outgoing (np.ndarray): 退出片段的 uint8 画面，交叉溶解时需要；缺失时按黑色处理
+
+        返回:
+            np.ndarray: 混合结果；进度达到 1 时直接返回 incoming，否则返回内部缓冲区（下次调用时会被覆盖）
+        """
+        weight = blend_weight(progress)
+        if weight >= BLEND_ONE:
+            return incoming
+        acc = self._acc
+        np.multiply(incoming, np.uint16(weight), out=acc, dtype=np.uint16)
+        if self.style == TRANSITION_CROSSFADE and outgoing is not None:
+            np.multiply(outgoing, np.uint16(BLEND_ONE - weight), out=self._tmp, dtype=np.uint16)
+            acc += self._tmp
+        acc += BLEND_ONE // 2
+        acc >>= BLEND_SHIFT
+        np.copyto(self.output, acc, casting="unsafe")
+        return self.output
+
+
+def compose_with_transitions(clips, start_times, transition_duration, stage_size,
+                             style=TRANSITION_FADE):
+    """
+    按开始时间排列舞台尺寸的片段，只在重叠窗口内混合相邻片段
+
+    片段 k 从 start_times[k] 开始播放，与下一个片段重叠 transition_duration 秒。
+    除第一个片段外，每个片段开头的 transition_duration 秒为过渡窗口；
+    窗口以外直接返回当前片段的帧，不经过合成。
+
+    参数:
+        clips (list): 舞台尺寸的 MoviePy 片段（不需要再添加 FadeIn/FadeOut）
+        start_times (list[float]): 各片段的开始时间
+        transition_duration (float): 过渡时长（秒）
+        stage_size (tuple): 画面尺寸 (width, height)
+        style (str): 过渡样式，"fade" 或 "crossfade"
+
+    返回:
+        VideoClip: 拼接后的视频片段
+    """
+    blender = TransitionBlender(stage_size, style)
+    starts = np.asarray(start_times, dtype=np.float64)
+    duration = max(start + clip.duration for start, clip in zip(start_times, clips))
+
+    def frame_function(t):
+        k = max(0, int(np.searchsorted(starts, t, side="right")) - 1)
+        local = t - starts[k]
+        incoming = np.asarray(clips[k].get_frame(local), dtype=np.uint8)
+        if k == 0 or transition_duration <= 0 or local >= transition_duration:
+            return incoming
+        outgoing = None
+        if blender.needs_outgoing:
+            previous = clips[k - 1]
+            outgoing = np.asarray(previous.get_frame(min(t - starts[k - 1], previous.duration)), dtype=np.uint8)
+        return blender.blend(incoming, local / transition_duration, outgoing)
+
+    return VideoClip(frame_function, duration=duration)
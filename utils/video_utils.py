@@ -1,9 +1,37 @@
 """
 视频和图片处理工具模块
-提供图片缩放、位置设置、视频合成等功能
+提供图片缩放、位置设置、视频合成和媒体元数据探测等功能
 """
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+
+import av
+import numpy as np
 from moviepy import CompositeVideoClip
 
+from utils.cache_utils import DiskCache, make_cache_key
+
+
+# 媒体元数据缓存的子目录名和容量上限（字节）
+MEDIA_CACHE_NAMESPACE = "media"
+MEDIA_CACHE_MAX_BYTES = 16 << 20
+
+# 进程内的元数据缓存：(绝对路径, 大小, mtime_ns) -> MediaInfo
+_media_info_memo = {}
+
+# 读取器池默认最多同时打开的读取器数量
+DEFAULT_MAX_OPEN_READERS = 8
+
+# 低分辨率代理视频的缓存子目录名、容量上限（字节）和编码参数
+PROXY_CACHE_NAMESPACE = "proxies"
+PROXY_CACHE_MAX_BYTES = 2 << 30
+PROXY_PRESET = "ultrafast"
+PROXY_CRF = "23"
+
 
 def resize_and_position_image(clip, video_size, position="center"):
     """
@@ -94,3 +122,316 @@ def resize_and_position_video(clip, video_size, position="center"):
     final_clip = final_clip.with_duration(clip.duration)
     
     return final_clip
+
+
+@dataclass
+class MediaInfo:
+    """媒体元数据"""
+    duration: float
+    width: int
+    height: int
+    fps: float
+    codec: str
+    rotation: int
+    has_audio: bool
+
+    @property
+    def size(self):
+        """按旋转角度校正后的显示尺寸 (width, height)"""
+        if self.rotation % 180:
+            return self.height, self.width
+        return self.width, self.height
+
+
+def _read_media_info(path):
+    """用 PyAV 读取容器和视频流信息，旋转角度取自第一帧的显示矩阵"""
+    with av.open(path) as container:
+        stream = container.streams.video[0]
+        if container.duration is not None:
+            duration = container.duration / av.time_base
+        elif stream.duration is not None:
+            duration = float(stream.duration * stream.time_base)
+        else:
+            duration = 0.0
+        rate = stream.average_rate or stream.guessed_rate or stream.base_rate
+        rotation = 0
+        for frame in container.decode(stream):
+            # VideoFrame.rotation 从 PyAV 14.1 开始提供，旧版本按未旋转处理
+            rotation = int(round(getattr(frame, "rotation", 0) or 0)) % 360
+            break
+        return MediaInfo(
+            duration=duration,
+            width=stream.codec_context.width,
+            height=stream.codec_context.height,
+            fps=float(rate) if rate else 0.0,
+            codec=stream.codec_context.name,
+            rotation=rotation,
+            has_audio=len(container.streams.audio) > 0,
+        )
+
+
+def probe_media(path, cache_dir=None):
+    """
+    探测视频文件的元数据（时长、尺寸、帧率、编码、旋转角度、是否有音轨）
+
+    结果先查进程内缓存，再查磁盘缓存，都未命中时才用 PyAV 打开文件，
+    避免为了读取时长而反复创建 VideoFileClip（每次都会启动 ffmpeg 子进程）。
+    缓存键由路径、文件大小和修改时间组成，不计算内容哈希，因为探测本身比哈希整个视频文件更快。
+
+    参数:
+        path (str): 视频文件路径
+        cache_dir (str): 磁盘缓存目录，None 表示只使用进程内缓存
+
+    返回:
+        MediaInfo: 媒体元数据
+
+    异常:
+        FileNotFoundError: 文件不存在时抛出
+        RuntimeError: 文件无法解析或没有视频流时抛出
+    """
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    info = _media_info_memo.get(memo_key)
+    if info is not None:
+        return info
+
+    cache = None
+    key = None
+    if cache_dir is not None:
+        cache = DiskCache(cache_dir, namespace=MEDIA_CACHE_NAMESPACE, max_bytes=MEDIA_CACHE_MAX_BYTES)
+        key = make_cache_key("media-info", *memo_key)
+        cached = cache.get_json(key)
+        if cached is not None:
+            info = MediaInfo(**cached)
+
+    if info is None:
+        try:
+            info = _read_media_info(path)
+        except (av.FFmpegError, IndexError) as e:
+            raise RuntimeError(f"无法读取媒体信息（PyAV）：{path}，{e}") from e
+        if cache is not None:
+            cache.set_json(key, asdict(info))
+
+    _media_info_memo[memo_key] = info
+    return info
+
+
+def proxy_size(media_size, stage_size):
+    """
+    计算代理视频的尺寸：按覆盖方式缩放到刚好铺满舞台，不放大，宽高取偶数
+
+    参数:
+        media_size (tuple): 视频显示尺寸 (width, height)
+        stage_size (tuple): 舞台尺寸 (width, height)
+
+    返回:
+        tuple: 代理视频的显示尺寸 (width, height)
+    """
+    width, height = media_size
+    scale = min(1.0, max(stage_size[0] / width, stage_size[1] / height))
+    return (max(2, int(round(width * scale / 2)) * 2),
+            max(2, int(round(height * scale / 2)) * 2))
+
+
+def make_video_proxy(path, stage_size, cache_dir):
+    """
+    生成并缓存低分辨率代理视频，供草稿渲染代替原始视频解码
+
+    代理视频保留原始帧的时间戳，按显示方向旋转后以 ultrafast 预设编码，不带音轨和旋转信息。
+    缓存键由路径、文件大小、修改时间和代理尺寸组成；原视频不需要缩小时直接返回原路径。
+
+    参数:
+        path (str): 视频文件路径
+        stage_size (tuple): 草稿渲染的舞台尺寸 (width, height)
+        cache_dir (str): 缓存目录
+
+    返回:
+        str: 代理视频路径（或原路径）
+
+    异常:
+        RuntimeError: 视频无法解码时抛出
+    """
+    info = probe_media(path, cache_dir=cache_dir)
+    size = proxy_size(info.size, stage_size)
+    if size == info.size:
+        return path
+
+    stat = os.stat(path)
+    cache = DiskCache(cache_dir, namespace=PROXY_CACHE_NAMESPACE, max_bytes=PROXY_CACHE_MAX_BYTES)
+    key = make_cache_key("proxy", os.path.abspath(path), stat.st_size, stat.st_mtime_ns, list(size))
+    cached = cache.get_path(key, ".mp4")
+    if cached is not None:
+        return cached
+
+    # 旋转 90/270 度的视频先缩放到编码方向的尺寸，再旋转为显示方向
+    coded = (size[1], size[0]) if info.rotation % 180 else size
+    fd, tmp_path = tempfile.mkstemp(dir=cache.directory, prefix=".tmp-", suffix=".mp4")
+    os.close(fd)
+    try:
+        with av.open(path) as source, av.open(tmp_path, mode="w") as proxy:
+            in_stream = source.streams.video[0]
+            in_stream.thread_type = "AUTO"
+            out_stream = proxy.add_stream("libx264", rate=in_stream.average_rate or 30)
+            out_stream.width, out_stream.height = size
+            out_stream.pix_fmt = "yuv420p"
+            out_stream.time_base = in_stream.time_base
+            out_stream.options = {"preset": PROXY_PRESET, "crf": PROXY_CRF}
+            for frame in source.decode(in_stream):
+                rgb = frame.reformat(width=coded[0], height=coded[1], format="rgb24").to_ndarray()
+                if info.rotation:
+                    rgb = np.rot90(rgb, info.rotation // 90)
+                upright = av.VideoFrame.from_ndarray(np.ascontiguousarray(rgb), format="rgb24")
+                upright.pts = frame.pts
+                upright.time_base = frame.time_base
+                for packet in out_stream.encode(upright):
+                    proxy.mux(packet)
+            for packet in out_stream.encode(None):
+                proxy.mux(packet)
+    except av.FFmpegError as e:
+        os.remove(tmp_path)
+        raise RuntimeError(f"无法生成代理视频：{path}，{e}") from e
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return cache.put_file(key, tmp_path, ".mp4")
+
+
+class VideoReader:
+    """
+    基于 PyAV 的顺序视频读取器
+
+    同一文件再次从头播放时只需回到开头重新解码，不必重新打开文件和初始化解码器。
+    """
+
+    def __init__(self, path):
+        """
+        参数:
+            path (str): 视频文件路径
+        """
+        self.path = path
+        self.container = av.open(path)
+        self.stream = self.container.streams.video[0]
+        self.stream.thread_type = "AUTO"
+        self.started = False
+
+    def frames(self):
+        """
+        从头开始顺序解码
+
+        返回:
+            Iterator[av.VideoFrame]: 视频帧迭代器
+        """
+        if self.started:
+            self.container.seek(0)
+        self.started = True
+        return self.container.decode(self.stream)
+
+    def close(self):
+        """关闭文件"""
+        self.container.close()
+
+
+class VideoReaderPool:
+    """
+    按文件共享已打开的视频读取器
+
+    acquire 优先复用同一文件的空闲读取器，没有时才打开新的；release 后读取器变为空闲。
+    打开的读取器总数超过上限时，按最久未使用的顺序关闭空闲读取器，正在使用的读取器不会被关闭。
+    """
+
+    def __init__(self, opener=VideoReader, closer=None, max_open=DEFAULT_MAX_OPEN_READERS):
+        """
+        参数:
+            opener (callable): 根据路径打开读取器的函数，默认使用 VideoReader
+            closer (callable): 关闭读取器的函数，默认调用读取器的 close 方法
+            max_open (int): 最多同时打开的读取器数量
+        """
+        self.opener = opener
+        self.closer = closer or (lambda reader: reader.close())
+        self.max_open = max_open
+        self.opened = 0
+        self._idle = OrderedDict()
+        self._busy = {}
+        self._lock = threading.Lock()
+
+    @property
+    def open_count(self):
+        """当前打开的读取器数量"""
+        return len(self._idle) + len(self._busy)
+
+    def acquire(self, path):
+        """
+        获取指定文件的读取器
+
+        参数:
+            path (str): 视频文件路径
+
+        返回:
+            读取器对象，用完后需要调用 release 归还
+        """
+        key = os.path.abspath(path)
+        with self._lock:
+            for reader_id in reversed(self._idle):
+                if self._idle[reader_id][0] == key:
+                    entry = self._idle.pop(reader_id)
+                    self._busy[reader_id] = entry
+                    return entry[1]
+        reader = self.opener(path)
+        with self._lock:
+            self.opened += 1
+            self._busy[id(reader)] = (key, reader)
+            evicted = self._evict()
+        self._close_all(evicted)
+        return reader
+
+    def release(self, reader):
+        """
+        归还读取器，超出上限时关闭最久未使用的空闲读取器
+
+        参数:
+            reader: acquire 返回的读取器
+        """
+        with self._lock:
+            entry = self._busy.pop(id(reader), None)
+            if entry is None:
+                return
+            self._idle[id(reader)] = entry
+            evicted = self._evict()
+        self._close_all(evicted)
+
+    @contextmanager
+    def reader(self, path):
+        """以上下文管理器的方式获取并归还读取器"""
+        reader = self.acquire(path)
+        try:
+            yield reader
+        finally:
+            self.release(reader)
+
+    def close(self):
+        """关闭所有读取器"""
+        with self._lock:
+            readers = [reader for _, reader in self._idle.values()]
+            readers += [reader for _, reader in self._busy.values()]
+            self._idle.clear()
+            self._busy.clear()
+        self._close_all(readers)
+
+    def _evict(self):
+        """取出需要关闭的空闲读取器（调用方持有锁）"""
+        evicted = []
+        while self.open_count > self.max_open and self._idle:
+            _, (_, reader) = self._idle.popitem(last=False)
+            evicted.append(reader)
+        return evicted
+
+    def _close_all(self, readers):
+        for reader in readers:
+            self.closer(reader)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False